@@ -0,0 +1,49 @@
+"""add estimate jobs
+
+Revision ID: 7c1f3a9e5d20
+Revises: 2e47aaf3d0e9
+Create Date: 2026-10-16 21:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1f3a9e5d20'
+down_revision: Union[str, Sequence[str], None] = '2e47aaf3d0e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('estimate_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=False),
+    sa.Column('input_dir', sa.String(), nullable=False),
+    sa.Column('total_items', sa.Integer(), nullable=True),
+    sa.Column('processed_items', sa.Integer(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_estimate_jobs_user_id_users')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_estimate_jobs'))
+    )
+    op.create_index(op.f('ix_estimate_jobs_id'), 'estimate_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_estimate_jobs_status'), 'estimate_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_estimate_jobs_status'), table_name='estimate_jobs')
+    op.drop_index(op.f('ix_estimate_jobs_id'), table_name='estimate_jobs')
+    op.drop_table('estimate_jobs')
@@ -0,0 +1,27 @@
+"""add yield record image status
+
+Revision ID: b4d2e8c61a73
+Revises: 7c1f3a9e5d20
+Create Date: 2026-10-16 23:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d2e8c61a73'
+down_revision: Union[str, Sequence[str], None] = '7c1f3a9e5d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('yield_records', sa.Column('image_status', sa.String(), server_default='stored', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('yield_records', 'image_status')
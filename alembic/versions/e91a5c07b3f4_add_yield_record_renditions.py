@@ -0,0 +1,27 @@
+"""add yield record renditions
+
+Revision ID: e91a5c07b3f4
+Revises: b4d2e8c61a73
+Create Date: 2026-10-17 01:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91a5c07b3f4'
+down_revision: Union[str, Sequence[str], None] = 'b4d2e8c61a73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('yield_records', sa.Column('renditions', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('yield_records', 'renditions')
@@ -191,12 +191,12 @@ def validate_file_size(
     Raises:
         HTTPException 413: if file size /images/ is bigger than supported
     """
-    max_size = 10 * 1024 * 1024  # 10 MB -> big image size 
+    max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
     
     if content_length and content_length > max_size:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File size exceeds maximum allowed (10 MB)"
+            detail=f"File size exceeds maximum allowed ({settings.MAX_FILE_SIZE_MB} MB)"
         )
     
     return content_length or 0
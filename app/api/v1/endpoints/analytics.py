@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, logger, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+import os
 
 from app.core.config import settings
 from app.core.logging import logger
@@ -8,6 +9,8 @@ from app.db.session import get_db
 from app.db.models import farming as models
 from app.db.models.users import User, UserRole
 from app.api import deps
+from app.utils.renditions import image_url
+from app.utils.storage import get_storage
 
 
 router = APIRouter()
@@ -108,6 +111,15 @@ async def get_orchard_dashboard(
         .limit(10)\
         .all()
 
+    # Thumbnails for the list: renditions are tracked on the YieldRecord of each image
+    filenames = [os.path.basename(p.image.image_path) for p in recent_activity]
+    renditions = dict(
+        db.query(models.YieldRecord.filename, models.YieldRecord.renditions)
+        .filter(models.YieldRecord.filename.in_(filenames))
+        .all()
+    ) if filenames else {}
+    storage = get_storage()
+
     logger.debug(f"Fetched dashboard for orchard {orchard_id} by user {current_user.id}")
 
     return {
@@ -126,6 +138,12 @@ async def get_orchard_dashboard(
                 "prediction_id": p.id,
                 "image_id": p.image.id,
                 "image_path": p.image.image_path,
+                "thumbnail_url": image_url(
+                    storage,
+                    p.image.image_path,
+                    renditions.get(os.path.basename(p.image.image_path)),
+                    "thumb"
+                ),
                 "healthy_apples": p.good_apples,
                 "damaged_apples": p.damaged_apples,
                 "total_apples": p.total_apples,
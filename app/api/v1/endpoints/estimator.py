@@ -1,21 +1,34 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Callable, List, Optional, Tuple
 import uuid
 import time
 import os
 import json
+import shutil
 
 from app.db.session import get_db
 from app.db.models import farming as models
 from app.db.models.users import User, UserRole
-from app.models.inference import model_engine
-from app.utils.image_processing import draw_cyberpunk_detections
+from app.models.registry import model_registry, fruit_models, ModelUnavailable, UnknownFruit
+from app.models.executor import inference_executor, InferenceQueueFull
+from app.models.tiling import validate_tile_params
+from app.models.cache import inference_cache, result_cache_key
+from app.models.candidates import candidate_store, CandidateEntry
+from app.models.postprocess import CandidateSet
+from app.utils.preview_store import preview_store
+from app.utils.batch_upload import BatchImage, BatchTooLarge, BatchUploadError, collect_batch_images, parse_tree_ids
+from app.utils.image_processing import draw_cyberpunk_detections, DecodedImage
+from app.utils.upload_stream import UploadedImage, UploadError, UploadTooLarge, read_image_upload
 from app.schemas import yield_schema
 from app.api import deps
 from fastapi.responses import Response
-from app.core.logging import logger
-from app.utils.s3_storage import upload_image_to_s3 , s3_is_configured
+from app.core.logging import logger, start_inference_trace
+from app.core.config import settings
+from app.core.jobs import job_queue, RetryJob
+from app.core.image_persistence import IMAGE_FAILED, IMAGE_PENDING, IMAGE_STORED, image_persister, mark_image_status
+from app.utils.renditions import amake_renditions, rendition_key, rendition_keys
+from app.utils.storage import get_storage
 
 
 router = APIRouter()
@@ -87,26 +100,159 @@ def validate_orchard_and_tree(
     return orchard, tree
 
 
-def validate_image_file(file: UploadFile):
+# MAIN ENDPOINT FOR ESTIMATOR.
+start_time = time.perf_counter()
+
+async def read_validated_upload(file: UploadFile) -> UploadedImage:
+    """
+    Read an image upload in bounded chunks (MAX_FILE_SIZE_MB), checking its real format.
+
+    Raises:
+        HTTPException 400: Empty file or content not an allowed image
+        HTTPException 413: File larger than MAX_FILE_SIZE_MB
+    """
+    try:
+        return await read_image_upload(file, settings.ALLOWED_IMAGE_FORMATS)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def persist_estimate(
+    db: Session,
+    user_id: Optional[int],
+    filename: str,
+    image_path: str,
+    healthy: int,
+    damaged: int,
+    total: int,
+    health_index: float,
+    model_version: str,
+    inference_time_ms: float,
+    detections: Optional[dict] = None,
+    orchard_id: Optional[int] = None,
+    tree_id: Optional[int] = None,
+    user_notes: Optional[str] = None,
+    image_status: str = IMAGE_STORED,
+    renditions: Optional[dict] = None
+) -> Tuple[int, Optional[int]]:
     """
-    Validate that the uploaded file is a valid image.
+    Add the rows of one estimate to the current transaction (no commit).
+
+    The YieldRecord is always written. Image, Prediction and the Detections
+    (one bulk insert) are only written when both orchard_id and tree_id are
+    given, as Images require a tree.
 
     Args:
-        file: Uploaded file
+        db: Database session
+        user_id: Owner (None for guest records)
+        filename: Stored image filename
+        image_path: Stored image path or key
+        healthy, damaged, total: Fruit counts
+        health_index: Healthy percentage
+        model_version: Version of the model that produced the detections
+        inference_time_ms: Inference time in milliseconds
+        detections: Detections dict (boxes as xywh, class_ids, confidences)
+        orchard_id: Orchard ID
+        tree_id: Tree ID
+        user_notes: Notes stored on the prediction
+        image_status: IMAGE_PENDING while the image is stored in the background
+        renditions: Rendition name -> storage key (None: full image only)
+
+    Returns:
+        tuple: (record_id, prediction_id or None)
+    """
+    new_record = models.YieldRecord(
+        filename=filename,
+        healthy_count=healthy,
+        damaged_count=damaged,
+        total_count=total,
+        health_index=health_index,
+        user_id=user_id,
+        image_status=image_status,
+        renditions=renditions or None
+    )
+    db.add(new_record)
+    db.flush()
+
+    if orchard_id is None or tree_id is None:
+        return new_record.id, None
+
+    new_image = models.Image(
+        user_id=user_id,
+        orchard_id=orchard_id,
+        tree_id=tree_id,
+        image_path=image_path
+    )
+    db.add(new_image)
+    db.flush()
+
+    new_prediction = models.Prediction(
+        image_id=new_image.id,
+        model_version=model_version,
+        total_apples=total,
+        good_apples=healthy,
+        damaged_apples=damaged,
+        healthy_percentage=health_index,
+        user_notes=user_notes,
+        inference_time_ms=inference_time_ms
+    )
+    db.add(new_prediction)
+    db.flush()
+
+    if detections and len(detections["boxes"]) > 0:
+        db.bulk_save_objects([
+            models.Detection(
+                prediction_id=new_prediction.id,
+                class_label="damaged_apple" if class_id == 1 else "apple",
+                confidence=conf,
+                x_min=box[0],
+                y_min=box[1],
+                x_max=box[0] + box[2],
+                y_max=box[1] + box[3]
+            )
+            for box, class_id, conf in zip(
+                detections["boxes"],
+                detections["class_ids"],
+                detections["confidences"]
+            )
+        ])
+
+    return new_record.id, new_prediction.id
+
+
+def render_size(engine) -> Optional[int]:
+    """Model input side for rendering on the reduced decode (INFERENCE_REDUCED_DECODE), else None."""
+    return engine.input_size if settings.INFERENCE_REDUCED_DECODE else None
+
+
+async def store_processed_image(processed_image: bytes, filename: str) -> Tuple[str, Optional[dict]]:
+    """
+    Store a rendered image (S3 when configured, else under UPLOAD_DIR) and its
+    renditions, off the event loop.
+
+    Returns:
+        tuple: (stored path / key ('uploads/<filename>'), rendition keys or
+        None if they could not be made)
 
     Raises:
-        HTTPException 400: If format is invalid
+        StorageError: If the image could not be stored
     """
-    allowed_types = ["image/jpeg", "image/png", "image/jpg"]
-    
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file format. Allowed: {', '.join(allowed_types)}"
-        )
+    storage = get_storage()
+    key = f"uploads/{filename}"
+    image_path = await storage.aput(key, processed_image, "image/jpeg")
+
+    # Renditions are an optimisation: the full image is enough if they fail
+    try:
+        encoded = await amake_renditions(processed_image)
+        for name, (data, content_type) in encoded.items():
+            await storage.aput(rendition_key(key, name), data, content_type)
+    except Exception as e:
+        logger.warning("Renditions not stored", key=key, error=str(e))
+        return image_path, None
+    return image_path, rendition_keys(key)
 
-# MAIN ENDPOINT FOR ESTIMATOR.
-start_time = time.perf_counter()
 
 @router.post("/estimate")
 async def create_yield_estimate(
@@ -115,6 +261,10 @@ async def create_yield_estimate(
     tree_id: Optional[int] = None,
     confidence_threshold: float = 0.5,
     preview: bool = True,
+    fruit: str = "apple",
+    tile_size: Optional[int] = None,
+    tile_overlap: Optional[float] = None,
+    use_cache: bool = True,
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(deps.get_current_user_optional)
 ) :
@@ -126,7 +276,9 @@ async def create_yield_estimate(
        - orchard_id and tree_id are optional/ignored
        - No DB save; returns inference results only
     2. AUTHENTICATED MODE + PREVIEW:
-       - preview=True (default): Process image but don't save to DB (for user review)
+       - preview=True (default): Process image but don't save to DB (for user review).
+         The result is kept server-side; X-Preview-ID saves it with
+         POST /preview/{preview_id}/save (no re-upload, no re-inference)
        - preview=False: Save to DB immediately
     3. AUTHENTICATED MODE + SAVE:
        - Saves to DB: Image, Prediction, Detections, YieldRecord
@@ -137,6 +289,11 @@ async def create_yield_estimate(
         tree_id: Tree ID (optional)
         confidence_threshold: Confidence threshold for detections
         preview: If True, process but don't save to DB (default: True)
+        fruit: Crop to detect; selects the model (default: apple)
+        tile_size: Tiled inference for high-resolution photos, tile side in pixels
+            (default: INFERENCE_TILE_SIZE; 0 disables tiling)
+        tile_overlap: Overlap between tiles, 0-0.5 (default: INFERENCE_TILE_OVERLAP)
+        use_cache: Reuse the result of an identical earlier upload (False forces a re-run)
         db: Database session
         current_user: Optional authenticated user
 
@@ -147,8 +304,23 @@ async def create_yield_estimate(
         HTTPException: On validation or processing errors
     """
 
-    validate_image_file(file)
+    try:
+        validate_tile_params(
+            tile_size or None,
+            settings.INFERENCE_TILE_OVERLAP if tile_overlap is None else tile_overlap,
+            settings.MODEL_INPUT_SIZE
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
+    # Resolve the crop model up front (unknown crops fail before any work)
+    try:
+        fruit_registry = fruit_models.registry_for(fruit)
+    except UnknownFruit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No model available for fruit '{fruit}'. Available: {', '.join(fruit_models.fruits())}"
+        )
 
     is_guest_mode = current_user is None
     
@@ -175,33 +347,69 @@ async def create_yield_estimate(
                 db
             )    
 
+    # Per-stage timings (decode ... upload): /metrics histograms + sampled logs
+    trace = start_inference_trace(fruit=fruit, mode="guest" if is_guest_mode else "authenticated", preview=preview)
+
     # Read image bytes for inference
     try:
         start_time = time.time()
-        image_bytes = await file.read()
-        
-        if len(image_bytes) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Empty image file"
-            )
+        # Chunked read: size limit, magic-byte format check and SHA-256 on the way
+        upload = await read_validated_upload(file)
+
+        # Model is loaded lazily (or already warm from startup)
+        model_engine = await fruit_registry.aget()
+
+        # Decoded lazily, once, and shared by inference and rendering
+        image = DecodedImage.from_bytes(upload.data, filename=file.filename, content_hash=upload.content_hash)
+
         deep_confidence_threshold = 0.64*confidence_threshold
+
+        # Same photo + model + parameters -> cached result (re-uploads, preview then save)
+        cache_status = "BYPASS"
+        detection_results = None
+        inference_id = None
+        if use_cache and inference_cache.enabled:
+            cache_key = result_cache_key(
+                image.content_hash,
+                model_engine.model_version,
+                deep_confidence_threshold,
+                tile_size,
+                tile_overlap,
+                fruit=fruit
+            )
+            detection_results = await inference_cache.get(cache_key)
+            cache_status = "HIT" if detection_results is not None else "MISS"
+
         # Run inference
-        detection_results = model_engine.run_inference(image_bytes, deep_confidence_threshold)
-        print(f"\n{'='*60}")
-        print(f"Archivo: {file.filename}")
-        print(f"Resultados: {detection_results}")
-        print(f"{'='*60}\n")
-        
-        #   Logging for debugging
-        print(f"\n{'='*60}")
-        print(f" File: {file.filename}")
-        print(f" User: {current_user.name if current_user else 'GUEST'}")
-        print(f" Orchard: {orchard_id or 'None'}")
-        print(f" Tree: {tree_id or 'None'}")
-        print(f" Results: {detection_results['counts']}")
-        print(f"{'='*60}\n")
-        
+        candidates = None
+        if detection_results is None:
+            detection_results = await inference_executor.run(
+                model_engine.run_inference,
+                image,
+                deep_confidence_threshold,
+                tile_size=tile_size,
+                tile_overlap=tile_overlap,
+                return_candidates=True
+            )
+            candidates = detection_results.pop("candidates", None)
+            if cache_status == "MISS":
+                # Candidates are cached too, so re-uploads keep the slider/refilter flow
+                cached = dict(detection_results)
+                if candidates is not None:
+                    cached["candidates"] = candidates.to_dict()
+                await inference_cache.set(cache_key, cached)
+        elif detection_results.get("candidates") is not None:
+            candidates = CandidateSet.from_dict(detection_results["candidates"])
+
+        # Keep the pre-NMS candidates so threshold changes skip the model
+        if candidates is not None:
+            inference_id = candidate_store.put(CandidateEntry(
+                candidates=candidates,
+                image=image,
+                engine=model_engine,
+                user_id=current_user.id if current_user else None,
+                fruit=fruit
+            ))
         #   Extract results
         counts = detection_results["counts"]
         detections_data = detection_results["detections"]
@@ -218,106 +426,90 @@ async def create_yield_estimate(
         
         #   Generate unique filename for storage and record
         unique_filename = f"{uuid.uuid4()}_{os.path.basename(file.filename)}"
-        image_save_path = f"uploads/{unique_filename}"
+        image_key = f"uploads/{unique_filename}"
+        image_save_path = get_storage().location(image_key)
+        # Thumbnail / medium renditions for the history and dashboard views (not for guests)
+        renditions = rendition_keys(image_key) if not is_guest_mode else {}
 
         # Initialize prediction_id and record_id
         prediction_id = None
         record_id = None
 
         # Only save to database if NOT in preview mode
+        db_started = time.perf_counter()
         if not preview:
-            # Save to YieldRecord (global history)
-            new_record = models.YieldRecord(
+            record_id, prediction_id = persist_estimate(
+                db,
+                user_id=current_user.id if current_user else None,
                 filename=unique_filename,
-                healthy_count=healthy,
-                damaged_count=damaged,
-                total_count=total,
+                image_path=image_save_path,
+                healthy=healthy,
+                damaged=damaged,
+                total=total,
                 health_index=health_idx,
-                user_id=current_user.id if current_user else None
-            )
-            db.add(new_record)
-            db.flush()
-            record_id = new_record.id
-            print(f" Record saved with ID: {new_record.id}")
-
-        if not preview and not is_guest_mode and orchard_id is not None:
-            # 2.1 Guardar Image
-            new_image = models.Image(
-                user_id=current_user.id,
+                model_version=model_engine.model_version,
+                inference_time_ms=inference_time,
+                detections=detections_data,
                 orchard_id=orchard_id,
-                tree_id=tree_id,  # Puede ser None si no se especificó
-                image_path=image_save_path
+                tree_id=tree_id,
+                image_status=IMAGE_PENDING,
+                renditions=renditions
             )
-            db.add(new_image)
-            db.flush()
-            
-            
-            new_prediction = models.Prediction(
-                image_id=new_image.id,
-                model_version="YOLOv8s-Cyberpunk-v1",
-                total_apples=total,
-                good_apples=healthy,
-                damaged_apples=damaged,
-                healthy_percentage=health_idx,
-                inference_time_ms=inference_time
-            )
-            db.add(new_prediction)
-            db.flush()
-            print(f" Prediction saved with ID: {new_prediction.id}")
-            prediction_id = new_prediction.id
-            print(f" Prediction ID: {prediction_id}")
-            # 2.3 Guardar Detections (Bulk insert)
-            if len(detections_data["boxes"]) > 0:
-                new_detections = [
-                    models.Detection(
-                        prediction_id=prediction_id,
-                        class_label="apple" if class_id == 0 else "damaged_apple",
-                        confidence=conf,
-                        x_min=box[0], 
-                        y_min=box[1],
-                        x_max=box[0] + box[2], 
-                        y_max=box[1] + box[3]
-                    )
-                    for box, class_id, conf in zip(
-                        detections_data["boxes"],
-                        detections_data["class_ids"],
-                        detections_data["confidences"]
-                    )
-                ]
-                db.bulk_save_objects(new_detections)
-
-        # Commit only if not in preview mode
-        if not preview:
             db.commit()
-            print(f"✅ Saved to database - Record ID: {record_id}, Prediction ID: {prediction_id}")
+        trace.add("db_commit", (time.perf_counter() - db_started) * 1000)
         
 
-        processed_image = draw_cyberpunk_detections(
-        image_bytes, 
-        detections_data, 
-        threshold=0.85*confidence_threshold
-         )
+        with trace.stage("render"):
+            processed_image = await inference_executor.run(
+                draw_cyberpunk_detections,
+                image,
+                detections_data,
+                0.85*confidence_threshold,
+                render_size(model_engine)
+            )
         
-        os.makedirs("uploads", exist_ok=True)
-    
-        if  s3_is_configured():
-    
-            image_save_path = upload_image_to_s3( processed_image, unique_filename)
-
-        else : 
-
-            with open( image_save_path,  "wb" ) as f: 
-                
-                f.write(processed_image)
-	        
+        # The client gets the image in this response: storing it can wait.
+        # Queued for the persistence workers, or stored now if they are not running / full
+        # Storage latency is recorded by ImagePersister.store ("upload" stage)
+        with trace.stage("enqueue"):
+            queued = image_persister.submit(image_key, processed_image, "image/jpeg", bool(renditions))
+        if not queued:
+            stored, rendered = await image_persister.store(image_key, processed_image, "image/jpeg", bool(renditions))
+            if record_id is not None:
+                mark_image_status(
+                    db, image_key, IMAGE_STORED if stored else IMAGE_FAILED,
+                    clear_renditions=bool(renditions) and not rendered
+                )
+                db.commit()
+
+        # Keep the preview result so saving it needs only the preview ID
+        preview_id = None
+        if preview and not is_guest_mode:
+            preview_id = await preview_store.save({
+                "user_id": current_user.id,
+                "filename": unique_filename,
+                "image_key": image_key,
+                "image_path": image_save_path,
+                "healthy": healthy,
+                "damaged": damaged,
+                "total": total,
+                "health_index": health_idx,
+                "inference_time_ms": inference_time,
+                "model_version": model_engine.model_version,
+                "detections": detections_data,
+                "orchard_id": orchard_id,
+                "tree_id": tree_id,
+                "renditions": renditions
+            })
+
+        trace.finish(
+            model_version=model_engine.model_version,
+            detections=total,
+            record_id=record_id,
+            cache=cache_status
+        )
 
         # Return Response with processed image and headers
-        end_time = time.perf_counter()
-        total_time = end_time - start_time
-        ms = (end_time - start_time) / 1000
-        logger.warning("Model inference slow", inference_time_ms=ms)
-        #logger.warning("Model inference slow", extra={"inference_time_ms": ms})
-        
         return Response(
             content=processed_image,
             media_type="image/jpeg",
@@ -331,25 +523,44 @@ async def create_yield_estimate(
                 "X-Prediction-ID": str(prediction_id) if prediction_id else "None",
                 "X-Preview-Mode": str(preview).lower(),
                 "X-Mode": "guest" if is_guest_mode else "authenticated",
+                "X-Cache": cache_status,
+                "X-Inference-ID": inference_id or "None",
+                "X-Preview-ID": preview_id or "None",
                 "X-Orchard-ID": str(orchard_id) if orchard_id else "None",
                 "X-Tree-ID": str(tree_id) if tree_id else "None",
                 "X-Confidences": json.dumps(detections_data["confidences"]),
                 "X-Image-Path": image_save_path,
-                "Access-Control-Expose-Headers": "X-Healthy-Count, X-Damaged-Count, X-Total-Count, X-Health-Index, X-Inference-Time-Ms, X-Record-ID, X-Prediction-ID, X-Confidences, X-Preview-Mode, X-Image-Path"
+                "Access-Control-Expose-Headers": "X-Healthy-Count, X-Damaged-Count, X-Total-Count, X-Health-Index, X-Inference-Time-Ms, X-Record-ID, X-Prediction-ID, X-Confidences, X-Preview-Mode, X-Image-Path, X-Cache, X-Inference-ID, X-Preview-ID"
             }
         )
         
     except HTTPException:
         # Re-raise HTTP exceptions (validaciones)
         raise
+
+    except ModelUnavailable as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Inference model unavailable: {str(e)}",
+            headers={"Retry-After": str(settings.INFERENCE_RETRY_AFTER_SECONDS)}
+        )
+
+    except InferenceQueueFull as e:
+        # Backpressure: every worker busy and the queue is full
+        db.rollback()
+        logger.warning("Inference queue saturated", **inference_executor.stats())
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Inference service is busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
         
     except Exception as e:
         # Rollback en caso de error
         db.rollback()
         
-        print(f"[X  ERROR] Error en estimación: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Estimation failed", filename=file.filename, error=str(e))
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -357,6 +568,564 @@ async def create_yield_estimate(
         )
 
 
+def validate_batch_trees(db: Session, orchard_id: Optional[int], image_tree_ids: List[Optional[int]]) -> None:
+    """
+    Check, in one query, that every tree of a batch belongs to the orchard.
+
+    Raises:
+        HTTPException 400: Tree IDs without an orchard
+        HTTPException 404: Tree not found in the orchard
+    """
+    requested_trees = {tree_id for tree_id in image_tree_ids if tree_id is not None}
+    if not requested_trees:
+        return
+    if orchard_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tree ID cannot be provided without an Orchard ID."
+        )
+    found = {
+        tree_id for (tree_id,) in db.query(models.Tree.id).filter(
+            models.Tree.orchard_id == orchard_id,
+            models.Tree.id.in_(requested_trees)
+        )
+    }
+    missing = sorted(requested_trees - found)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Trees {missing} not found in orchard {orchard_id}"
+        )
+
+
+async def run_estimate_batch(
+    db: Session,
+    images: List[BatchImage],
+    image_tree_ids: List[Optional[int]],
+    user_id: int,
+    orchard_id: Optional[int],
+    confidence_threshold: float,
+    model_engine,
+    trace,
+    progress: Optional[Callable[[int], None]] = None
+) -> dict:
+    """
+    Estimate, render, store and add to the session every image of a batch (no commit).
+
+    Images are decoded and run through the model ESTIMATE_BATCH_CHUNK at a
+    time with stacked session runs.
+
+    Args:
+        db: Database session (the caller commits)
+        images: Batch images
+        image_tree_ids: Tree ID (or None) per image
+        user_id: Owner of the records
+        orchard_id: Orchard of the trees
+        confidence_threshold: Confidence threshold for detections
+        model_engine: AppleInference of the requested crop
+        trace: InferenceTrace of the request / job
+        progress: Called with the number of images done after every chunk
+
+    Returns:
+        dict: Batch summary and per-image results (record/prediction IDs, image path, counts or error)
+    """
+    deep_confidence_threshold = 0.64*confidence_threshold
+    chunk_size = max(1, settings.ESTIMATE_BATCH_CHUNK)
+    results = []
+
+    for start in range(0, len(images), chunk_size):
+        chunk = images[start:start + chunk_size]
+        decoded = [
+            DecodedImage.from_bytes(item.data, filename=item.filename, content_hash=item.content_hash)
+            for item in chunk
+        ]
+
+        chunk_started = time.time()
+        outputs = await inference_executor.run(
+            model_engine.run_batch_inference,
+            decoded,
+            deep_confidence_threshold
+        )
+        inference_time = round((time.time() - chunk_started) * 1000 / len(chunk), 2)
+
+        for offset, (item, image, output) in enumerate(zip(chunk, decoded, outputs)):
+            index = start + offset
+            tree_id = image_tree_ids[index]
+            if "error" in output:
+                results.append({"index": index, "filename": item.filename, "tree_id": tree_id,
+                                "status": "failed", "error": output["error"]})
+                continue
+
+            counts = output["counts"]
+            healthy = counts["red_apple"] + counts["green_apple"]
+            damaged = counts["damaged_apple"]
+            total = counts["total"]
+            health_idx = round((healthy / total * 100) if total > 0 else 0.0, 2)
+
+            unique_filename = f"{uuid.uuid4()}_{item.filename}"
+            with trace.stage("render"):
+                processed_image = await inference_executor.run(
+                    draw_cyberpunk_detections,
+                    image,
+                    output["detections"],
+                    0.85*confidence_threshold,
+                    render_size(model_engine)
+                )
+            with trace.stage("upload"):
+                image_path, renditions = await store_processed_image(processed_image, unique_filename)
+
+            with trace.stage("db_commit"):
+                record_id, prediction_id = persist_estimate(
+                    db,
+                    user_id=user_id,
+                    filename=unique_filename,
+                    image_path=image_path,
+                    healthy=healthy,
+                    damaged=damaged,
+                    total=total,
+                    health_index=health_idx,
+                    model_version=model_engine.model_version,
+                    inference_time_ms=inference_time,
+                    detections=output["detections"],
+                    orchard_id=orchard_id,
+                    tree_id=tree_id,
+                    renditions=renditions
+                )
+            results.append({
+                "index": index,
+                "filename": item.filename,
+                "tree_id": tree_id,
+                "status": "saved",
+                "record_id": record_id,
+                "prediction_id": prediction_id,
+                "image_path": image_path,
+                "healthy_count": healthy,
+                "damaged_count": damaged,
+                "total_count": total,
+                "health_index": health_idx
+            })
+
+        if progress is not None:
+            progress(start + len(chunk))
+
+    saved = [result for result in results if result["status"] == "saved"]
+    healthy = sum(result["healthy_count"] for result in saved)
+    damaged = sum(result["damaged_count"] for result in saved)
+    total = sum(result["total_count"] for result in saved)
+
+    return {
+        "status": "success",
+        "images": len(images),
+        "saved": len(saved),
+        "failed": len(results) - len(saved),
+        "summary": {
+            "healthy_count": healthy,
+            "damaged_count": damaged,
+            "total_count": total,
+            "health_index": round((healthy / total * 100) if total > 0 else 0.0, 2)
+        },
+        "results": results
+    }
+
+
+async def _collect_batch(
+    files: List[UploadFile],
+    tree_ids: Optional[str]
+) -> Tuple[List[BatchImage], List[Optional[int]]]:
+    """Batch images and their tree IDs, upload errors mapped to 400/413."""
+    try:
+        images = await collect_batch_images(
+            files,
+            settings.ALLOWED_IMAGE_FORMATS,
+            settings.ESTIMATE_BATCH_MAX_IMAGES,
+            settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        )
+        return images, parse_tree_ids(tree_ids, [image.filename for image in images])
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except BatchUploadError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _unknown_fruit(fruit: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"No model available for fruit '{fruit}'. Available: {', '.join(fruit_models.fruits())}"
+    )
+
+
+@router.post("/estimate/batch")
+async def create_batch_yield_estimate(
+    files: List[UploadFile] = File(...),
+    tree_ids: Optional[str] = Form(None),
+    orchard_id: Optional[int] = None,
+    confidence_threshold: float = 0.5,
+    fruit: str = "apple",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Estimate and save a whole batch of images in one request.
+
+    Images (many files, or zips of images) go through batched inference;
+    every image is rendered and stored, and all rows are committed in a
+    single transaction at the end. For uploads too slow to wait for, use
+    POST /jobs instead.
+
+    Args:
+        files: Image files and/or zip archives
+        tree_ids: JSON list of tree IDs aligned with the images, or JSON object
+            filename -> tree ID (images without a tree get a YieldRecord only)
+        orchard_id: Orchard of the trees (required with tree_ids)
+        confidence_threshold: Confidence threshold for detections
+        fruit: Crop to detect; selects the model (default: apple)
+        db: Database session
+        current_user: Authenticated user
+
+    Returns:
+        dict: Batch summary and per-image results (record/prediction IDs, image path, counts or error)
+
+    Raises:
+        HTTPException: 400 invalid upload or tree IDs, 404 unknown orchard/tree,
+            413 batch too large, 503 model unavailable or busy
+    """
+    try:
+        fruit_registry = fruit_models.registry_for(fruit)
+    except UnknownFruit:
+        raise _unknown_fruit(fruit)
+
+    validate_orchard_and_tree(orchard_id, None, current_user, db)
+    images, image_tree_ids = await _collect_batch(files, tree_ids)
+    validate_batch_trees(db, orchard_id, image_tree_ids)
+
+    trace = start_inference_trace(fruit=fruit, mode="batch", preview=False, images=len(images))
+
+    try:
+        model_engine = await fruit_registry.aget()
+        response = await run_estimate_batch(
+            db,
+            images,
+            image_tree_ids,
+            user_id=current_user.id,
+            orchard_id=orchard_id,
+            confidence_threshold=confidence_threshold,
+            model_engine=model_engine,
+            trace=trace
+        )
+        with trace.stage("db_commit"):
+            db.commit()
+
+    except ModelUnavailable as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Inference model unavailable: {str(e)}",
+            headers={"Retry-After": str(settings.INFERENCE_RETRY_AFTER_SECONDS)}
+        )
+
+    except InferenceQueueFull as e:
+        db.rollback()
+        logger.warning("Inference queue saturated", **inference_executor.stats())
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Inference service is busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    except Exception as e:
+        db.rollback()
+        logger.exception("Batch estimation failed", images=len(images), error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing batch: {str(e)}"
+        )
+
+    trace.finish(model_version=model_engine.model_version, detections=response["summary"]["total_count"], images=len(images))
+    return response
+
+
+def _job_status(job: models.EstimateJob) -> dict:
+    processed = job_queue.progress.get(job.id, job.processed_items or 0)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total_items": job.total_items,
+        "processed_items": processed,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error,
+        "result": job.result
+    }
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_estimate_job(
+    files: List[UploadFile] = File(...),
+    tree_ids: Optional[str] = Form(None),
+    orchard_id: Optional[int] = None,
+    confidence_threshold: float = 0.5,
+    fruit: str = "apple",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Queue a batch estimate and return immediately.
+
+    Same input as /estimate/batch. The uploads are validated, spooled to
+    JOBS_DIR and processed by the background job workers; poll
+    GET /jobs/{job_id} for progress and the result.
+
+    Args:
+        files: Image files and/or zip archives
+        tree_ids: JSON list (by position) or object (by filename) of tree IDs
+        orchard_id: Orchard of the trees (required with tree_ids)
+        confidence_threshold: Confidence threshold for detections
+        fruit: Crop to detect; selects the model (default: apple)
+        db: Database session
+        current_user: Authenticated user
+
+    Returns:
+        dict: Job ID, status and status URL (202 Accepted)
+    """
+    try:
+        fruit_models.registry_for(fruit)
+    except UnknownFruit:
+        raise _unknown_fruit(fruit)
+
+    validate_orchard_and_tree(orchard_id, None, current_user, db)
+    images, image_tree_ids = await _collect_batch(files, tree_ids)
+    validate_batch_trees(db, orchard_id, image_tree_ids)
+
+    job_id = uuid.uuid4().hex
+    input_dir = os.path.join(settings.JOBS_DIR, job_id)
+    os.makedirs(input_dir, exist_ok=True)
+    stored = []
+    for index, image in enumerate(images):
+        stored_name = f"{index:04d}_{image.filename}"
+        with open(os.path.join(input_dir, stored_name), "wb") as f:
+            f.write(image.data)
+        stored.append(stored_name)
+
+    job = job_queue.submit(db, models.EstimateJob(
+        id=job_id,
+        user_id=current_user.id,
+        kind="estimate_batch",
+        params={
+            "files": stored,
+            "tree_ids": image_tree_ids,
+            "orchard_id": orchard_id,
+            "confidence_threshold": confidence_threshold,
+            "fruit": fruit
+        },
+        input_dir=input_dir,
+        total_items=len(images)
+    ))
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total_items": job.total_items,
+        "status_url": f"/api/v1/estimator/jobs/{job.id}"
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_estimate_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Status, progress and (when finished) result of an estimate job.
+
+    Raises:
+        HTTPException 404: Unknown job or job of another user
+    """
+    job = db.get(models.EstimateJob, job_id)
+    if job is None or (job.user_id != current_user.id and current_user.role != UserRole.ADMIN):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return _job_status(job)
+
+
+async def run_estimate_batch_job(job: models.EstimateJob, db: Session, progress: Callable[[int], None]) -> dict:
+    """Job handler of "estimate_batch": runs the spooled batch (the queue commits)."""
+    params = job.params
+    images = []
+    for stored_name in params["files"]:
+        with open(os.path.join(job.input_dir, stored_name), "rb") as f:
+            images.append(BatchImage(stored_name.split("_", 1)[1], f.read()))
+
+    trace = start_inference_trace(fruit=params["fruit"], mode="job", preview=False, images=len(images))
+    try:
+        model_engine = await fruit_models.aget(params["fruit"])
+        result = await run_estimate_batch(
+            db,
+            images,
+            params["tree_ids"],
+            user_id=job.user_id,
+            orchard_id=params["orchard_id"],
+            confidence_threshold=params["confidence_threshold"],
+            model_engine=model_engine,
+            trace=trace,
+            progress=progress
+        )
+    except (ModelUnavailable, InferenceQueueFull) as e:
+        raise RetryJob(str(e) or type(e).__name__)
+
+    trace.finish(model_version=model_engine.model_version, detections=result["summary"]["total_count"], job_id=job.id)
+    shutil.rmtree(job.input_dir, ignore_errors=True)
+    return result
+
+
+job_queue.register("estimate_batch", run_estimate_batch_job)
+
+
+@router.post("/estimate/{inference_id}/refilter")
+async def refilter_yield_estimate(
+    inference_id: str,
+    confidence_threshold: float = 0.5,
+    preview_id: Optional[str] = None,
+    current_user: Optional[User] = Depends(deps.get_current_user_optional)
+):
+    """
+    Re-apply a new confidence threshold to a recent estimate.
+
+    Uses the candidates kept by ``/estimate`` (X-Inference-ID header): only
+    thresholding, NMS and rendering run again, no upload and no model run.
+    Nothing is saved to the DB. With ``preview_id`` the preview session takes
+    the new counts, detections and rendered image, so
+    POST /preview/{preview_id}/save commits what the user is looking at.
+
+    Args:
+        inference_id: X-Inference-ID returned by /estimate
+        confidence_threshold: New confidence threshold (same scale as /estimate)
+        preview_id: X-Preview-ID of the same estimate, updated with the new result
+        current_user: Optional authenticated user (must own the estimate)
+
+    Returns:
+        Response: Processed image (JPEG) with the same count headers as /estimate
+
+    Raises:
+        HTTPException 404: Unknown or expired inference ID or preview
+        HTTPException 400: Threshold below the stored candidate floor
+    """
+    entry = candidate_store.get(inference_id)
+    # Estimates of a user are only visible to that user (guest ones to the ID holder)
+    if entry is None or (entry.user_id is not None and (current_user is None or current_user.id != entry.user_id)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Estimate not found or expired, please upload the image again"
+        )
+
+    session = None
+    if preview_id is not None:
+        session = await preview_store.get(preview_id)
+        if session is None or current_user is None or session["user_id"] != current_user.id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Preview not found or expired")
+
+    deep_confidence_threshold = 0.64*confidence_threshold
+    if deep_confidence_threshold < entry.candidates.conf_floor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"confidence_threshold must be at least {entry.candidates.conf_floor / 0.64:.2f}"
+        )
+
+    trace = start_inference_trace(fruit=entry.fruit, mode="refilter", preview=True)
+    # Decoded for this call only (the store keeps the encoded bytes)
+    image = entry.load_image()
+    try:
+        with trace.stage("postprocess"):
+            detection_results = await inference_executor.run(
+                entry.engine.refilter,
+                entry.candidates,
+                deep_confidence_threshold,
+                image
+            )
+        with trace.stage("render"):
+            processed_image = await inference_executor.run(
+                draw_cyberpunk_detections,
+                image,
+                detection_results["detections"],
+                0.85*confidence_threshold,
+                render_size(entry.engine)
+            )
+    except InferenceQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Inference service is busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    counts = detection_results["counts"]
+    healthy = counts["red_apple"] + counts["green_apple"]
+    total = counts["total"]
+    health_idx = round((healthy / total * 100) if total > 0 else 0.0, 2)
+
+    if session is not None:
+        # New key: the upload of the original preview image may still be in flight
+        unique_filename = f"{uuid.uuid4()}_{session['filename'].split('_', 1)[-1]}"
+        image_key = f"uploads/{unique_filename}"
+        renditions = rendition_keys(image_key) if session.get("renditions") else {}
+        with trace.stage("enqueue"):
+            queued = image_persister.submit(image_key, processed_image, "image/jpeg", bool(renditions))
+        if not queued:
+            await image_persister.store(image_key, processed_image, "image/jpeg", bool(renditions))
+        session.update({
+            "filename": unique_filename,
+            "image_key": image_key,
+            "image_path": get_storage().location(image_key),
+            "healthy": healthy,
+            "damaged": counts["damaged_apple"],
+            "total": total,
+            "health_index": health_idx,
+            "detections": detection_results["detections"],
+            "renditions": renditions
+        })
+        await preview_store.save(session, preview_id)
+
+    elapsed_ms = trace.finish(detections=total)
+
+    return Response(
+        content=processed_image,
+        media_type="image/jpeg",
+        headers={
+            "X-Healthy-Count": str(healthy),
+            "X-Damaged-Count": str(counts["damaged_apple"]),
+            "X-Total-Count": str(total),
+            "X-Health-Index": str(health_idx),
+            "X-Inference-Time-Ms": str(round(elapsed_ms, 2)),
+            "X-Inference-ID": inference_id,
+            "X-Preview-ID": preview_id or "None",
+            "X-Preview-Mode": "true",
+            "X-Confidences": json.dumps(detection_results["detections"]["confidences"]),
+        }
+    )
+
+
+@router.get("/inference-stats")
+async def get_inference_stats():
+    """
+    Runtime metrics of the inference engine.
+
+    Returns:
+        dict: Worker pool queue depth / wait time and micro-batching fill metrics
+              (batching is null when disabled)
+    """
+    engine = model_registry.peek()
+    scheduler = engine.batch_scheduler if engine is not None else None
+
+    return {
+        "model": model_registry.status(),
+        "fruit_models": fruit_models.stats(),
+        "cache": inference_cache.stats(),
+        "refilter": candidate_store.stats(),
+        "executor": inference_executor.stats(),
+        "batching": scheduler.stats() if scheduler is not None else None,
+    }
+
+
 @router.get("/history")
 async def get_estimation_history(
     skip: int = 0,
@@ -456,13 +1225,11 @@ async def delete_estimation_record(
     
     # Delete physical file if exists
     
-    from app.utils.s3_storage import delete_image_from_s3,  s3_is_configured 
-    if s3_is_configured():
-	
-	    delete_image_from_s3(f"uploads/{record.filename}")
-
-    elif os.path.exists(f"upload/{record.filename}"):
-	    os.remove(f"uploads/{record.filename}")
+    if record.filename:
+        storage = get_storage()
+        await storage.adelete(f"uploads/{record.filename}")
+        for key in (record.renditions or {}).values():
+            await storage.adelete(key)
 
 
     db.delete(record)
@@ -483,7 +1250,9 @@ async def save_detection_after_review(
     """
     Save detection results to database after user review.
 
-    This endpoint is called after user reviews the preview and decides to save.
+    Legacy: the client sends back the counts and image path. Prefer
+    POST /preview/{preview_id}/save, which saves the server-side result
+    of the preview run.
 
     Args:
         request: Detection data including counts, notes, and orchard/tree IDs
@@ -538,7 +1307,7 @@ async def save_detection_after_review(
             # Create prediction with user notes
             new_prediction = models.Prediction(
                 image_id=new_image.id,
-                model_version="YOLOv8s-Cyberpunk-v1",
+                model_version=model_registry.model_version,
                 total_apples=request.total_count,
                 good_apples=request.healthy_count,
                 damaged_apples=request.damaged_count,
@@ -579,6 +1348,106 @@ async def save_detection_after_review(
         )
 
 
+@router.post("/preview/{preview_id}/save")
+async def save_preview(
+    preview_id: str,
+    request: Optional[yield_schema.SavePreviewRequest] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Save a preview estimate by its ID.
+
+    The counts, detections and stored image of the preview run are committed
+    in one transaction: nothing is uploaded or processed again. A preview
+    can be saved once; it expires after PREVIEW_TTL_SECONDS.
+
+    Args:
+        preview_id: X-Preview-ID returned by /estimate?preview=true
+        request: Optional notes and orchard/tree overrides
+        db: Database session
+        current_user: Authenticated user
+
+    Returns:
+        dict: Success message with record and prediction IDs
+
+    Raises:
+        HTTPException: 404 if the preview is unknown, expired, already saved or
+            owned by another user; 400/403/404 on invalid orchard or tree
+    """
+    request = request or yield_schema.SavePreviewRequest()
+
+    session = await preview_store.get(preview_id)
+    if session is None or session["user_id"] != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Preview not found or expired")
+
+    orchard_id = request.orchard_id if request.orchard_id is not None else session["orchard_id"]
+    tree_id = request.tree_id if request.tree_id is not None else session["tree_id"]
+    if orchard_id is None and tree_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tree ID cannot be provided without an Orchard ID."
+        )
+    if orchard_id is not None:
+        validate_orchard_and_tree(orchard_id, tree_id, current_user, db)
+
+    # Taken out before writing: concurrent saves of one preview commit once
+    session = await preview_store.pop(preview_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Preview not found or expired")
+
+    try:
+        record_id, prediction_id = persist_estimate(
+            db,
+            user_id=current_user.id,
+            filename=session["filename"],
+            image_path=session["image_path"],
+            healthy=session["healthy"],
+            damaged=session["damaged"],
+            total=session["total"],
+            health_index=session["health_index"],
+            model_version=session["model_version"],
+            inference_time_ms=session["inference_time_ms"],
+            detections=session["detections"],
+            orchard_id=orchard_id,
+            tree_id=tree_id,
+            user_notes=request.user_notes,
+            image_status=IMAGE_PENDING,
+            renditions=session.get("renditions")
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        # Give the preview back so the user can retry
+        await preview_store.save(session, preview_id)
+        logger.exception("Saving preview failed", preview_id=preview_id, error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error saving preview: {str(e)}"
+        )
+
+    # The preview image may still be queued: the persister (or the dead-letter
+    # retry) marks the record once it is stored. If that already happened
+    # before the commit above nothing matched, so check the storage now.
+    image_key = session.get("image_key") or f"uploads/{session['filename']}"
+    try:
+        if await get_storage().aexists(image_key):
+            mark_image_status(db, image_key, IMAGE_STORED)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Could not check preview image", preview_id=preview_id, key=image_key, error=str(e))
+
+    logger.info("Preview saved", preview_id=preview_id, user_id=current_user.id, record_id=record_id, prediction_id=prediction_id)
+
+    return {
+        "status": "success",
+        "message": "Detection saved successfully",
+        "record_id": record_id,
+        "prediction_id": prediction_id
+    }
+
+
 @router.patch("/prediction/{prediction_id}/notes")
 async def update_prediction_notes(
 
@@ -1,16 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.db import models
 from app.api import deps
 from app.db.models.users import User, UserRole
 from app.schemas import yield_schema
-from typing import List
+from typing import List, Optional
+from app.core.config import settings
 from app.core.logging import logger
-from app.utils.s3_storage import get_presigned_url  , s3_is_configured
+from app.utils.renditions import IMAGE_SIZES, image_url
+from app.utils.storage import get_storage
 
 router = APIRouter()
 
+# Records signed per /image-urls call
+MAX_IMAGE_URLS = 500
+
+
+def validate_image_size(size: str) -> None:
+    if size not in IMAGE_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown image size '{size}'. Available: {', '.join(IMAGE_SIZES)}"
+        )
+
 @router.get("/", response_model=List[yield_schema.YieldResponse])
 async def get_all_estimates(
     skip: int = 0,
@@ -36,6 +49,53 @@ async def get_all_estimates(
     
     return records
 
+@router.get("/image-urls")
+async def get_image_urls(
+    record_ids: Optional[List[int]] = Query(default=None),
+    skip: int = 0,
+    limit: int = 100,
+    size: str = "thumb",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Image URLs of a whole page of records in one call (history list views).
+
+    Pages like ``GET /`` (newest first); ``record_ids`` picks the records
+    instead. Non-admins only get their own records, others are left out.
+    ``size`` is "thumb" (default), "medium" or "full"; records without
+    renditions get the full image.
+    """
+    validate_image_size(size)
+    query = db.query(models.YieldRecord)
+    if current_user.role != UserRole.ADMIN:
+        query = query.filter(models.YieldRecord.user_id == current_user.id)
+
+    if record_ids:
+        records = query.filter(models.YieldRecord.id.in_(record_ids[:MAX_IMAGE_URLS])).all()
+        position = {record_id: index for index, record_id in enumerate(record_ids)}
+        records.sort(key=lambda record: position[record.id])
+    else:
+        records = query.order_by(models.YieldRecord.created_at.desc())\
+            .offset(skip)\
+            .limit(min(limit, MAX_IMAGE_URLS))\
+            .all()
+
+    storage = get_storage()
+    expires_in = settings.PRESIGNED_URL_EXPIRY_SECONDS
+    return {
+        "source": storage.name,
+        "expires_in": expires_in,
+        "images": [
+            {
+                "record_id": record.id,
+                "url": image_url(storage, record.filename, record.renditions, size) if record.filename else None,
+                "image_status": record.image_status
+            }
+            for record in records
+        ]
+    }
+
 @router.get("/{record_id}", response_model=yield_schema.YieldResponse)
 async def get_yield_estimate(
     record_id: int,
@@ -109,9 +169,11 @@ async def delete_estimate(
 @router.get("/{record_id}/image-url")
 async def get_image_url(
     record_id: int,
+    size: str = "full",
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
+    validate_image_size(size)
     record = db.query(models.YieldRecord).filter(
         models.YieldRecord.id == record_id
     ).first()
@@ -125,9 +187,6 @@ async def get_image_url(
     if not record.filename:
         raise HTTPException(status_code=404, detail="Imagen no disponible")
 
-    if s3_is_configured():
-        s3_key = f"uploads/{record.filename}"
-        url = get_presigned_url(s3_key, expiration_seconds=3600)
-        return {"url": url, "source": "s3"}
-    else:
-        return {"url": f"/outputs/{record.filename}", "source": "local"}
+    storage = get_storage()
+    url = image_url(storage, record.filename, record.renditions, size)
+    return {"url": url, "source": storage.name, "image_status": record.image_status}
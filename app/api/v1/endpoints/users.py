@@ -7,10 +7,12 @@ from app.db.models.users import User, UserRole
 from app.schemas.user_schema import UserCreate, UserUpdate, UserResponse
 from app.core import security
 from app.api import deps
+from app.core.config import settings
 from app.core.logging import logger
 
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from app.utils.s3_storage import upload_image_to_s3, get_presigned_url, delete_image_from_s3, s3_is_configured
+from app.utils.storage import StorageError, get_storage
+from app.utils.upload_stream import UploadError, UploadTooLarge, read_image_upload
 
 router = APIRouter()
 
@@ -236,67 +238,42 @@ async def upload_profile_picture(
             detail="You do not have permission to update this profile picture"
         )
 
-    # Validate file type
+    # Accepted formats, checked against the content (not the declared type) below
     allowed_types = ["image/jpeg", "image/png", "image/jpg", "image/webp"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file format. Allowed: {', '.join(allowed_types)}"
-        )
 
     # Find the user
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Read image bytes
-    image_bytes = await file.read()
-    if len(image_bytes) == 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Empty image file"
-        )
+    # Chunked read: size limit (MAX_FILE_SIZE_MB) and real format from the magic bytes
+    try:
+        upload = await read_image_upload(file, allowed_types)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    image_bytes = upload.data
 
-    # Delete old avatar from S3 if exists
-    if user.avatar_url and s3_is_configured():
-        # avatar_url is stored as 'avatars/filename.jpg'
-        delete_image_from_s3(user.avatar_url)
+    storage = get_storage()
 
-    # Generate unique filename and upload to S3 avatars/ folder
+    # Delete old avatar if exists (avatar_url is stored as 'avatars/filename.jpg')
+    if user.avatar_url:
+        await storage.adelete(user.avatar_url)
+
+    # Generate unique filename and upload to the avatars/ folder (S3, or UPLOAD_DIR locally)
     import uuid
-    extension = file.filename.rsplit(".", 1)[-1].lower()
+    extension = upload.extension
     unique_filename = f"{uuid.uuid4()}.{extension}"
     s3_key = f"avatars/{unique_filename}"
 
-    if s3_is_configured():
-        import boto3
-        import os
-        from botocore.exceptions import ClientError
-
-        client = boto3.client(
-            "s3",
-            region_name=os.getenv("AWS_REGION", "us-east-1"),
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    try:
+        await storage.aput(s3_key, image_bytes, upload.content_type)
+    except StorageError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
         )
-        try:
-            client.put_object(
-                Bucket=os.getenv("S3_BUCKET_NAME"),
-                Key=s3_key,
-                Body=image_bytes,
-                ContentType=file.content_type,
-            )
-        except ClientError as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error uploading image to S3: {e}"
-            )
-    else:
-        # Fallback local storage for development
-        import os
-        os.makedirs("uploads/avatars", exist_ok=True)
-        with open(f"uploads/avatars/{unique_filename}", "wb") as f:
-            f.write(image_bytes)
 
     # Save s3_key in DB as avatar_url
     user.avatar_url = s3_key
@@ -315,7 +292,8 @@ async def get_profile_picture_url(
 ):
     """
     Get a pre-signed URL for the user's profile picture from S3.
-    Valid for 1 hour.
+    Valid for PRESIGNED_URL_EXPIRY_SECONDS (1 hour by default); repeated
+    calls reuse the same URL while it is still fresh.
     """
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -327,11 +305,9 @@ async def get_profile_picture_url(
             detail="This user has no profile picture"
         )
 
-    if s3_is_configured():
-        url = get_presigned_url(user.avatar_url, expiration_seconds=3600)
-        return {"url": url, "source": "s3"}
-    else:
-        return {"url": f"/uploads/{user.avatar_url}", "source": "local"}
+    storage = get_storage()
+    url = storage.url(user.avatar_url, expires_in=settings.PRESIGNED_URL_EXPIRY_SECONDS)
+    return {"url": url, "source": storage.name}
     
 
 @router.delete("/{user_id}/profile-picture", response_model=UserResponse)
@@ -357,9 +333,9 @@ async def delete_profile_picture(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Delete from S3 if exists
-    if user.avatar_url and s3_is_configured():
-        delete_image_from_s3(user.avatar_url)
+    # Delete the stored image if exists
+    if user.avatar_url:
+        await get_storage().adelete(user.avatar_url)
 
     # Clear avatar_url in DB
     user.avatar_url = None
@@ -120,12 +120,82 @@ class Settings(BaseSettings):
     
     MODEL_INPUT_SIZE: int = Field(default=640, json_schema_extra={"env": "MODEL_INPUT_SIZE"})
     
+    # Load the model in a background thread at startup (False: on first request only)
+    MODEL_PRELOAD: bool = Field(default=True, json_schema_extra={"env": "MODEL_PRELOAD"})
+    
+    # Memory budget (MB) for on-demand sessions of other crops (mango, orange...);
+    # least recently used crops are unloaded beyond it
+    MODEL_MEMORY_BUDGET_MB: int = Field(default=1024, json_schema_extra={"env": "MODEL_MEMORY_BUDGET_MB"})
+    
+    # Warm-up after preload: synthetic session runs so ONNX Runtime allocates its
+    # arenas and picks kernels before real traffic (/ready stays 503 until done)
+    MODEL_WARMUP_ENABLED: bool = Field(default=True, json_schema_extra={"env": "MODEL_WARMUP_ENABLED"})
+    MODEL_WARMUP_ITERATIONS: int = Field(default=3, json_schema_extra={"env": "MODEL_WARMUP_ITERATIONS"})
+    # Batch sizes to warm (JSON list, e.g. [1, 4, 8]); empty: 1 and INFERENCE_BATCH_MAX_SIZE
+    MODEL_WARMUP_BATCH_SIZES: List[int] = Field(default=[], json_schema_extra={"env": "MODEL_WARMUP_BATCH_SIZES"})
+    
+    # Tiled inference for high-resolution photos: tile side in image pixels
+    # (0 disables; /estimate can override per request), overlap between tiles,
+    # an extra whole-image pass for fruits larger than a tile, and the max
+    # number of tiles per session run
+    INFERENCE_TILE_SIZE: int = Field(default=0, json_schema_extra={"env": "INFERENCE_TILE_SIZE"})
+    INFERENCE_TILE_OVERLAP: float = Field(default=0.2, json_schema_extra={"env": "INFERENCE_TILE_OVERLAP"})
+    INFERENCE_TILE_INCLUDE_FULL: bool = Field(default=True, json_schema_extra={"env": "INFERENCE_TILE_INCLUDE_FULL"})
+    INFERENCE_TILE_MAX_BATCH: int = Field(default=16, json_schema_extra={"env": "INFERENCE_TILE_MAX_BATCH"})
+    
+    # Inference instrumentation: fraction of requests whose per-stage timings are
+    # logged (at INFERENCE_LOG_LEVEL); requests slower than INFERENCE_SLOW_MS are
+    # always logged as warnings
+    INFERENCE_LOG_SAMPLE_RATE: float = Field(default=0.01, json_schema_extra={"env": "INFERENCE_LOG_SAMPLE_RATE"})
+    INFERENCE_LOG_LEVEL: str = Field(default="INFO", json_schema_extra={"env": "INFERENCE_LOG_LEVEL"})
+    INFERENCE_SLOW_MS: float = Field(default=2000.0, json_schema_extra={"env": "INFERENCE_SLOW_MS"})
+    
+    # Threshold changes without re-inference: candidates above this confidence are
+    # kept (per inference ID, REFILTER_TTL_SECONDS, up to REFILTER_CACHE_MB) so
+    # /estimate/{id}/refilter only re-runs threshold + NMS + rendering
+    REFILTER_MIN_CONFIDENCE: float = Field(default=0.05, json_schema_extra={"env": "REFILTER_MIN_CONFIDENCE"})
+    REFILTER_TTL_SECONDS: int = Field(default=900, json_schema_extra={"env": "REFILTER_TTL_SECONDS"})
+    REFILTER_CACHE_MB: int = Field(default=256, json_schema_extra={"env": "REFILTER_CACHE_MB"})
+    
+    # "letterbox" (aspect-preserving, YOLOv8 training default) or legacy "stretch"
+    PREPROCESS_MODE: str = Field(default="letterbox", json_schema_extra={"env": "PREPROCESS_MODE"})
+    
+    # Decode large JPEGs at 1/2, 1/4 or 1/8 resolution and run the model,
+    # color classification and rendering on that frame (no full decode; the
+    # result image is returned at the reduced resolution, at least the model
+    # input size). Off by default: measure with scrpts/bench_decode.py first.
+    INFERENCE_REDUCED_DECODE: bool = Field(default=False, json_schema_extra={"env": "INFERENCE_REDUCED_DECODE"})
+    
     CONFIDENCE_THRESHOLD: float = Field(
         default=0.45, 
         json_schema_extra={"env": "CONFIDENCE_THRESHOLD"}
     )
     
     NMS_THRESHOLD: float = Field(default=0.45, json_schema_extra={"env": "NMS_THRESHOLD"})
+    # Class-agnostic NMS: "apple" and "damaged_apple" boxes on the same fruit suppress each other
+    NMS_CLASS_AGNOSTIC: bool = Field(default=True, json_schema_extra={"env": "NMS_CLASS_AGNOSTIC"})
+    
+    # ONNX Runtime session tuning (0 threads = let ORT decide, i.e. all cores).
+    # With several uvicorn workers on one box, pin intra-op threads to cores / WORKERS.
+    ORT_GRAPH_OPTIMIZATION_LEVEL: str = Field(default="all", json_schema_extra={"env": "ORT_GRAPH_OPTIMIZATION_LEVEL"})  # disabled|basic|extended|all
+    ORT_EXECUTION_MODE: str = Field(default="sequential", json_schema_extra={"env": "ORT_EXECUTION_MODE"})  # sequential|parallel
+    ORT_INTRA_OP_NUM_THREADS: int = Field(default=0, json_schema_extra={"env": "ORT_INTRA_OP_NUM_THREADS"})
+    ORT_INTER_OP_NUM_THREADS: int = Field(default=0, json_schema_extra={"env": "ORT_INTER_OP_NUM_THREADS"})
+    ORT_ENABLE_CPU_MEM_ARENA: bool = Field(default=True, json_schema_extra={"env": "ORT_ENABLE_CPU_MEM_ARENA"})
+    ORT_ENABLE_MEM_PATTERN: bool = Field(default=True, json_schema_extra={"env": "ORT_ENABLE_MEM_PATTERN"})
+    ORT_ALLOW_SPINNING: bool = Field(default=True, json_schema_extra={"env": "ORT_ALLOW_SPINNING"})
+    ORT_OPTIMIZED_MODEL_PATH: Optional[str] = Field(default=None, json_schema_extra={"env": "ORT_OPTIMIZED_MODEL_PATH"})
+    
+    # Dynamic micro-batching of concurrent inference requests
+    INFERENCE_BATCHING_ENABLED: bool = Field(default=True, json_schema_extra={"env": "INFERENCE_BATCHING_ENABLED"})
+    INFERENCE_BATCH_MAX_SIZE: int = Field(default=8, json_schema_extra={"env": "INFERENCE_BATCH_MAX_SIZE"})
+    INFERENCE_BATCH_MAX_WAIT_MS: float = Field(default=5.0, json_schema_extra={"env": "INFERENCE_BATCH_MAX_WAIT_MS"})
+    
+    # Worker pool running inference off the event loop (backpressure when full);
+    # with micro-batching the pool has at least INFERENCE_BATCH_MAX_SIZE threads
+    INFERENCE_WORKERS: int = Field(default=2, json_schema_extra={"env": "INFERENCE_WORKERS"})
+    INFERENCE_QUEUE_SIZE: int = Field(default=16, json_schema_extra={"env": "INFERENCE_QUEUE_SIZE"})
+    INFERENCE_RETRY_AFTER_SECONDS: int = Field(default=2, json_schema_extra={"env": "INFERENCE_RETRY_AFTER_SECONDS"})
     
     # Model Classes, Now they are three (apple, damaged_apple)
     MODEL_CLASSES: List[str] = Field(
@@ -134,6 +204,34 @@ class Settings(BaseSettings):
     )
     
     MAX_FILE_SIZE_MB: int = Field(default=10, json_schema_extra={"env": "MAX_FILE_SIZE_MB"})
+    # Uploads are read (size-checked, hashed) this many bytes at a time
+    UPLOAD_CHUNK_SIZE: int = Field(default=1024 * 1024, json_schema_extra={"env": "UPLOAD_CHUNK_SIZE"})
+    # /estimate/batch: images per request, and images decoded + inferred together
+    ESTIMATE_BATCH_MAX_IMAGES: int = Field(default=200, json_schema_extra={"env": "ESTIMATE_BATCH_MAX_IMAGES"})
+    ESTIMATE_BATCH_CHUNK: int = Field(default=16, json_schema_extra={"env": "ESTIMATE_BATCH_CHUNK"})
+    # Asynchronous estimate jobs (/estimator/jobs): uploads spooled to JOBS_DIR, state in the DB.
+    # JOBS_WORKERS=0 only accepts jobs (e.g. a separate worker process runs them)
+    JOBS_WORKERS: int = Field(default=1, json_schema_extra={"env": "JOBS_WORKERS"})
+    JOBS_DIR: str = Field(default="job_spool", json_schema_extra={"env": "JOBS_DIR"})
+    JOBS_POLL_INTERVAL_SECONDS: float = Field(default=2.0, json_schema_extra={"env": "JOBS_POLL_INTERVAL_SECONDS"})
+    JOBS_MAX_ATTEMPTS: int = Field(default=3, json_schema_extra={"env": "JOBS_MAX_ATTEMPTS"})
+    JOBS_LEASE_SECONDS: int = Field(default=1800, json_schema_extra={"env": "JOBS_LEASE_SECONDS"})
+    # Rendered images are stored after the response by IMAGE_PERSIST_WORKERS tasks
+    # (0: stored before responding). The queue holds at most IMAGE_PERSIST_QUEUE_SIZE
+    # images; those still failing after the retries go to IMAGE_PERSIST_DEAD_LETTER_DIR
+    IMAGE_PERSIST_WORKERS: int = Field(default=2, json_schema_extra={"env": "IMAGE_PERSIST_WORKERS"})
+    IMAGE_PERSIST_QUEUE_SIZE: int = Field(default=256, json_schema_extra={"env": "IMAGE_PERSIST_QUEUE_SIZE"})
+    IMAGE_PERSIST_MAX_ATTEMPTS: int = Field(default=5, json_schema_extra={"env": "IMAGE_PERSIST_MAX_ATTEMPTS"})
+    IMAGE_PERSIST_RETRY_BACKOFF_SECONDS: float = Field(default=0.5, json_schema_extra={"env": "IMAGE_PERSIST_RETRY_BACKOFF_SECONDS"})
+    IMAGE_PERSIST_DEAD_LETTER_DIR: str = Field(default="dead_letter", json_schema_extra={"env": "IMAGE_PERSIST_DEAD_LETTER_DIR"})
+    IMAGE_PERSIST_DRAIN_SECONDS: float = Field(default=10.0, json_schema_extra={"env": "IMAGE_PERSIST_DRAIN_SECONDS"})
+    # Thumbnail / medium renditions stored next to every rendered image (list and
+    # detail views); long side in pixels, format "webp" or "jpeg"
+    RENDITIONS_ENABLED: bool = Field(default=True, json_schema_extra={"env": "RENDITIONS_ENABLED"})
+    RENDITION_FORMAT: str = Field(default="webp", json_schema_extra={"env": "RENDITION_FORMAT"})
+    RENDITION_QUALITY: int = Field(default=80, json_schema_extra={"env": "RENDITION_QUALITY"})
+    RENDITION_THUMB_SIZE: int = Field(default=320, json_schema_extra={"env": "RENDITION_THUMB_SIZE"})
+    RENDITION_MEDIUM_SIZE: int = Field(default=1024, json_schema_extra={"env": "RENDITION_MEDIUM_SIZE"})
     
     ALLOWED_IMAGE_FORMATS: List[str] = Field(
         default=["image/jpeg", "image/png", "image/jpg"],
@@ -151,6 +249,12 @@ class Settings(BaseSettings):
     
     CACHE_ENABLED: bool = Field(default=False, json_schema_extra={"env": "CACHE_ENABLED"})
     CACHE_TTL: int = Field(default=3600, json_schema_extra={"env": "CACHE_TTL"})  # 1 hora
+    # Inference result cache: in-memory LRU size, plus the shared Redis tier (REDIS_*)
+    CACHE_MAX_ENTRIES: int = Field(default=256, json_schema_extra={"env": "CACHE_MAX_ENTRIES"})
+    CACHE_REDIS_ENABLED: bool = Field(default=False, json_schema_extra={"env": "CACHE_REDIS_ENABLED"})
+    # Preview sessions (preview result kept server-side until saved): "memory" or "redis"
+    PREVIEW_STORE_BACKEND: str = Field(default="memory", json_schema_extra={"env": "PREVIEW_STORE_BACKEND"})
+    PREVIEW_TTL_SECONDS: int = Field(default=1800, json_schema_extra={"env": "PREVIEW_TTL_SECONDS"})
     
     # STORAGE (S3/Local)
     STORAGE_TYPE: str = Field(default="local", json_schema_extra={"env": "STORAGE_TYPE"})  # "local" o "s3"
@@ -160,8 +264,25 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: Optional[str] = Field(default=None, json_schema_extra={"env": "AWS_SECRET_ACCESS_KEY"})
     AWS_REGION: str = Field(default="us-east-1", json_schema_extra={"env": "AWS_REGION"})
     S3_BUCKET_NAME: Optional[str] = Field(default=None, json_schema_extra={"env": "S3_BUCKET_NAME"})
+    # S3-compatible endpoint (e.g. http://minio:9000); unset for AWS
+    S3_ENDPOINT_URL: Optional[str] = Field(default=None, json_schema_extra={"env": "S3_ENDPOINT_URL"})
+    # One pooled client per process; blocking storage calls run on STORAGE_IO_WORKERS threads
+    S3_MAX_POOL_CONNECTIONS: int = Field(default=32, json_schema_extra={"env": "S3_MAX_POOL_CONNECTIONS"})
+    STORAGE_IO_WORKERS: int = Field(default=8, json_schema_extra={"env": "STORAGE_IO_WORKERS"})
+    # Attempts per S3 request (exponential backoff between retries)
+    STORAGE_MAX_ATTEMPTS: int = Field(default=4, json_schema_extra={"env": "STORAGE_MAX_ATTEMPTS"})
+    # Pre-signed image URLs: validity, and an LRU of signed URLs reused while they
+    # still have more than PRESIGNED_URL_CACHE_MARGIN_SECONDS left (0 size disables it)
+    PRESIGNED_URL_EXPIRY_SECONDS: int = Field(default=3600, json_schema_extra={"env": "PRESIGNED_URL_EXPIRY_SECONDS"})
+    PRESIGNED_URL_CACHE_SIZE: int = Field(default=10000, json_schema_extra={"env": "PRESIGNED_URL_CACHE_SIZE"})
+    PRESIGNED_URL_CACHE_MARGIN_SECONDS: int = Field(default=300, json_schema_extra={"env": "PRESIGNED_URL_CACHE_MARGIN_SECONDS"})
     
     # MONITORING
+    # In-process metrics exposed on /metrics (Prometheus text format). With several
+    # workers, set METRICS_MULTIPROC_DIR to a directory shared by them (e.g. a tmpfs)
+    METRICS_ENABLED: bool = Field(default=True, json_schema_extra={"env": "METRICS_ENABLED"})
+    METRICS_MULTIPROC_DIR: Optional[str] = Field(default=None, json_schema_extra={"env": "METRICS_MULTIPROC_DIR"})
+    METRICS_FLUSH_INTERVAL_SECONDS: float = Field(default=5.0, json_schema_extra={"env": "METRICS_FLUSH_INTERVAL_SECONDS"})
     SENTRY_DSN: Optional[str] = Field(default=None, json_schema_extra={"env": "SENTRY_DSN"})
     ANALYTICS_ENABLED: bool = Field(default=True, json_schema_extra={"env": "ANALYTICS_ENABLED"})
     
@@ -230,6 +351,11 @@ def print_settings():
     print(f"Input Size:         {settings.MODEL_INPUT_SIZE}")
     print(f"Confidence Thresh:  {settings.CONFIDENCE_THRESHOLD}")
     print(f"NMS Threshold:      {settings.NMS_THRESHOLD}")
+    print(f"ORT Optimization:   {settings.ORT_GRAPH_OPTIMIZATION_LEVEL} ({settings.ORT_EXECUTION_MODE})")
+    print(f"ORT Threads:        intra={settings.ORT_INTRA_OP_NUM_THREADS or 'auto'}, inter={settings.ORT_INTER_OP_NUM_THREADS or 'auto'}")
+    print(f"Inference Workers:  {settings.INFERENCE_WORKERS} (queue {settings.INFERENCE_QUEUE_SIZE})")
+    print(f"Micro-batching:     {settings.INFERENCE_BATCHING_ENABLED} (max {settings.INFERENCE_BATCH_MAX_SIZE}, {settings.INFERENCE_BATCH_MAX_WAIT_MS} ms)")
+    print(f"Preload / Warm-up:  {settings.MODEL_PRELOAD} / {settings.MODEL_WARMUP_ENABLED} ({settings.MODEL_WARMUP_ITERATIONS} iterations)")
     print(f"Classes:            {', '.join(settings.MODEL_CLASSES)}")
     print("-"*70)
     print("🌐 CORS")
@@ -280,6 +406,12 @@ def validate_settings():
     if not 0 < settings.NMS_THRESHOLD < 1:
         errors.append("❌ NMS_THRESHOLD must be between 0 and 1")
     
+    if settings.ORT_GRAPH_OPTIMIZATION_LEVEL.lower() not in ("disabled", "basic", "extended", "all"):
+        errors.append("❌ ORT_GRAPH_OPTIMIZATION_LEVEL must be one of: disabled, basic, extended, all")
+    
+    if settings.ORT_EXECUTION_MODE.lower() not in ("sequential", "parallel"):
+        errors.append("❌ ORT_EXECUTION_MODE must be one of: sequential, parallel")
+    
     # Ensure upload dir exists
     upload_dir = Path(settings.UPLOAD_DIR)
     if not upload_dir.exists():
@@ -0,0 +1,299 @@
+"""
+Background persistence of rendered result images.
+
+The client gets the rendered JPEG in the response body, so storing it (local
+disk or S3) does not need to hold the response. ``submit`` puts the image on
+a bounded in-memory queue drained by IMAGE_PERSIST_WORKERS tasks, which
+store it with retries and exponential backoff. The YieldRecord is saved as
+``image_status="pending"`` and marked "stored" once the upload is confirmed.
+
+Images that still fail after IMAGE_PERSIST_MAX_ATTEMPTS are written to
+IMAGE_PERSIST_DEAD_LETTER_DIR (bytes + JSON metadata) and their record is
+marked "failed"; dead letters are retried on the next startup. When the
+queue is full or the workers are not running, the caller stores the image
+itself (``store``) instead of dropping it.
+
+With ``renditions=True`` the thumbnail and medium renditions are encoded
+and stored after the image, each with the same retries.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import record_stage
+from app.db.models.farming import YieldRecord, get_bogota_time
+from app.db.session import SessionLocal
+from app.utils.renditions import amake_renditions, rendition_key
+from app.utils.storage import get_storage
+
+IMAGE_PENDING = "pending"
+IMAGE_STORED = "stored"
+IMAGE_FAILED = "failed"
+
+# (key, data, content_type, renditions)
+PersistItem = Tuple[str, bytes, str, bool]
+
+
+def mark_image_status(db: Session, key: str, status: str, clear_renditions: bool = False) -> int:
+    """
+    Set ``image_status`` of the records whose image is stored under ``key``.
+
+    Args:
+        clear_renditions: Also forget the record's renditions (they could not be made)
+
+    Returns:
+        int: Records updated (0 for previews and guest estimates)
+    """
+    # created_at has onupdate=now: keep the estimate time, not the upload time
+    values = {YieldRecord.image_status: status, YieldRecord.created_at: YieldRecord.created_at}
+    if clear_renditions:
+        values[YieldRecord.renditions] = None
+    return db.query(YieldRecord).filter(
+        YieldRecord.filename == os.path.basename(key)
+    ).update(values, synchronize_session=False)
+
+
+class ImagePersister:
+    """Bounded queue of images to store, drained by asyncio worker tasks."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int = 2,
+        queue_size: int = 256,
+        max_attempts: int = 5,
+        retry_backoff_seconds: float = 0.5,
+        dead_letter_dir: str = "dead_letter",
+        drain_seconds: float = 10.0,
+    ):
+        """
+        Args:
+            session_factory: Creates DB sessions to update image_status
+            workers: Worker tasks per process (0: callers store inline)
+            queue_size: Images waiting at most (bounds the memory held)
+            max_attempts: Storage attempts per image before dead-lettering
+            retry_backoff_seconds: First retry delay, doubled on each retry
+            dead_letter_dir: Where images that could not be stored are kept
+            drain_seconds: Time given to the queue to empty on shutdown
+        """
+        self.session_factory = session_factory
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.dead_letter_dir = dead_letter_dir
+        self.drain_seconds = drain_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def submit(self, key: str, data: bytes, content_type: str = "image/jpeg", renditions: bool = False) -> bool:
+        """
+        Queue an image for storage.
+
+        Returns:
+            bool: False if it was not queued (workers not running or queue
+            full); the caller must then ``store`` it
+        """
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait((key, data, content_type, renditions))
+        except asyncio.QueueFull:
+            logger.warning("Image persistence queue full, storing inline", key=key, size=self.queue_size)
+            return False
+        return True
+
+    async def persist(self, key: str, data: bytes, content_type: str = "image/jpeg") -> bool:
+        """
+        Store an image, retrying with exponential backoff; dead-letter it on final failure.
+
+        Returns:
+            bool: True if the image was stored
+        """
+        storage = get_storage()
+        delay = self.retry_backoff_seconds
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await storage.aput(key, data, content_type)
+                return True
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logger.error("Image could not be stored", key=key, attempts=attempt, error=str(e))
+                    self._dead_letter(key, data, content_type, str(e))
+                    return False
+                logger.warning("Image storage failed, retrying", key=key, attempt=attempt, error=str(e))
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def store(
+        self,
+        key: str,
+        data: bytes,
+        content_type: str = "image/jpeg",
+        renditions: bool = False,
+    ) -> Tuple[bool, bool]:
+        """
+        Store an image, then its renditions.
+
+        Returns:
+            tuple: (image stored, renditions made); a rendition that cannot be
+            stored is dead-lettered like any image
+        """
+        # The "upload" stage: time to store the image, retries included
+        started = time.perf_counter()
+        stored = await self.persist(key, data, content_type)
+        record_stage("upload", time.perf_counter() - started)
+        if not renditions:
+            return stored, False
+        try:
+            encoded = await amake_renditions(data)
+        except Exception as e:
+            logger.warning("Renditions could not be made", key=key, error=str(e))
+            return stored, False
+        for name, (rendition_data, rendition_type) in encoded.items():
+            await self.persist(rendition_key(key, name), rendition_data, rendition_type)
+        return stored, True
+
+    def _dead_letter_base(self, key: str) -> str:
+        return os.path.join(self.dead_letter_dir, key.replace("/", "__"))
+
+    def _dead_letter(self, key: str, data: bytes, content_type: str, error: str, renditions: bool = False) -> None:
+        base = self._dead_letter_base(key)
+        try:
+            os.makedirs(self.dead_letter_dir, exist_ok=True)
+            with open(f"{base}.bin", "wb") as f:
+                f.write(data)
+            # Metadata last: a .json always has its bytes next to it
+            with open(f"{base}.json", "w") as f:
+                json.dump({
+                    "key": key,
+                    "content_type": content_type,
+                    "renditions": renditions,  # still to be made
+                    "error": error,
+                    "failed_at": get_bogota_time().isoformat(),
+                }, f)
+        except OSError as e:
+            logger.error("Could not write dead letter, image lost", key=key, error=str(e))
+
+    def _set_status(self, key: str, status: str, clear_renditions: bool = False) -> None:
+        db = self.session_factory()
+        try:
+            mark_image_status(db, key, status, clear_renditions)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Could not update image status", key=key, status=status, error=str(e))
+        finally:
+            db.close()
+
+    async def _store(self, item: PersistItem) -> None:
+        key, data, content_type, renditions = item
+        stored, rendered = await self.store(key, data, content_type, renditions)
+        self._set_status(key, IMAGE_STORED if stored else IMAGE_FAILED, clear_renditions=renditions and not rendered)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._store(item)
+            except asyncio.CancelledError:
+                # Stopped mid-upload: keep the image for the next startup
+                key, data, content_type, renditions = item
+                self._dead_letter(key, data, content_type, "not stored before shutdown", renditions)
+                raise
+            except Exception as e:
+                logger.exception("Image persistence worker error", worker=index, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def dead_letters(self) -> List[str]:
+        """Keys of the images waiting in the dead-letter directory."""
+        if not os.path.isdir(self.dead_letter_dir):
+            return []
+        keys = []
+        for name in sorted(os.listdir(self.dead_letter_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.dead_letter_dir, name)) as f:
+                    keys.append(json.load(f)["key"])
+        return keys
+
+    async def retry_dead_letters(self) -> int:
+        """
+        Try again to store the dead-lettered images (inline, one pass).
+
+        Returns:
+            int: Images stored (and removed from the dead-letter directory)
+        """
+        stored = 0
+        for key in self.dead_letters():
+            base = self._dead_letter_base(key)
+            with open(f"{base}.json") as f:
+                meta = json.load(f)
+            with open(f"{base}.bin", "rb") as f:
+                data = f.read()
+            os.remove(f"{base}.json")
+            os.remove(f"{base}.bin")
+            # A new failure writes the dead letter again
+            ok, _ = await self.store(key, data, meta["content_type"], meta.get("renditions", False))
+            if ok:
+                self._set_status(key, IMAGE_STORED)
+                stored += 1
+        if stored:
+            logger.info("Dead-lettered images stored", count=stored)
+        return stored
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self.workers <= 0 or self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name=f"image-persist-worker-{index}")
+            for index in range(self.workers)
+        ]
+        logger.info("Image persistence workers started", workers=self.workers, queue_size=self.queue_size)
+
+    async def stop(self) -> None:
+        """Give the queue drain_seconds to empty, then dead-letter what is left and stop."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.drain_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        left = 0
+        while not self._queue.empty():
+            key, data, content_type, renditions = self._queue.get_nowait()
+            self._dead_letter(key, data, content_type, "not stored before shutdown", renditions)
+            left += 1
+        if left:
+            logger.warning("Images dead-lettered at shutdown", count=left)
+        self._queue = None
+
+
+# Shared persister (workers started by the app startup hook)
+image_persister = ImagePersister(
+    SessionLocal,
+    workers=settings.IMAGE_PERSIST_WORKERS,
+    queue_size=settings.IMAGE_PERSIST_QUEUE_SIZE,
+    max_attempts=settings.IMAGE_PERSIST_MAX_ATTEMPTS,
+    retry_backoff_seconds=settings.IMAGE_PERSIST_RETRY_BACKOFF_SECONDS,
+    dead_letter_dir=settings.IMAGE_PERSIST_DEAD_LETTER_DIR,
+    drain_seconds=settings.IMAGE_PERSIST_DRAIN_SECONDS,
+)
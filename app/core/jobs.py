@@ -0,0 +1,266 @@
+"""
+Database-backed queue of asynchronous estimate jobs.
+
+Submitting a job spools the uploads to JOBS_DIR and inserts an
+``EstimateJob`` row; the HTTP request returns the job ID right away. Worker
+tasks (JOBS_WORKERS per process) claim queued rows with a conditional
+UPDATE, so several API processes (or a dedicated worker process) can share
+one queue. Running jobs refresh their heartbeat every third of
+JOBS_LEASE_SECONDS; jobs whose worker died (no heartbeat for a whole lease)
+are queued again, or failed once they used up JOBS_MAX_ATTEMPTS, and queued
+jobs simply wait in the table across restarts.
+"""
+import asyncio
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.models.farming import EstimateJob, get_bogota_time
+from app.db.session import SessionLocal
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# handler(job, db, progress) -> result stored on the job
+JobHandler = Callable[[EstimateJob, Session, Callable[[int], None]], Awaitable[dict]]
+
+
+class RetryJob(Exception):
+    """Transient failure (model unavailable, inference busy): run the job again later."""
+
+
+class JobQueue:
+    """Polls the estimate_jobs table and runs claimed jobs on asyncio worker tasks."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int = 1,
+        poll_interval_seconds: float = 2.0,
+        max_attempts: int = 3,
+        lease_seconds: float = 900,
+    ):
+        """
+        Args:
+            session_factory: Creates DB sessions for the workers
+            workers: Worker tasks per process (0: submit only, no processing)
+            poll_interval_seconds: Idle wait between queue polls
+            max_attempts: Runs of one job before it is marked failed
+            lease_seconds: Running jobs without heartbeat for this long are re-queued
+        """
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval_seconds = max(1.0, lease_seconds / 3)
+        self.handlers: Dict[str, JobHandler] = {}
+        # job id -> items done, for jobs running in this process
+        self.progress: Dict[str, int] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self.handlers[kind] = handler
+
+    def submit(self, db: Session, job: EstimateJob) -> EstimateJob:
+        """Insert a queued job and wake an idle worker."""
+        job.status = JOB_QUEUED
+        db.add(job)
+        db.commit()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        logger.info("Job queued", job_id=job.id, kind=job.kind, items=job.total_items)
+        return job
+
+    def requeue_stale(self, db: Session) -> int:
+        """
+        Queue again the running jobs whose worker stopped heart-beating.
+
+        Jobs that already used ``max_attempts`` runs are failed instead, so a
+        job that keeps killing its worker does not loop forever.
+        """
+        now = get_bogota_time()
+        stale = db.query(EstimateJob).filter(
+            EstimateJob.status == JOB_RUNNING,
+            EstimateJob.heartbeat_at < now - timedelta(seconds=self.lease_seconds)
+        )
+        failed = stale.filter(EstimateJob.attempts >= self.max_attempts).update({
+            EstimateJob.status: JOB_FAILED,
+            EstimateJob.error: "Worker stopped responding",
+            EstimateJob.finished_at: now,
+        }, synchronize_session=False)
+        count = stale.filter(EstimateJob.attempts < self.max_attempts).update(
+            {EstimateJob.status: JOB_QUEUED}, synchronize_session=False
+        )
+        db.commit()
+        if count:
+            logger.warning("Re-queued stale jobs", count=count)
+        if failed:
+            logger.error("Stale jobs out of attempts marked failed", count=failed)
+        return count
+
+    def heartbeat(self, job_id: str, attempt: int) -> bool:
+        """
+        Refresh the lease of a running job (own short transaction).
+
+        Returns:
+            bool: False if the job is no longer this run's (re-queued, finished)
+        """
+        db = self.session_factory()
+        try:
+            updated = db.query(EstimateJob).filter(
+                EstimateJob.id == job_id,
+                EstimateJob.status == JOB_RUNNING,
+                EstimateJob.attempts == attempt
+            ).update({EstimateJob.heartbeat_at: get_bogota_time()}, synchronize_session=False)
+            db.commit()
+            return bool(updated)
+        finally:
+            db.close()
+
+    async def _keep_alive(self, job_id: str, attempt: int) -> None:
+        """Heartbeat a running job until cancelled."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval_seconds)
+            try:
+                if not self.heartbeat(job_id, attempt):
+                    logger.warning("Job lease lost", job_id=job_id, attempts=attempt)
+                    return
+            except Exception as e:
+                logger.warning("Job heartbeat failed", job_id=job_id, error=str(e))
+
+    def claim_next(self, db: Session) -> Optional[EstimateJob]:
+        """Atomically move the oldest queued job to running (None if the queue is empty)."""
+        while True:
+            candidate = db.query(EstimateJob.id).filter(
+                EstimateJob.status == JOB_QUEUED
+            ).order_by(EstimateJob.created_at).first()
+            if candidate is None:
+                return None
+
+            now = get_bogota_time()
+            claimed = db.query(EstimateJob).filter(
+                EstimateJob.id == candidate.id,
+                EstimateJob.status == JOB_QUEUED
+            ).update({
+                EstimateJob.status: JOB_RUNNING,
+                EstimateJob.started_at: now,
+                EstimateJob.heartbeat_at: now,
+                EstimateJob.attempts: EstimateJob.attempts + 1,
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return db.get(EstimateJob, candidate.id)
+            # Another worker took it first; try the next one
+
+    async def process_next(self) -> bool:
+        """
+        Claim and run one job.
+
+        Returns:
+            bool: False when there was nothing to do
+        """
+        db = self.session_factory()
+        try:
+            self.requeue_stale(db)
+            job = self.claim_next(db)
+            if job is None:
+                return False
+
+            job_id = job.id
+            self.progress[job_id] = 0
+            # Long jobs keep their lease so no other worker claims them meanwhile
+            keep_alive = asyncio.create_task(self._keep_alive(job_id, job.attempts))
+
+            def progress(done: int) -> None:
+                self.progress[job_id] = done
+
+            handler = self.handlers.get(job.kind)
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler for job kind '{job.kind}'")
+                result = await handler(job, db, progress)
+            except RetryJob as e:
+                db.rollback()
+                job = db.get(EstimateJob, job_id)
+                job.error = str(e)
+                if job.attempts < self.max_attempts:
+                    job.status = JOB_QUEUED
+                    logger.warning("Job will be retried", job_id=job_id, attempts=job.attempts, error=str(e))
+                else:
+                    job.status = JOB_FAILED
+                    job.finished_at = get_bogota_time()
+            except Exception as e:
+                db.rollback()
+                logger.exception("Job failed", job_id=job_id, error=str(e))
+                job = db.get(EstimateJob, job_id)
+                job.status = JOB_FAILED
+                job.error = str(e)
+                job.finished_at = get_bogota_time()
+            else:
+                job = db.get(EstimateJob, job_id)
+                job.status = JOB_SUCCEEDED
+                job.result = result
+                job.processed_items = job.total_items
+                job.error = None
+                job.finished_at = get_bogota_time()
+                logger.info("Job finished", job_id=job_id, items=job.total_items)
+            finally:
+                keep_alive.cancel()
+                self.progress.pop(job_id, None)
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                busy = await self.process_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Job worker error", worker=index, error=str(e))
+                busy = False
+
+            if not busy:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self.workers <= 0 or self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name=f"estimate-job-worker-{index}")
+            for index in range(self.workers)
+        ]
+        logger.info("Job workers started", workers=self.workers)
+
+    async def stop(self) -> None:
+        """Cancel the workers; interrupted jobs are re-queued once their lease expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+
+# Shared queue (workers started by the app startup hook)
+job_queue = JobQueue(
+    SessionLocal,
+    workers=settings.JOBS_WORKERS,
+    poll_interval_seconds=settings.JOBS_POLL_INTERVAL_SECONDS,
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    lease_seconds=settings.JOBS_LEASE_SECONDS,
+)
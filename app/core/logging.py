@@ -1,8 +1,11 @@
 import logging
 import logging.config
+import random
 import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 from contextvars import ContextVar
 import uuid
 
@@ -11,6 +14,7 @@ from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.core.config import settings
+from app.core.metrics import record_inference_trace
 
 
 # ── Structured Log Processors ──/───
@@ -133,4 +137,98 @@ def get_logger(name: str = "app") -> structlog.stdlib.BoundLogger:
 logger = get_logger("app")          # Default app logger
 logger_db = get_logger("database")  # For DB-related logs
 logger_ml = get_logger("inference") # For model/inference logs
-logger_api = get_logger("api")      # For endpoint/request logs
\ No newline at end of file
+logger_api = get_logger("api")      # For endpoint/request logs
+
+# ── Inference instrumentation ──────────────/────────────
+# Per-stage timings of one inference request (decode, preprocess,
+# session_run, postprocess, render, db_commit, enqueue, upload; background
+# uploads are timed by the image persister itself). Timing is always on
+# (a few perf_counter calls) and feeds the /metrics histograms; the
+# structured log event is sampled and level-gated so the hot path does no
+# stdout I/O for most requests.
+
+INFERENCE_STAGES = ("decode", "preprocess", "session_run", "postprocess", "render", "db_commit", "enqueue", "upload")
+
+
+class InferenceTrace:
+    """Stage timings of one request, emitted as a single ``logger_ml`` event."""
+
+    def __init__(self, sampled: bool, **fields: Any):
+        """
+        Args:
+            sampled: Whether this request is logged even when fast
+            **fields: Context added to the log event (fruit, mode...)
+        """
+        self.sampled = sampled
+        self.fields: Dict[str, Any] = dict(fields)
+        self.stages_ms: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block; repeated stages (e.g. several uploads) accumulate."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        self.stages_ms[name] = self.stages_ms.get(name, 0.0) + elapsed_ms
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def finish(self, **fields: Any) -> float:
+        """
+        Record the stage histograms and emit the trace: at WARNING when slower
+        than INFERENCE_SLOW_MS (always), otherwise at INFERENCE_LOG_LEVEL for
+        sampled requests only.
+
+        Returns:
+            float: Total request time (ms)
+        """
+        total_ms = self.total_ms
+        record_inference_trace(self.stages_ms, total_ms)
+        slow = total_ms >= settings.INFERENCE_SLOW_MS
+        level = logging.WARNING if slow else _trace_level()
+
+        if (slow or self.sampled) and logging.getLogger("inference").isEnabledFor(level):
+            logger_ml.log(
+                level,
+                "Inference slow" if slow else "Inference trace",
+                total_ms=round(total_ms, 2),
+                stages_ms={name: round(ms, 2) for name, ms in self.stages_ms.items()},
+                **self.fields,
+                **fields,
+            )
+        return total_ms
+
+
+def _trace_level() -> int:
+    return getattr(logging, settings.INFERENCE_LOG_LEVEL.upper(), logging.DEBUG)
+
+
+inference_trace_var: ContextVar[Optional[InferenceTrace]] = ContextVar("inference_trace", default=None)
+
+
+def start_inference_trace(**fields: Any) -> InferenceTrace:
+    """Start timing the current request (sampled with INFERENCE_LOG_SAMPLE_RATE)."""
+    trace = InferenceTrace(random.random() < settings.INFERENCE_LOG_SAMPLE_RATE, **fields)
+    inference_trace_var.set(trace)
+    return trace
+
+
+@contextmanager
+def inference_stage(name: str) -> Iterator[None]:
+    """
+    Time a pipeline stage of the current request's trace (no-op without one,
+    e.g. in scripts and benchmarks).
+    """
+    trace = inference_trace_var.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
@@ -0,0 +1,334 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters and histograms live in memory, so recording a value is a dict
+lookup under a lock. With several uvicorn/gunicorn workers, each worker
+periodically writes a snapshot to METRICS_MULTIPROC_DIR and /metrics
+merges the snapshots of every worker, so a scrape that lands on any worker
+sees the totals of the whole pod. A worker removes its snapshot when it
+stops, and snapshots of pids that are no longer alive are removed at render.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from app.core.config import settings
+
+# Seconds: covers a 5 ms postprocess up to a 10 s tiled request
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    """Common parts of labelled metrics."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> List[list]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self) -> List[list]:
+        with self._lock:
+            return [[list(key), list(state[0]), state[1], state[2]] for key, state in self._values.items()]
+
+
+class MetricsRegistry:
+    """Holds the process metrics and renders the merged exposition."""
+
+    def __init__(self, multiproc_dir: Optional[str] = None):
+        """
+        Args:
+            multiproc_dir: Shared directory for per-worker snapshots (None: single process)
+        """
+        self._metrics: Dict[str, _Metric] = {}
+        self.multiproc_dir = Path(multiproc_dir) if multiproc_dir else None
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    # ── Multi-worker snapshots ──
+
+    def snapshot(self) -> dict:
+        """Values of every metric of this process."""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def _snapshot_path(self, pid: int) -> Path:
+        return self.multiproc_dir / f"metrics_{pid}.json"
+
+    def flush(self) -> None:
+        """Write this worker's snapshot (atomically) to the shared directory."""
+        if self.multiproc_dir is None:
+            return
+        self.multiproc_dir.mkdir(parents=True, exist_ok=True)
+        path = self._snapshot_path(os.getpid())
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.snapshot()))
+        tmp.replace(path)
+
+    def start_flusher(self, interval_seconds: float) -> None:
+        """Flush the snapshot periodically in a daemon thread (multi-worker mode)."""
+        if self.multiproc_dir is None or self._flusher is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        self._flusher = threading.Thread(target=loop, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop_flusher(self) -> None:
+        """Stop flushing and remove this worker's snapshot (the process is exiting)."""
+        self._stop.set()
+        if self.multiproc_dir is None:
+            return
+        try:
+            self._snapshot_path(os.getpid()).unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True  # exists, owned by another user
+        return True
+
+    def _worker_snapshots(self) -> Iterable[dict]:
+        """This process' live snapshot plus the last snapshot of every other worker."""
+        yield self.snapshot()
+        if self.multiproc_dir is None or not self.multiproc_dir.exists():
+            return
+        own = self._snapshot_path(os.getpid())
+        for path in self.multiproc_dir.glob("metrics_*.json"):
+            if path == own:
+                continue
+            try:
+                pid = int(path.stem.split("_", 1)[1])
+            except ValueError:
+                continue
+            if not self._pid_alive(pid):
+                # Worker exited without cleaning up (killed, OOM): drop its snapshot
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            try:
+                yield json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue  # being replaced or truncated; next scrape gets it
+
+    def merged(self) -> Dict[str, dict]:
+        """Per metric, label values -> summed value across workers."""
+        merged: Dict[str, dict] = {name: {} for name in self._metrics}
+        for snapshot in self._worker_snapshots():
+            for name, rows in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                values = merged[name]
+                for row in rows:
+                    key = tuple(row[0])
+                    if metric.kind == "counter":
+                        values[key] = values.get(key, 0.0) + row[1]
+                    else:
+                        buckets, total, count = values.get(key, ([0] * len(row[1]), 0.0, 0))
+                        values[key] = ([a + b for a, b in zip(buckets, row[1])], total + row[2], count + row[3])
+        return merged
+
+    # ── Exposition ──
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for name, values in self.merged().items():
+            metric = self._metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+
+            for key in sorted(values):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(values[key])}")
+                    continue
+
+                buckets, total, count = values[key]
+                cumulative = 0
+                for bound, bucket_count in zip(list(metric.buckets) + [float("inf")], buckets):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+# ── Application metrics ──────────────────────────
+
+metrics_registry = MetricsRegistry(settings.METRICS_MULTIPROC_DIR)
+
+INFERENCE_STAGE_SECONDS = metrics_registry.histogram(
+    "inference_stage_duration_seconds",
+    "Duration of each inference pipeline stage",
+    ["stage"],
+)
+INFERENCE_REQUEST_SECONDS = metrics_registry.histogram(
+    "inference_request_duration_seconds",
+    "Total duration of an inference request (upload to response)",
+)
+INFERENCE_CACHE_TOTAL = metrics_registry.counter(
+    "inference_cache_requests_total",
+    "Inference result cache lookups by tier and result",
+    ["tier", "result"],
+)
+HTTP_REQUESTS_TOTAL = metrics_registry.counter(
+    "http_requests_total",
+    "HTTP requests by endpoint and status code",
+    ["method", "endpoint", "status"],
+)
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by endpoint",
+    ["method", "endpoint"],
+)
+
+
+def record_inference_trace(stages_ms: Dict[str, float], total_ms: float) -> None:
+    """Feed the stage timings of one request into the latency histograms."""
+    if not settings.METRICS_ENABLED:
+        return
+    for stage, elapsed_ms in stages_ms.items():
+        INFERENCE_STAGE_SECONDS.observe(elapsed_ms / 1000, stage=stage)
+    INFERENCE_REQUEST_SECONDS.observe(total_ms / 1000)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Observe one stage timed outside a request trace (background storage)."""
+    if settings.METRICS_ENABLED:
+        INFERENCE_STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Count requests per endpoint (route template, not raw path) and status."""
+
+    async def dispatch(self, request: Request, call_next):
+        if not settings.METRICS_ENABLED:
+            return await call_next(request)
+
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS_TOTAL.inc(method=request.method, endpoint=endpoint, status=str(status_code))
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=request.method, endpoint=endpoint
+            )
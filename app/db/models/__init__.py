@@ -6,4 +6,5 @@ from .farming import (
     Image,
     Prediction,
     Detection,
+    EstimateJob,
 )
\ No newline at end of file
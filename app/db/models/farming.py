@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON, Text
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 from datetime import datetime, timedelta, timezone
@@ -21,6 +21,10 @@ class YieldRecord(Base):
     total_count = Column(Integer)
     health_index = Column(Float)  # (healthy / total) * 100
     created_at = Column(DateTime, default=get_bogota_time, onupdate=get_bogota_time)
+    # Rendered image: "pending" while stored in the background, then "stored" (or "failed")
+    image_status = Column(String, nullable=False, default="stored", server_default="stored")
+    # Rendition name -> storage key ("thumb", "medium"); None: full image only
+    renditions = Column(JSON, nullable=True)
     
     # Relationship to User
     user = relationship("User", foreign_keys=[user_id])
@@ -118,5 +122,27 @@ class Detection(Base):
     
     def __repr__(self):
         return f"<Detection(id={self.id}, class_label='{self.class_label}', confidence={self.confidence})>"
-    
-    
\ No newline at end of file
+
+
+class EstimateJob(Base):
+    """Asynchronous estimate job; queued work is kept in the DB so restarts don't lose it."""
+    __tablename__ = "estimate_jobs"
+
+    id = Column(String(32), primary_key=True, index=True)  # uuid hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False, default="estimate_batch")
+    status = Column(String, nullable=False, default="queued", index=True)  # queued/running/succeeded/failed
+    params = Column(JSON, nullable=False, default=dict)
+    input_dir = Column(String, nullable=False)  # spooled uploads
+    total_items = Column(Integer, default=0)
+    processed_items = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=get_bogota_time)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<EstimateJob(id={self.id}, status='{self.status}')>"
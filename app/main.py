@@ -2,7 +2,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import os
 from app.api.v1.endpoints import estimator, history, analytics, users, farming, auth
 from app.db.session import engine, Base
@@ -10,6 +11,12 @@ from app.core.config import settings
 from app.db.base import Base  # Import Base to register models
 from app.db import models  # Import models package to register all models
 from app.core.logging import configure_logging, RequestContextMiddleware
+from app.core.metrics import metrics_registry, MetricsMiddleware
+from app.core.jobs import job_queue
+from app.core.image_persistence import image_persister
+from app.utils.upload_stream import UploadSizeLimitMiddleware, request_size_limit
+from app.models.registry import model_registry, warmup_batch_sizes
+from app.models.executor import inference_executor
 import uvicorn
 import logging
 
@@ -97,6 +104,9 @@ app.add_middleware(
         "X-Orchard-ID",
         "X-Tree-ID",
         "X-Image-Path",
+        "X-Cache",
+        "X-Inference-ID",
+        "X-Preview-ID",
     ]
 )
 
@@ -107,7 +117,7 @@ if not os.path.exists("uploads"):
     
 # Serve static files (uploads directory)
 
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = settings.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 app.mount("/outputs", StaticFiles(directory=UPLOAD_DIR), name="outputs")
@@ -129,14 +139,48 @@ async def root():
 
 @app.get("/health", tags=["Health"])
 async def health_check():
-    """Health check endpoint for load balancers / monitoring."""
+    """
+    Health check endpoint for load balancers / monitoring.
+
+    Liveness only: always 200 while the process serves requests. Model
+    readiness is reported separately under "model" (an API with a missing
+    or still-loading model is alive, just not ready for inference).
+    """
     return {
         "status": "healthy",
         "service": "yield-estimator-api",
-        "version": settings.APP_VERSION
+        "version": settings.APP_VERSION,
+        "model": model_registry.status()
     }
 
 
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """
+    Readiness probe: 503 until the model is loaded and warmed up, so the
+    load balancer does not route traffic to cold pods.
+
+    With MODEL_PRELOAD disabled the model loads on the first request and
+    the pod is always reported ready.
+    """
+    model_status = model_registry.status()
+    ready = model_registry.is_warm or not settings.MODEL_PRELOAD
+
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "model": model_status}
+    )
+
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (all workers merged when METRICS_MULTIPROC_DIR is set)."""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.on_event("startup")
 async def startup_event():
     """Tasks to run when the application starts."""
@@ -147,6 +191,27 @@ async def startup_event():
         logger.warning(f"Could not create/verify database tables on startup: {e}")
 
     configure_logging()
+
+    # Multi-worker metrics: publish this worker's snapshot for the others
+    metrics_registry.start_flusher(settings.METRICS_FLUSH_INTERVAL_SECONDS)
+
+    # Inference worker threads (recreated after a previous shutdown)
+    inference_executor.start()
+
+    # Background workers of the asynchronous estimate jobs (queued jobs survive restarts)
+    job_queue.start()
+    image_persister.start()
+    if image_persister.dead_letters():
+        asyncio.create_task(image_persister.retry_dead_letters())
+
+    # Load and warm up the ONNX model in the background so startup is not blocked
+    if settings.MODEL_PRELOAD:
+        model_registry.start_background_load(
+            warmup=settings.MODEL_WARMUP_ENABLED,
+            batch_sizes=warmup_batch_sizes(),
+            iterations=settings.MODEL_WARMUP_ITERATIONS,
+        )
+
     logger.info(
         "Application startup complete",
         version=settings.APP_VERSION,
@@ -155,6 +220,9 @@ async def startup_event():
     )
 
 app.add_middleware(RequestContextMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Oversized uploads get 413 before the multipart body is parsed
+app.add_middleware(UploadSizeLimitMiddleware, limit_for=request_size_limit)
 
 
 app.include_router(
@@ -199,6 +267,11 @@ async def shutdown_event():
     """Tasks to run when the application shuts down."""
     print("[X] Cerrando Apple Yield Estimator API...")
     logger.info("Application shutdown initiated")
+
+    await job_queue.stop()
+    await image_persister.stop()
+    inference_executor.shutdown(wait=False)
+    metrics_registry.stop_flusher()
     
 
 
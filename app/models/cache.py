@@ -0,0 +1,147 @@
+"""
+Inference result cache keyed by image content.
+
+Farmers re-upload the same photo (preview, then save, then re-open), so the
+detection result is cached under a hash of the image bytes, the model
+version and every parameter that changes the output. Two tiers:
+
+- memory: per-process LRU with TTL (always on when CACHE_ENABLED)
+- redis: optional shared tier (CACHE_REDIS_ENABLED), so the workers and
+  pods behind the load balancer reuse each other's results
+
+Redis errors never fail a request: the cache degrades to the memory tier.
+"""
+import json
+import threading
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.logging import logger_ml
+from app.core.metrics import INFERENCE_CACHE_TOTAL
+from app.utils.lru import MemoryLRU
+from app.utils.redis_client import get_redis_client
+
+
+def result_cache_key(
+    content_hash: str,
+    model_version: str,
+    confidence_threshold: float,
+    tile_size: Optional[int] = None,
+    tile_overlap: Optional[float] = None,
+    fruit: str = "apple",
+) -> str:
+    """
+    Cache key of one inference: image content + crop model + output-changing params.
+
+    Preprocessing, decode, tiling, NMS and candidate-floor settings are part
+    of the key so a config change never serves stale results from a shared
+    Redis.
+    """
+    # None means "configured default": resolve it so default and explicit values share keys
+    tile_size = settings.INFERENCE_TILE_SIZE if tile_size is None else tile_size
+    tile_overlap = settings.INFERENCE_TILE_OVERLAP if tile_overlap is None else tile_overlap
+    if not tile_size:
+        tile_size, tile_overlap = 0, 0.0  # untiled: the overlap changes nothing
+    params = (
+        f"c{confidence_threshold:.4f}"
+        f":t{tile_size}:o{tile_overlap:.3f}:{'f' if settings.INFERENCE_TILE_INCLUDE_FULL else 'x'}"
+        f":n{settings.NMS_THRESHOLD:.3f}:{'a' if settings.NMS_CLASS_AGNOSTIC else 'c'}"
+        f":p{settings.PREPROCESS_MODE}:{'r' if settings.INFERENCE_REDUCED_DECODE else 'd'}"
+        f":m{settings.REFILTER_MIN_CONFIDENCE:.3f}"
+    )
+    return f"inference:{fruit}:{model_version}:{content_hash}:{params}"
+
+
+class InferenceResultCache:
+    """Two-tier (memory + optional Redis) cache of inference results."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        max_entries: int = 256,
+        ttl_seconds: int = 3600,
+        redis_client: Optional[Any] = None,
+    ):
+        """
+        Args:
+            enabled: Master switch (CACHE_ENABLED)
+            max_entries: Memory tier capacity
+            ttl_seconds: Entry lifetime in both tiers (CACHE_TTL)
+            redis_client: ``redis.asyncio.Redis`` for the shared tier, or None
+        """
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.memory = MemoryLRU(max_entries, ttl_seconds)
+        self.redis = redis_client
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "redis_hits": 0, "redis_errors": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._stats[name] += 1
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Cached result, checking memory then Redis (a Redis hit refills memory)."""
+        if not self.enabled:
+            return None
+
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits", "memory_hits")
+            INFERENCE_CACHE_TOTAL.inc(tier="memory", result="hit")
+            return value
+        INFERENCE_CACHE_TOTAL.inc(tier="memory", result="miss")
+
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(key)
+            except Exception as e:
+                self._count("redis_errors")
+                logger_ml.warning("Result cache Redis read failed", error=str(e))
+                raw = None
+            else:
+                INFERENCE_CACHE_TOTAL.inc(tier="redis", result="hit" if raw is not None else "miss")
+
+            if raw is not None:
+                value = json.loads(raw)
+                self.memory.set(key, value)
+                self._count("hits", "redis_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    async def set(self, key: str, value: dict) -> None:
+        """Store a result in both tiers."""
+        if not self.enabled:
+            return
+
+        self.memory.set(key, value)
+        if self.redis is not None:
+            try:
+                await self.redis.set(key, json.dumps(value), ex=self.ttl_seconds)
+            except Exception as e:
+                self._count("redis_errors")
+                logger_ml.warning("Result cache Redis write failed", error=str(e))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "enabled": self.enabled,
+            "redis": self.redis is not None,
+            "memory_entries": len(self.memory),
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0,
+        })
+        return stats
+
+
+# Shared cache (disabled unless CACHE_ENABLED)
+inference_cache = InferenceResultCache(
+    enabled=settings.CACHE_ENABLED,
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CACHE_TTL,
+    redis_client=get_redis_client() if settings.CACHE_ENABLED and settings.CACHE_REDIS_ENABLED else None,
+)
@@ -0,0 +1,99 @@
+"""
+Recent pre-NMS candidates, for threshold changes without re-inference.
+
+When the user moves the confidence slider, the frontend calls
+``/estimate/{inference_id}/refilter`` instead of re-uploading: the stored
+candidates only go through threshold + NMS + counts, and the stored image
+is re-rendered. Entries expire after REFILTER_TTL_SECONDS and the store is
+bounded by REFILTER_CACHE_MB (least recently used entries go first).
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.models.postprocess import CandidateSet
+from app.utils.image_processing import DecodedImage
+
+
+@dataclass
+class CandidateEntry:
+    """Everything needed to re-filter one inference."""
+    candidates: CandidateSet
+    image: DecodedImage
+    engine: Any  # AppleInference that produced the candidates (summary / colors)
+    user_id: Optional[int] = None
+    fruit: str = "apple"
+    created_at: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        # Only the encoded upload is kept: a decoded 12 MP frame is ~36 MB
+        self.image = self.image.encoded_copy()
+
+    def load_image(self) -> DecodedImage:
+        """Image for one refilter call, decoded lazily and released with it."""
+        return self.image.encoded_copy()
+
+    @property
+    def nbytes(self) -> int:
+        size = self.candidates.nbytes + (len(self.image.data) if self.image.data is not None else 0)
+        if self.image.is_decoded:
+            size += self.image.frame.nbytes
+        return size
+
+
+class CandidateStore:
+    """In-process TTL + memory-bounded LRU of CandidateEntry by inference ID."""
+
+    def __init__(self, max_mb: float = 256, ttl_seconds: float = 900):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CandidateEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, entry: CandidateEntry) -> str:
+        """Store an entry and return its inference ID."""
+        inference_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[inference_id] = entry
+            self._evict()
+        return inference_id
+
+    def get(self, inference_id: str) -> Optional[CandidateEntry]:
+        """Entry by ID, None if unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(inference_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.created_at > self.ttl_seconds:
+                del self._entries[inference_id]
+                return None
+            self._entries.move_to_end(inference_id)
+            return entry
+
+    def _evict(self) -> None:
+        """Drop expired entries, then LRU ones beyond the memory budget (lock held)."""
+        now = time.monotonic()
+        for inference_id in [k for k, e in self._entries.items() if now - e.created_at > self.ttl_seconds]:
+            del self._entries[inference_id]
+
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_mb": round(sum(e.nbytes for e in self._entries.values()) / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# Shared store
+candidate_store = CandidateStore(settings.REFILTER_CACHE_MB, settings.REFILTER_TTL_SECONDS)
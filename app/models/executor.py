@@ -0,0 +1,163 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.core.logging import logger_ml
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference executor has no free slot for a new job."""
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+
+
+class InferenceExecutor:
+    """
+    Bounded worker pool for CPU-bound inference work.
+
+    Keeps ONNX runs and image rendering off the event loop so a single upload
+    does not freeze the uvicorn worker (auth, farming, /health...). At most
+    ``max_workers`` jobs run at the same time and at most ``max_queue_size``
+    more may wait; beyond that ``run`` fails fast with ``InferenceQueueFull``
+    so the API can answer 503 + Retry-After instead of piling up requests.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue_size: int = 16, retry_after_seconds: int = 2):
+        """
+        Args:
+            max_workers: Number of worker threads running jobs
+            max_queue_size: Number of jobs allowed to wait for a worker
+            retry_after_seconds: Hint returned to clients when saturated
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue_size = max(0, int(max_queue_size))
+        self.retry_after_seconds = retry_after_seconds
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0   # queued + running
+        self._running = 0
+
+        # Metrics
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue_size
+
+    def start(self) -> None:
+        """Create the worker threads (again after a previous ``shutdown``)."""
+        with self._lock:
+            self._ensure_pool()
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        # Caller holds self._lock
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference-worker",
+            )
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Execute ``fn(*args, **kwargs)`` on the worker pool and await its result.
+
+        Raises:
+            InferenceQueueFull: If all workers are busy and the queue is full
+        """
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise InferenceQueueFull(self.retry_after_seconds)
+            pool = self._ensure_pool()
+            self._pending += 1
+
+        submitted_at = time.perf_counter()
+        # Workers see the caller's context (request id, inference trace)
+        context = contextvars.copy_context()
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                wait = started - submitted_at
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            try:
+                return context.run(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._run_total += time.perf_counter() - started
+
+        try:
+            result = await asyncio.wrap_future(pool.submit(job))
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        else:
+            with self._lock:
+                self._completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth and wait-time metrics."""
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_total / finished * 1000, 3) if finished else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 3),
+                "avg_run_ms": round(self._run_total / finished * 1000, 3) if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Release the worker threads; the next ``start`` or ``run`` creates new ones."""
+        logger_ml.info("Shutting down inference executor", **self.stats())
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+def executor_workers() -> int:
+    """
+    Worker threads for the shared executor.
+
+    Each worker blocks in ``BatchScheduler.run`` while its request waits for
+    a micro-batch, so fewer workers than INFERENCE_BATCH_MAX_SIZE would cap
+    every batch at the worker count.
+    """
+    if settings.INFERENCE_BATCHING_ENABLED:
+        return max(settings.INFERENCE_WORKERS, settings.INFERENCE_BATCH_MAX_SIZE)
+    return settings.INFERENCE_WORKERS
+
+
+# Shared executor for the estimator endpoints (threads are created on start/first run)
+inference_executor = InferenceExecutor(
+    max_workers=executor_workers(),
+    max_queue_size=settings.INFERENCE_QUEUE_SIZE,
+    retry_after_seconds=settings.INFERENCE_RETRY_AFTER_SECONDS,
+)
@@ -1,7 +1,284 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
 import cv2
 import numpy as np
 import onnxruntime as ort
-from pathlib import Path
+
+from app.core.config import settings
+from app.core.logging import logger_ml, inference_stage
+from app.models.postprocess import CandidateSet, extract_candidates, filter_candidates, postprocess
+from app.models.color import classify_box_colors
+from app.models.tiling import make_tiles, tiled_candidates
+from app.models.preprocess import LetterboxInfo, LetterboxPreprocessor
+from app.utils.image_processing import ImageInput, as_decoded_image
+
+
+@dataclass
+class _BatchItem:
+    """One pending request waiting in the batch queue."""
+    tensor: np.ndarray
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching scheduler for ONNX sessions.
+
+    Concurrent callers submit single-image tensors ([1, 3, 640, 640]); a
+    background thread collects them for at most ``max_wait_ms`` (or until
+    ``max_batch_size`` requests are queued), stacks them into one
+    [N, 3, 640, 640] tensor, runs a single ``session.run`` and hands every
+    caller back its own slice of the outputs.
+
+    Callers in worker threads block on ``run``; coroutines can ``await``
+    ``run_async``. Both resolve to the same list of outputs a direct
+    ``session.run`` would have returned for that single input.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[np.ndarray], List[np.ndarray]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        result_timeout: float = 60.0,
+    ):
+        """
+        Args:
+            run_batch: Callable running the model on a stacked [N, ...] tensor
+            max_batch_size: Maximum number of requests fused into one run
+            max_wait_ms: Maximum time the first request of a batch waits for company
+            result_timeout: Seconds ``run`` waits for its outputs before giving up
+        """
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.result_timeout = result_timeout
+
+        self._queue: "queue.Queue[Optional[_BatchItem]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+
+        # Metrics: batch fill and queue wait
+        self._batches = 0
+        self._requests = 0
+        self._batch_size_counts = [0] * (self.max_batch_size + 1)
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    # ── Public API ──────────────────────────────────────────────
+
+    def submit(self, tensor: np.ndarray) -> Future:
+        """Queue a tensor for the next batch and return a Future with its outputs."""
+        future: Future = Future()
+        # Checked and enqueued under the lock so nothing lands behind the shutdown sentinel
+        with self._start_lock:
+            if self._stopped:
+                raise RuntimeError("Batch scheduler has been shut down")
+            self._ensure_started()
+            self._queue.put(_BatchItem(tensor=tensor, future=future))
+        return future
+
+    def run(self, tensor: np.ndarray, timeout: Optional[float] = None) -> List[np.ndarray]:
+        """
+        Blocking helper: submit and wait for the outputs.
+
+        Raises:
+            concurrent.futures.TimeoutError: If no result arrives within ``timeout``
+                seconds (default: ``result_timeout``)
+        """
+        return self.submit(tensor).result(timeout=self.result_timeout if timeout is None else timeout)
+
+    async def run_async(self, tensor: np.ndarray) -> List[np.ndarray]:
+        """Awaitable helper for callers running on the event loop."""
+        return await asyncio.wrap_future(self.submit(tensor))
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop the dispatcher thread after draining already queued requests."""
+        with self._start_lock:
+            self._stopped = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join(timeout=timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        """Snapshot of batch fill and queue wait metrics."""
+        with self._stats_lock:
+            batches = self._batches
+            requests = self._requests
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "requests": requests,
+                "avg_batch_size": round(requests / batches, 3) if batches else 0.0,
+                "avg_batch_fill": round(requests / (batches * self.max_batch_size), 3) if batches else 0.0,
+                "batch_size_histogram": {
+                    str(size): count
+                    for size, count in enumerate(self._batch_size_counts)
+                    if size > 0 and count > 0
+                },
+                "avg_queue_wait_ms": round(self._queue_wait_total / requests * 1000, 3) if requests else 0.0,
+                "max_queue_wait_ms": round(self._queue_wait_max * 1000, 3),
+            }
+
+    # ── Dispatcher ──────────────────────────────────────────────
+
+    def _ensure_started(self) -> None:
+        # Caller holds self._start_lock
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop,
+                name="onnx-batch-scheduler",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _loop(self) -> None:
+        try:
+            while True:
+                batch = self._collect()
+                if batch:
+                    self._dispatch(batch)
+                if self._stopped and self._queue.empty():
+                    break
+        finally:
+            self._fail_pending()
+
+    def _fail_pending(self) -> None:
+        """Resolve whatever is still queued once the dispatcher exits."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and not item.future.done():
+                item.future.set_exception(RuntimeError("Batch scheduler has been shut down"))
+
+    def _collect(self) -> List[_BatchItem]:
+        """Block for the first request, then gather more until full or the wait expires."""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown sentinel: finish this batch, the loop exits afterwards
+                break
+            batch.append(item)
+
+        return batch
+
+    def _dispatch(self, batch: List[_BatchItem]) -> None:
+        started = time.perf_counter()
+        waits = [started - item.enqueued_at for item in batch]
+
+        try:
+            stacked = np.concatenate([item.tensor for item in batch], axis=0)
+            outputs = self._run_batch(stacked)
+        except Exception as e:
+            for item in batch:
+                item.future.set_exception(e)
+        else:
+            offset = 0
+            for item in batch:
+                rows = item.tensor.shape[0]
+                item.future.set_result([out[offset:offset + rows] for out in outputs])
+                offset += rows
+
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._batch_size_counts[len(batch)] += 1
+            self._queue_wait_total += sum(waits)
+            self._queue_wait_max = max(self._queue_wait_max, max(waits))
+
+
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disabled": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+_EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def build_session_options(model_path: str) -> tuple:
+    """
+    Build ONNX Runtime SessionOptions from the ORT_* settings.
+
+    Thread counts let each uvicorn worker pin its own pool (e.g. cores / WORKERS)
+    instead of every worker grabbing all cores. When ORT_OPTIMIZED_MODEL_PATH is
+    set, the graph optimized on the first start is saved there and loaded
+    directly (optimizations off) on the next starts while it is newer than the
+    source model.
+
+    Args:
+        model_path: Source .onnx model
+
+    Returns:
+        tuple: (path to load, ort.SessionOptions)
+
+    Raises:
+        ValueError: On unknown optimization level or execution mode
+    """
+    level = settings.ORT_GRAPH_OPTIMIZATION_LEVEL.lower()
+    mode = settings.ORT_EXECUTION_MODE.lower()
+    if level not in _GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"ORT_GRAPH_OPTIMIZATION_LEVEL must be one of {list(_GRAPH_OPTIMIZATION_LEVELS)}")
+    if mode not in _EXECUTION_MODES:
+        raise ValueError(f"ORT_EXECUTION_MODE must be one of {list(_EXECUTION_MODES)}")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = _GRAPH_OPTIMIZATION_LEVELS[level]
+    options.execution_mode = _EXECUTION_MODES[mode]
+    options.intra_op_num_threads = settings.ORT_INTRA_OP_NUM_THREADS
+    options.inter_op_num_threads = settings.ORT_INTER_OP_NUM_THREADS
+    options.enable_cpu_mem_arena = settings.ORT_ENABLE_CPU_MEM_ARENA
+    options.enable_mem_pattern = settings.ORT_ENABLE_MEM_PATTERN
+    # Busy-waiting threads burn CPU that other workers on the box need
+    options.add_session_config_entry(
+        "session.intra_op.allow_spinning", "1" if settings.ORT_ALLOW_SPINNING else "0"
+    )
+
+    load_path = model_path
+    cached = settings.ORT_OPTIMIZED_MODEL_PATH
+    if cached:
+        cached_path = Path(cached)
+        if cached_path.exists() and cached_path.stat().st_mtime >= Path(model_path).stat().st_mtime:
+            load_path = str(cached_path)
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        else:
+            cached_path.parent.mkdir(parents=True, exist_ok=True)
+            options.optimized_model_filepath = str(cached_path)
+
+    return load_path, options
+
 
 # Apple Detection Call Model 
 class AppleInference:
@@ -13,13 +290,24 @@ class AppleInference:
     and color-based classification (red vs green apples) for healthy detections.
     """
     
-    def __init__(self, model_path: str):
+    def __init__(
+        self,
+        model_path: str,
+        session_options: Optional[ort.SessionOptions] = None,
+        classes: Optional[List[str]] = None,
+        input_size: Optional[int] = None,
+        fruit: str = "apple",
+    ):
         
         """
         Initialize the ONNX inference session.
 
         Args:
             model_path (str): Path to the .onnx model file
+            session_options: Explicit ORT options; built from the ORT_* settings when omitted
+            classes: Model classes, [healthy, damaged] (defaults to the apple model)
+            input_size: Square model input side (defaults to MODEL_INPUT_SIZE)
+            fruit: Crop the model detects
 
         Raises:
             FileNotFoundError: If model file does not exist
@@ -29,227 +317,463 @@ class AppleInference:
     
             raise FileNotFoundError(f"No se encontró el modelo en: {model_path}")
             
+        load_path = model_path
+        if session_options is None:
+            load_path, session_options = build_session_options(model_path)
+            
         self.session = ort.InferenceSession(
             # Use CPU provider for broad compatibility in low hardware environments
-            model_path, 
+            load_path, 
+            sess_options=session_options,
             providers=['CPUExecutionProvider']
             
         )
+        self.model_path = model_path
+        self.model_version = Path(model_path).stem
         # Get Input Name and Shape 
         self.input_name = self.session.get_inputs()[0].name
         self.input_shape = self.session.get_inputs()[0].shape
-        print(f"Input shape: {self.input_shape}")
+        logger_ml.debug("Model session created", model_path=model_path, input_shape=self.input_shape)
         
-        self.classes = ["apple", "damaged_apple"]
+        self.fruit = fruit
+        self.classes = list(classes) if classes else ["apple", "damaged_apple"]
+        self.batch_scheduler: Optional[BatchScheduler] = None
+        # Scheduled runs in flight; a closed scheduler stops after the last one
+        self._runs_lock = threading.Lock()
+        self._active_runs = 0
+        self._retired_scheduler: Optional[BatchScheduler] = None
+        # Red/green color split of healthy apples (temporarily disabled)
+        self.classify_colors = False
+        # Letterbox into reusable per-worker tensors ("stretch" keeps the legacy resize)
+        self.input_size = input_size or settings.MODEL_INPUT_SIZE
+        self.letterbox = settings.PREPROCESS_MODE == "letterbox"
+        self.preprocessor = LetterboxPreprocessor(self.input_size)
+
+    @property
+    def supports_batching(self) -> bool:
+        """True when the exported model has a dynamic batch dimension."""
+        batch_dim = self.input_shape[0] if self.input_shape else 1
+        return not isinstance(batch_dim, int) or batch_dim <= 0
+
+    def enable_batching(self, max_batch_size: int = 8, max_wait_ms: float = 5.0) -> None:
+        """
+        Route session runs through a dynamic micro-batching scheduler.
+
+        Models exported with a fixed batch size of 1 cannot be batched; in
+        that case the engine keeps running requests one by one.
+        """
+        if not self.supports_batching:
+            logger_ml.warning(
+                "Model has a static batch dimension, micro-batching disabled",
+                input_shape=self.input_shape,
+            )
+            return
+
+        if self.batch_scheduler is not None:
+            self.batch_scheduler.shutdown()
+
+        self.batch_scheduler = BatchScheduler(
+            self._run_session_direct,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+        )
+
+    def close(self) -> None:
+        """
+        Stop the batch scheduler (engine evicted or unloaded).
+
+        Requests already holding the engine keep working: new runs fall back
+        to direct session runs, runs already waiting for a batch complete and
+        the last of them stops the scheduler. The session is freed with the
+        last reference.
+        """
+        with self._runs_lock:
+            scheduler = self.batch_scheduler
+            self.batch_scheduler = None
+            if scheduler is None:
+                return
+            if self._active_runs:
+                self._retired_scheduler = scheduler
+                return
+        scheduler.shutdown()
+
+    def _run_session_direct(self, input_tensor: np.ndarray) -> List[np.ndarray]:
+        """Run the ONNX session on a (possibly stacked) input tensor."""
+        return self.session.run(None, {self.input_name: input_tensor})
+
+    def warmup(self, batch_sizes: Sequence[int] = (1,), iterations: int = 3) -> Dict[int, float]:
+        """
+        Run synthetic batches so the first real request does not pay for
+        ONNX Runtime arena allocation and kernel selection.
+
+        Runs bypass the batch scheduler. Batch sizes > 1 are skipped for
+        models exported with a static batch dimension.
+
+        Args:
+            batch_sizes: Batch sizes to warm (each one gets its own allocations)
+            iterations: Session runs per batch size
+
+        Returns:
+            dict: batch size -> average latency (ms) of the warm-up runs
+        """
+        size = self.input_size
+        timings = {}
+
+        for batch_size in sorted(set(batch_sizes)):
+            if batch_size < 1 or (batch_size > 1 and not self.supports_batching):
+                continue
+
+            # Letterbox gray (114) is what padded regions look like to the model
+            tensor = np.full((batch_size, 3, size, size), 114.0 / 255.0, dtype=np.float32)
+            started = time.perf_counter()
+            for _ in range(max(1, iterations)):
+                self._run_session_direct(tensor)
+            timings[batch_size] = round((time.perf_counter() - started) * 1000 / max(1, iterations), 2)
+
+        return timings
+
+    def _run_session(self, input_tensor: np.ndarray) -> List[np.ndarray]:
+        """Run one request, through the batch scheduler when enabled."""
+        with self._runs_lock:
+            scheduler = self.batch_scheduler
+            if scheduler is not None:
+                self._active_runs += 1
+        if scheduler is None:
+            return self._run_session_direct(input_tensor)
+
+        try:
+            return scheduler.run(input_tensor)
+        finally:
+            with self._runs_lock:
+                self._active_runs -= 1
+                retired = None
+                if self._active_runs == 0 and self._retired_scheduler is not None:
+                    retired, self._retired_scheduler = self._retired_scheduler, None
+            if retired is not None:
+                retired.shutdown()
+
     # Original training classes (YOLOv8 output)
-    def _preprocess(self, img_bgr):
-        """Set the image to the model : Resize,  Normalitzation and axis change
+    def _preprocess(self, img_bgr, out=None):
+        """Set the image to the model : Letterbox,  Normalitzation and axis change
            * Preprocess image for YOLOv8 ONNX input *(640x640, BGR → RGB, Normalize, CHW)*
 
-        - Resize to model input size (640x640)
-        - Convert BGR → RGB
-        - Normalize to [0,1]
-        - Transpose to CHW
-        - Add batch dimension
+        - Letterbox to model input size (640x640) keeping the aspect ratio
+        - Convert BGR → RGB, Normalize to [0,1] and Transpose to CHW in one pass
+        - Written into a reusable per-worker [1, 3, 640, 640] buffer (or ``out``)
 
         Args:
             img_bgr: Original image in BGR (OpenCV format)
+            out: Optional [3, 640, 640] destination (slice of a batch tensor)
 
         Returns:
-            np.ndarray: Ready input tensor [1, 3, 640, 640]
+            tuple: (input tensor, LetterboxInfo to undo the padding in post-processing)
         """
-        img = cv2.resize(img_bgr, (640, 640))
+        if self.letterbox:
+            return self.preprocessor(img_bgr, out=out)
+
+        # Legacy stretch resize (distorts aspect ratio)
+        info = LetterboxInfo.stretch((img_bgr.shape[1], img_bgr.shape[0]), self.input_size)
+        img = cv2.resize(img_bgr, (self.input_size, self.input_size))
         img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         img = img.astype(np.float32) / 255.0
         img = img.transpose(2, 0, 1)
+        if out is not None:
+            out[...] = img
+            return out, info
         img = np.expand_dims(img, axis=0)
-        return img
+        return img, info
 
     def _classify_apple_color(self, roi: np.ndarray) -> int:
         """
         Clasifica si el apple es red (0) o green (2) basado en color dominante en HSV.
-        
+
+        Single-ROI helper; ``_summarize`` classifies all detections at once
+        with ``classify_box_colors``.
+
         Args:
             roi: Región del bounding box (BGR)
-        
+
         Returns:
             0 para red_apple, 2 para green_apple
         """
-        # Convert to HSV (better for colors)
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-        
-        # Red Color Mask (Hue 0-10 y 170-180, Sat >100, Value >100)
-        lower_red1 = np.array([0, 100, 100])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([170, 100, 100])
-        upper_red2 = np.array([180, 255, 255])
-        mask_red = cv2.inRange(hsv, lower_red1, upper_red1) + cv2.inRange(hsv, lower_red2, upper_red2)
-        
-        # Green Mask (Hue 40-80, Sat >100, Value >100) - adjusted for green apples
-        lower_green = np.array([40, 100, 100])
-        upper_green = np.array([80, 255, 255])
-        mask_green = cv2.inRange(hsv, lower_green, upper_green)
-        
-        # Count non-zero pixels (covered area)
-        red_pixels = cv2.countNonZero(mask_red)
-        green_pixels = cv2.countNonZero(mask_green)
-        
-        total_pixels = roi.shape[0] * roi.shape[1]
-        red_ratio = red_pixels / total_pixels
-        green_ratio = green_pixels / total_pixels
-        
-        print(f"Color analysis: Red ratio {red_ratio:.2f}, Green ratio {green_ratio:.2f}")
-        
-        # Decidir: si green > red y >0.3 (umbral para evitar ruido), green; else red
-        if green_ratio > red_ratio and green_ratio > 0.30:
-            return 2  # green_apple
-        else:
-            return 0  # red_apple
+        height, width = roi.shape[:2]
+        return int(classify_box_colors(roi, [[0, 0, width, height]], max_side=None)[0])
 
-    def run_inference(self, image_bytes: bytes, confidence_threshold: float = 0.45):
+    def run_inference(
+        self,
+        image: ImageInput,
+        confidence_threshold: float = 0.45,
+        tile_size: Optional[int] = None,
+        tile_overlap: Optional[float] = None,
+        return_candidates: bool = False,
+    ):
         """Excecute Detection , then it returns the apple number \counting/
             Run full detection pipeline on image bytes.
 
             Returns counts and detection details for visualization and yield estimation.
 
             Args:
-                image_bytes: Raw image data (e.g. from FastAPI UploadFile)
+                image: Raw image data (e.g. from FastAPI UploadFile), a BGR frame or a
+                    shared DecodedImage (decoded once, reused by rendering)
                 confidence_threshold: Minimum confidence for detections (default: 0.45)
+                tile_size: Tile side in image pixels for tiled inference
+                    (None: INFERENCE_TILE_SIZE, 0: whole image only)
+                tile_overlap: Overlap between tiles (None: INFERENCE_TILE_OVERLAP)
+                return_candidates: Also return the pre-NMS CandidateSet under
+                    "candidates", so other thresholds can be applied with ``refilter``
 
             Returns:
                 dict: { ...}
 
         """
-        # Decode Input bytes to OpenCV format
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img_original = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode Input bytes to OpenCV format (only once, shared with later stages)
+        decoded = as_decoded_image(image)
         
-        if img_original is None:
-            raise ValueError("Failed to decode input image")
+        tile_size = settings.INFERENCE_TILE_SIZE if tile_size is None else tile_size
+        conf_floor = min(settings.REFILTER_MIN_CONFIDENCE, confidence_threshold)
         
-        # 1. Get Original Dimensions
-        orig_h, orig_w = img_original.shape[:2]
-        print(f"Imagen original: {orig_w}x{orig_h}")
+        # Header size only: images that stay untiled keep the reduced decode below
+        if tile_size and decoded.max_side > tile_size:
+            with inference_stage("decode"):
+                frame = decoded.frame
+            overlap = settings.INFERENCE_TILE_OVERLAP if tile_overlap is None else tile_overlap
+            candidates = self._run_tiled(
+                frame, tile_size, overlap,
+                conf_floor if return_candidates else confidence_threshold
+            )
+            with inference_stage("postprocess"):
+                result = self.refilter(candidates, confidence_threshold, decoded)
+            if return_candidates:
+                result["candidates"] = candidates
+            return result
+        
+        # 1. Get Original Dimensions (the model frame may be a reduced JPEG decode)
+        with inference_stage("decode"):
+            if settings.INFERENCE_REDUCED_DECODE:
+                img_model, (orig_w, orig_h) = decoded.inference_frame(settings.MODEL_INPUT_SIZE)
+            else:
+                img_model = decoded.frame
+                orig_h, orig_w = img_model.shape[:2]
         
         # 2. Pre-Processing
-        input_tensor = self._preprocess(img_original)
+        with inference_stage("preprocess"):
+            input_tensor, letterbox_info = self._preprocess(img_model)
         
         # 3. Run the Model. 
-        outputs = self.session.run(None, {self.input_name: input_tensor})
-        predictions = np.squeeze(outputs[0]).T  # CAREFULL [num_detections, 6] (x_center, y_center, w, h, conf_class0, conf_class1) 
-        ## Shape: (num_dets, 4 + num_classes)
-        
-        # 4. Split boxes (cx,cy,w,h) and scores (conf_class0, conf_class1)
-        boxes = predictions[:, :4]
-        scores = predictions[:, 4:]
-        
-        print(f"Prediction way: {predictions.shape}")
-        print(f"Max Confident Detected: {np.max(scores):.4f}")
-
-        # 5. Confident Filtering
-        conf_threshold = confidence_threshold
-        confidences = np.max(scores, axis=1)
-        class_ids = np.argmax(scores, axis=1)
-        mask = confidences > conf_threshold
-        print(f"Max Confident Detected : {np.max(confidences):.4f}")
-        filtered_confidences = confidences[mask]
-        filtered_class_ids = class_ids[mask]
-        filtered_boxes = boxes[mask]
-        
-        print(f"Detection before pulling NMS: {len(filtered_boxes)}")
-        
-        # 6. Convert into  NMS  suitable format ::(convert cxcywh → xywh)
-        nms_boxes = []
+        with inference_stage("session_run"):
+            outputs = self._run_session(input_tensor)
         
-        for box in filtered_boxes:
-            cx, cy, w, h = box
-            x = int(cx - (w / 2))
-            y = int(cy - (h / 2))
-            nms_boxes.append([x, y, int(w), int(h)])
-        
-        # 7. Run NMS
-        indexes = cv2.dnn.NMSBoxes(
-            nms_boxes, 
-            filtered_confidences.tolist(), 
-            conf_threshold, 
-            0.45  # NMS  IoU  Threshold
+        # 4-8. Threshold, NMS, scale back to original size and clip (vectorized),
+        # then counts / color split
+        with inference_stage("postprocess"):
+            detections = postprocess(
+                outputs[0],
+                (orig_w, orig_h),
+                input_size=self.input_size,
+                conf_threshold=confidence_threshold,
+                iou_threshold=settings.NMS_THRESHOLD,
+                agnostic=settings.NMS_CLASS_AGNOSTIC,
+                letterbox=letterbox_info,
+            )
+            result = self._summarize(detections, decoded)
+            if return_candidates:
+                result["candidates"] = extract_candidates(
+                    outputs[0],
+                    (orig_w, orig_h),
+                    input_size=self.input_size,
+                    conf_floor=conf_floor,
+                    letterbox=letterbox_info,
+                )
+            return result
+
+    def refilter(self, candidates: CandidateSet, confidence_threshold: float, image: ImageInput) -> dict:
+        """
+        Apply a new confidence threshold to stored candidates: threshold, NMS
+        and counts only, no decode/preprocess/model run.
+
+        Args:
+            candidates: Pre-NMS candidates from ``run_inference(..., return_candidates=True)``
+            confidence_threshold: New minimum confidence (>= candidates.conf_floor)
+            image: The same image (only read for color classification)
+
+        Returns:
+            dict: Same format as ``run_inference``
+        """
+        detections = filter_candidates(
+            candidates,
+            confidence_threshold,
+            iou_threshold=settings.NMS_THRESHOLD,
+            agnostic=settings.NMS_CLASS_AGNOSTIC,
         )
+        return self._summarize(detections, as_decoded_image(image))
+
+    def run_batch_inference(
+        self,
+        images: Sequence[ImageInput],
+        confidence_threshold: float = 0.45,
+    ) -> List[dict]:
+        """
+        Detection on several images with stacked session runs.
+
+        Images are letterboxed into one (N, 3, S, S) tensor and run at most
+        INFERENCE_TILE_MAX_BATCH per session call (one by one for models
+        with a static batch dimension). Images that need tiled inference
+        (larger than INFERENCE_TILE_SIZE) go through ``run_inference``.
+
+        Args:
+            images: Raw bytes, BGR frames or DecodedImages
+            confidence_threshold: Minimum confidence for detections
+
+        Returns:
+            list: One ``run_inference`` result per image, in order; images that
+                cannot be decoded get {"error": message} instead
+        """
+        decoded = [as_decoded_image(image) for image in images]
+        results: List[Optional[dict]] = [None] * len(decoded)
+        tile_size = settings.INFERENCE_TILE_SIZE
+
+        frames, sizes, indices = [], [], []
+        with inference_stage("decode"):
+            for index, image in enumerate(decoded):
+                try:
+                    if tile_size and image.max_side > tile_size:
+                        continue  # tiled below
+                    if settings.INFERENCE_REDUCED_DECODE:
+                        frame, original_size = image.inference_frame(self.input_size)
+                    else:
+                        frame = image.frame
+                        original_size = (frame.shape[1], frame.shape[0])
+                except ValueError as e:
+                    results[index] = {"error": str(e)}
+                    continue
+                frames.append(frame)
+                sizes.append(original_size)
+                indices.append(index)
+
+        if frames:
+            size = self.input_size
+            with inference_stage("preprocess"):
+                batch = np.empty((len(frames), 3, size, size), dtype=np.float32)
+                infos = [self._preprocess(frame, out=batch[i])[1] for i, frame in enumerate(frames)]
+            del frames
+
+            with inference_stage("session_run"):
+                outputs = self._run_batch(batch)
+
+            with inference_stage("postprocess"):
+                for output, info, original_size, index in zip(outputs, infos, sizes, indices):
+                    detections = postprocess(
+                        output,
+                        original_size,
+                        input_size=self.input_size,
+                        conf_threshold=confidence_threshold,
+                        iou_threshold=settings.NMS_THRESHOLD,
+                        agnostic=settings.NMS_CLASS_AGNOSTIC,
+                        letterbox=info,
+                    )
+                    results[index] = self._summarize(detections, decoded[index])
+
+        for index, image in enumerate(decoded):
+            if results[index] is None:
+                results[index] = self.run_inference(image, confidence_threshold)
+
+        return results
+
+    def _run_tiled(
+        self,
+        frame: np.ndarray,
+        tile_size: int,
+        overlap: float,
+        conf_floor: float,
+    ) -> CandidateSet:
+        """
+        Tiled inference: overlapping tiles near native resolution, run as
+        batched session calls. The candidates of all tiles are then merged
+        with a cross-tile NMS by ``refilter``.
+
+        Tiles are preprocessed and run INFERENCE_TILE_MAX_BATCH at a time
+        through one reused input buffer, so memory does not grow with the
+        photo resolution.
+
+        Args:
+            frame: Full resolution BGR frame
+            tile_size: Tile side in frame pixels
+            overlap: Fraction of each tile shared with its neighbours
+            conf_floor: Minimum confidence of kept candidates
+
+        Returns:
+            CandidateSet: Pre-NMS candidates of every tile in frame pixels
+        """
+        height, width = frame.shape[:2]
+        tiles = make_tiles(width, height, tile_size, overlap)
+
+        crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+        origins = [(int(x0), int(y0)) for x0, y0, _, _ in tiles]
+        if settings.INFERENCE_TILE_INCLUDE_FULL:
+            # Fruits larger than a tile are only whole on the full view
+            crops.append(frame)
+            origins.append((0, 0))
+
+        size = self.input_size
+        step = max(1, settings.INFERENCE_TILE_MAX_BATCH) if self.supports_batching else 1
+        buffer = np.empty((min(step, len(crops)), 3, size, size), dtype=np.float32)
+        infos, outputs = [], []
+        for start in range(0, len(crops), step):
+            chunk = crops[start:start + step]
+            with inference_stage("preprocess"):
+                infos.extend(self._preprocess(crop, out=buffer[i])[1] for i, crop in enumerate(chunk))
+            with inference_stage("session_run"):
+                outputs.extend(self._run_session_direct(buffer[:len(chunk)])[0])
+
+        with inference_stage("postprocess"):
+            return tiled_candidates(outputs, infos, origins, (width, height), conf_threshold=conf_floor)
+
+    def _run_batch(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run a stack of inputs (tiles or images), at most INFERENCE_TILE_MAX_BATCH per session run
+        (one by one for models with a static batch dimension).
+
+        Returns:
+            np.ndarray: First model output for every input, stacked
+        """
+        step = max(1, settings.INFERENCE_TILE_MAX_BATCH) if self.supports_batching else 1
+        outputs = [
+            self._run_session_direct(batch[start:start + step])[0]
+            for start in range(0, len(batch), step)
+        ]
+        return np.concatenate(outputs, axis=0)
+
+    def _summarize(self, detections: np.ndarray, decoded) -> dict:
+        """
+        Build the API result (counts + detection lists) from the structured detections.
+
+        Args:
+            detections: Structured array (postprocess.DETECTION_DTYPE)
+            decoded: Shared DecodedImage, only read for color classification
+                (on the reduced decode when INFERENCE_REDUCED_DECODE made one)
+
+        Returns:
+            dict: {"counts": {...}, "detections": {"boxes", "class_ids", "confidences"}}
+        """
+        class_ids = detections["class_id"].astype(np.int64)
         
-        print(f"Detection after NMS: {len(indexes) if len(indexes) > 0 else 0}")
-        
-        # 8. Process final results ito fit model for apple detection 
-        count_red_apple = 0
-        count_green_apple = 0
-        count_healthy_apple = 0
-        count_damaged_apple = 0
-        
-        
-        #Box settings
-        final_boxes = []
-        final_class_ids = []
-        final_confidences = []
-        
-        # Scale Normalization 
-        x_scale = orig_w / 640
-        y_scale = orig_h / 640
+        boxes = np.stack(
+            [detections["x"], detections["y"], detections["w"], detections["h"]],
+            axis=1
+        )
         
-        if len(indexes) > 0:
-            for i in indexes.flatten():
-                orig_label_id = filtered_class_ids[i]  # Guardamos el original del modelo
-                confidence = filtered_confidences[i]
-                
-                # get boxes in 640px
-                x_640, y_640, w_640, h_640 = nms_boxes[i]
-                
-                # Back to Original size (640x640) - Scaled Boxes
-                x_real = int(x_640 * x_scale)
-                y_real = int(y_640 * y_scale)
-                w_real = int(w_640 * x_scale)
-                h_real = int(h_640 * y_scale)
-                
-                # Clamp to Images bounds (avoid out-of-range)
-                x_real = max(0, x_real)
-                y_real = max(0, y_real)
-                w_real = min(w_real, orig_w - x_real)
-                h_real = min(h_real, orig_h - y_real)
-                
-                if w_real <= 0 or h_real <= 0:
-                    continue
-                
-                # Color classification only for healthy apples (class 0))
-                label_id = orig_label_id
-                if label_id == 0:
-                    # Extract ROI (Region of Interest)
-                    roi = img_original[y_real:y_real + h_real, x_real:x_real + w_real]
-                    if roi.size == 0:
-                        continue  # Empty ROI, skip color classification    
-                    
-                    # Temporaly Disable Clasificar color
-                    #color_class = self._classify_apple_color(roi)
-                    #label_id = color_class  # 0=red, 2=green
-                
-                # Save only once 
-                final_boxes.append([x_real, y_real, w_real, h_real])
-                final_class_ids.append(int(label_id))
-                final_confidences.append(float(confidence))
-                
-                # Class Counting in Image  
-                if label_id == 0:  # red_apple
-                    count_red_apple += 1
-                    count_healthy_apple += 1
-                    
-                elif label_id == 1:  # damaged
-                    count_damaged_apple += 1
-                    
-                elif label_id == 2:  # green_apple
-                    count_green_apple += 1 
-                    count_healthy_apple += 1
-                    
-                else:
-                    continue 
+        # Color classification only for healthy apples (class 0), all boxes in one pass
+        if self.classify_colors and self.fruit == "apple":
+            healthy = np.flatnonzero(class_ids == 0)
+            if healthy.size:
+                frame, scale = decoded.working_frame(self.input_size if settings.INFERENCE_REDUCED_DECODE else None)
+                class_ids[healthy] = classify_box_colors(frame, boxes[healthy] * scale)  # 0=red, 2=green
         
-        # Apple Detection 
-        print(f"Apples Estimation - Healthy: {count_healthy_apple}, Damaged: {count_damaged_apple} ,  Green Apples {count_green_apple}")
+        # Class Counting in Image  
+        count_red_apple = int(np.count_nonzero(class_ids == 0))
+        count_damaged_apple = int(np.count_nonzero(class_ids == 1))
+        count_green_apple = int(np.count_nonzero(class_ids == 2))
+        count_healthy_apple = count_red_apple + count_green_apple
         
         return {
             "counts": {
@@ -260,13 +784,9 @@ class AppleInference:
                 "total": count_red_apple + count_green_apple + count_damaged_apple
             },
             "detections": {
-                "boxes": final_boxes,
-                "class_ids": final_class_ids,
-                "confidences": final_confidences
+                "boxes": boxes.tolist(),
+                "class_ids": class_ids.tolist(),
+                "confidences": detections["confidence"].astype(float).tolist()
             }
         }
 
-
-# Initialize the model engine
-model_path = str(Path(__file__).parent / "weights" / "best_model.onnx")
-model_engine = AppleInference(model_path)
@@ -0,0 +1,173 @@
+"""
+Model variant metadata (weights/model_metadata.json).
+
+Each exported model (FP32, INT8...) is registered under its version name so
+the server can pick one with MODEL_VERSION instead of hard-coding a path:
+
+    {
+        "default": "YOLOv8s-Cyberpunk-v1",
+        "models": {
+            "YOLOv8s-Cyberpunk-v1": {"path": "best_model.onnx", "precision": "fp32", ...},
+            "YOLOv8s-Cyberpunk-v1-int8": {"path": "best_model_int8.onnx", "precision": "int8", ...}
+        }
+    }
+
+Relative paths are resolved against the weights directory.
+
+Variants carry the crop they detect in "fruit" (entries without it are
+apple models). An optional "fruits" map picks the variant served for each
+crop; otherwise the first variant of that crop is used:
+
+    "fruits": {"apple": "YOLOv8s-Cyberpunk-v1", "mango": "YOLOv8s-Mango-v1"}
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+WEIGHTS_DIR = Path(__file__).parent / "weights"
+METADATA_PATH = WEIGHTS_DIR / "model_metadata.json"
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_FRUIT = "apple"
+
+_lock = threading.Lock()
+
+
+def load_metadata(path: Path = METADATA_PATH) -> dict:
+    """Read the metadata file (an empty registry if missing or empty)."""
+    if not path.exists() or path.stat().st_size == 0:
+        return {"default": None, "models": {}, "fruits": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.setdefault("default", None)
+    data.setdefault("models", {})
+    data.setdefault("fruits", {})
+    return data
+
+
+def save_metadata(data: dict, path: Path = METADATA_PATH) -> None:
+    """Write the metadata file atomically."""
+    tmp = path.with_suffix(".json.tmp")
+    with _lock:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=False)
+            f.write("\n")
+        tmp.replace(path)
+
+
+def register_variant(version: str, entry: dict, make_default: bool = False, path: Path = METADATA_PATH) -> dict:
+    """
+    Add or replace a model variant in the metadata file.
+
+    Args:
+        version: Variant name (used as MODEL_VERSION)
+        entry: Variant description; must contain "path"
+        make_default: Also make it the default variant
+
+    Returns:
+        dict: Updated metadata
+    """
+    if "path" not in entry:
+        raise ValueError("Model variant entry needs a 'path'")
+
+    data = load_metadata(path)
+    data["models"][version] = entry
+    if make_default or not data.get("default"):
+        data["default"] = version
+    save_metadata(data, path)
+    return data
+
+
+def resolve_weights_path(model_file: str) -> Path:
+    """Resolve a metadata path (relative to the weights dir) to an absolute path."""
+    candidate = Path(model_file)
+    return candidate if candidate.is_absolute() else WEIGHTS_DIR / candidate
+
+
+def get_variant(version: Optional[str] = None, path: Path = METADATA_PATH) -> Optional[dict]:
+    """Metadata entry of ``version`` (or of the default variant), None if unknown."""
+    data = load_metadata(path)
+    version = version or data.get("default")
+    entry = data["models"].get(version) if version else None
+    return dict(entry, version=version) if entry else None
+
+
+def resolve_model_path() -> str:
+    """
+    Path of the model the server should load.
+
+    An explicit MODEL_PATH always wins; otherwise MODEL_VERSION is looked up
+    in model_metadata.json, falling back to weights/best_model.onnx.
+    """
+    if "MODEL_PATH" in settings.model_fields_set:
+        model_path = Path(settings.MODEL_PATH)
+        return str(model_path if model_path.is_absolute() else PROJECT_ROOT / model_path)
+
+    entry = get_variant(settings.MODEL_VERSION)
+    if entry:
+        return str(resolve_weights_path(entry["path"]))
+
+    return str(WEIGHTS_DIR / "best_model.onnx")
+
+
+def file_version(model_path: str) -> str:
+    """Version derived from a model file: its name plus a short content hash."""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return f"{Path(model_path).stem}-{digest.hexdigest()[:12]}"
+
+
+def resolve_model_version(model_path: str, path: Path = METADATA_PATH) -> str:
+    """
+    Version of the model at ``model_path`` (as returned by resolve_model_path).
+
+    Without an explicit MODEL_PATH this is MODEL_VERSION. An explicit path is
+    a different file than the one MODEL_VERSION names, so its version is the
+    variant registered for that file, else an explicit MODEL_VERSION, else
+    derived from the file itself: cached results and predictions are never
+    attributed to another model.
+    """
+    if "MODEL_PATH" not in settings.model_fields_set:
+        return settings.MODEL_VERSION
+
+    resolved = Path(model_path).resolve()
+    for version, entry in load_metadata(path)["models"].items():
+        if resolve_weights_path(entry["path"]).resolve() == resolved:
+            return version
+
+    if "MODEL_VERSION" in settings.model_fields_set:
+        return settings.MODEL_VERSION
+    return file_version(model_path)
+
+
+def list_fruits(path: Path = METADATA_PATH) -> list:
+    """Crops with at least one registered model (the default crop always included)."""
+    data = load_metadata(path)
+    fruits = {DEFAULT_FRUIT}
+    fruits.update(data["fruits"])
+    fruits.update(entry.get("fruit", DEFAULT_FRUIT) for entry in data["models"].values())
+    return sorted(fruits)
+
+
+def get_fruit_variant(fruit: str, path: Path = METADATA_PATH) -> Optional[dict]:
+    """
+    Metadata entry of the model serving ``fruit``.
+
+    Returns:
+        dict: Variant entry with its "version", or None if no model detects that crop
+    """
+    data = load_metadata(path)
+
+    version = data["fruits"].get(fruit)
+    if version and version in data["models"]:
+        return dict(data["models"][version], version=version)
+
+    for version, entry in data["models"].items():
+        if entry.get("fruit", DEFAULT_FRUIT) == fruit:
+            return dict(entry, version=version)
+    return None
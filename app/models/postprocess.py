@@ -0,0 +1,341 @@
+"""
+Vectorized YOLOv8 post-processing.
+
+Every stage (confidence threshold, cxcywh -> xyxy, scaling back to the
+original image, clipping and NMS) works on NumPy arrays end-to-end, so the
+cost no longer grows with Python loops over the thousands of candidates a
+low threshold lets through.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.models.preprocess import LetterboxInfo
+
+# One row per final detection: [x, y, w, h] in original image pixels
+DETECTION_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("w", np.int32),
+    ("h", np.int32),
+    ("confidence", np.float32),
+    ("class_id", np.int32),
+])
+
+
+@dataclass
+class CandidateSet:
+    """
+    Pre-NMS candidates of one image, in original image pixels.
+
+    Kept above a low confidence floor so any higher threshold can be applied
+    later (threshold + NMS only, no model run).
+
+    Single-image candidates keep their boxes in model input space (with
+    ``input_size`` / ``letterbox`` to map them back after NMS), so
+    re-filtering runs NMS exactly where ``postprocess`` does. Tiled
+    candidates are already in original image pixels (``input_size`` None).
+    """
+    boxes: np.ndarray        # (N, 4) xyxy float32, model input space when input_size is set
+    confidences: np.ndarray  # (N,) float32
+    class_ids: np.ndarray    # (N,) int
+    original_size: Tuple[int, int]
+    conf_floor: float
+    input_size: Optional[int] = None
+    letterbox: Optional[LetterboxInfo] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.boxes.nbytes + self.confidences.nbytes + self.class_ids.nbytes
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form (kept with cached results)."""
+        return {
+            "boxes": self.boxes.tolist(),
+            "confidences": self.confidences.tolist(),
+            "class_ids": self.class_ids.tolist(),
+            "original_size": list(self.original_size),
+            "conf_floor": self.conf_floor,
+            "input_size": self.input_size,
+            "letterbox": [
+                self.letterbox.scale_x, self.letterbox.scale_y,
+                self.letterbox.pad_x, self.letterbox.pad_y,
+                list(self.letterbox.frame_size),
+            ] if self.letterbox is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CandidateSet":
+        return cls(
+            boxes=np.asarray(data["boxes"], dtype=np.float32).reshape(-1, 4),
+            confidences=np.asarray(data["confidences"], dtype=np.float32),
+            class_ids=np.asarray(data["class_ids"], dtype=np.int64),
+            original_size=tuple(data["original_size"]),
+            conf_floor=float(data["conf_floor"]),
+            input_size=data.get("input_size"),
+            letterbox=LetterboxInfo(*data["letterbox"][:4], tuple(data["letterbox"][4]))
+            if data.get("letterbox") else None,
+        )
+
+
+def split_predictions(output: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split one raw YOLOv8 output into boxes and class scores.
+
+    Args:
+        output: Model output for a single image, shape (4 + C, A) or (1, 4 + C, A)
+
+    Returns:
+        tuple: (boxes_cxcywh (A, 4), scores (A, C)) in model input pixels
+    """
+    predictions = np.squeeze(output, axis=0) if output.ndim == 3 else output
+    predictions = predictions.T  # (A, 4 + C)
+    return predictions[:, :4], predictions[:, 4:]
+
+
+def filter_by_confidence(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    threshold: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Keep candidates whose best class score is above ``threshold``.
+
+    Returns:
+        tuple: (boxes (N, 4), confidences (N,), class_ids (N,))
+    """
+    class_ids = np.argmax(scores, axis=1)
+    confidences = np.take_along_axis(scores, class_ids[:, None], axis=1)[:, 0]
+    mask = confidences > threshold
+    return boxes[mask], confidences[mask], class_ids[mask]
+
+
+def xywh_to_xyxy(boxes: np.ndarray) -> np.ndarray:
+    """Convert center format (cx, cy, w, h) to corners (x1, y1, x2, y2)."""
+    xyxy = np.empty_like(boxes, dtype=np.float32)
+    half_w = boxes[:, 2] / 2
+    half_h = boxes[:, 3] / 2
+    xyxy[:, 0] = boxes[:, 0] - half_w
+    xyxy[:, 1] = boxes[:, 1] - half_h
+    xyxy[:, 2] = boxes[:, 0] + half_w
+    xyxy[:, 3] = boxes[:, 1] + half_h
+    return xyxy
+
+
+def scale_boxes(
+    boxes: np.ndarray,
+    scale_x: float,
+    scale_y: float,
+) -> np.ndarray:
+    """Scale xyxy boxes from model input space to original image space (in place)."""
+    boxes[:, [0, 2]] *= scale_x
+    boxes[:, [1, 3]] *= scale_y
+    return boxes
+
+
+def to_original(
+    boxes: np.ndarray,
+    original_size: Tuple[int, int],
+    input_size: int,
+    letterbox: Optional[LetterboxInfo] = None,
+) -> np.ndarray:
+    """Map xyxy boxes from model input space to original image pixels (in place)."""
+    if letterbox is not None:
+        return letterbox.to_original(boxes, original_size)
+    orig_w, orig_h = original_size
+    return scale_boxes(boxes, orig_w / input_size, orig_h / input_size)
+
+
+def clip_boxes(boxes: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Clamp xyxy boxes to the image bounds (in place)."""
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+    return boxes
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy non-maximum suppression on xyxy boxes.
+
+    Each iteration keeps the best remaining box and drops, in one vectorized
+    step, every remaining box overlapping it more than ``iou_threshold``.
+
+    Returns:
+        np.ndarray: Indices of kept boxes, highest score first
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    order = np.argsort(-scores, kind="stable")
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        if rest.size == 0:
+            break
+
+        inter_w = np.maximum(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0)
+        inter_h = np.maximum(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0)
+        inter = inter_w * inter_h
+        union = areas[i] + areas[rest] - inter
+        iou = np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.asarray(keep, dtype=np.intp)
+
+
+def batched_nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: np.ndarray,
+    iou_threshold: float,
+    agnostic: bool = False,
+) -> np.ndarray:
+    """
+    Class-aware NMS: boxes of different classes never suppress each other.
+
+    Uses the coordinate-offset trick (shift every class to its own region of
+    the plane) so a single ``nms`` call handles all classes.
+
+    Args:
+        agnostic: If True, run plain NMS across all classes
+
+    Returns:
+        np.ndarray: Indices of kept boxes, highest score first
+    """
+    if agnostic or len(boxes) == 0:
+        return nms(boxes, scores, iou_threshold)
+
+    # Coordinate range, not max: unclipped boxes (and tile candidates) can be negative
+    span = float(boxes.max()) - float(boxes.min()) + 1.0
+    offsets = class_ids.astype(np.float32)[:, None] * span
+    return nms(boxes + offsets, scores, iou_threshold)
+
+
+def to_detections(boxes: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+    """
+    Pack xyxy boxes into the structured detection array (integer xywh).
+
+    Degenerate boxes (no width/height after clipping) are dropped.
+    """
+    x = np.floor(boxes[:, 0]).astype(np.int32)
+    y = np.floor(boxes[:, 1]).astype(np.int32)
+    w = np.floor(boxes[:, 2]).astype(np.int32) - x
+    h = np.floor(boxes[:, 3]).astype(np.int32) - y
+    valid = (w > 0) & (h > 0)
+
+    detections = np.empty(int(valid.sum()), dtype=DETECTION_DTYPE)
+    detections["x"] = x[valid]
+    detections["y"] = y[valid]
+    detections["w"] = w[valid]
+    detections["h"] = h[valid]
+    detections["confidence"] = confidences[valid]
+    detections["class_id"] = class_ids[valid]
+    return detections
+
+
+def postprocess(
+    output: np.ndarray,
+    original_size: Tuple[int, int],
+    input_size: int = 640,
+    conf_threshold: float = 0.45,
+    iou_threshold: float = 0.45,
+    agnostic: bool = True,
+    letterbox: Optional[LetterboxInfo] = None,
+) -> np.ndarray:
+    """
+    Full post-processing of one image: threshold, NMS, scale and clip.
+
+    NMS runs in model input space (as the previous loop-based code did) and
+    survivors are then mapped back to the original resolution, undoing the
+    letterbox padding when the input was letterboxed.
+
+    Args:
+        output: Raw model output for one image
+        original_size: (width, height) of the original image
+        input_size: Model input side
+        conf_threshold: Minimum class confidence
+        iou_threshold: NMS IoU threshold
+        agnostic: Class-agnostic NMS (an apple and a damaged apple on the same
+            fruit should suppress each other)
+        letterbox: Frame -> model input mapping from preprocessing; None means
+            the whole original image was stretched to input_size
+
+    Returns:
+        np.ndarray: Structured array with DETECTION_DTYPE, highest confidence first
+    """
+    boxes, scores = split_predictions(output)
+    boxes, confidences, class_ids = filter_by_confidence(boxes, scores, conf_threshold)
+
+    boxes = xywh_to_xyxy(boxes)
+    keep = batched_nms(boxes, confidences, class_ids, iou_threshold, agnostic=agnostic)
+    boxes, confidences, class_ids = boxes[keep], confidences[keep], class_ids[keep]
+
+    boxes = to_original(boxes, original_size, input_size, letterbox)
+    boxes = clip_boxes(boxes, *original_size)
+
+    return to_detections(boxes, confidences, class_ids)
+
+
+def extract_candidates(
+    output: np.ndarray,
+    original_size: Tuple[int, int],
+    input_size: int = 640,
+    conf_floor: float = 0.05,
+    letterbox: Optional[LetterboxInfo] = None,
+) -> CandidateSet:
+    """
+    Candidates above ``conf_floor``, before NMS (boxes stay in model input
+    space and are mapped to original pixels by ``filter_candidates``).
+
+    Args:
+        output: Raw model output for one image
+        original_size: (width, height) of the original image
+        input_size: Model input side
+        conf_floor: Lowest threshold that can be re-applied later
+        letterbox: Frame -> model input mapping (None: stretch resize)
+
+    Returns:
+        CandidateSet
+    """
+    boxes, scores = split_predictions(output)
+    boxes, confidences, class_ids = filter_by_confidence(boxes, scores, conf_floor)
+
+    boxes = xywh_to_xyxy(boxes)
+    return CandidateSet(
+        boxes, confidences.astype(np.float32), class_ids, original_size, conf_floor,
+        input_size=input_size, letterbox=letterbox
+    )
+
+
+def filter_candidates(
+    candidates: CandidateSet,
+    conf_threshold: float,
+    iou_threshold: float = 0.45,
+    agnostic: bool = True,
+) -> np.ndarray:
+    """
+    Threshold + NMS + clip of stored candidates. NMS runs in the space the
+    boxes were stored in (model input space for single images, like
+    ``postprocess``), then survivors are mapped to original pixels.
+
+    Returns:
+        np.ndarray: Structured array with DETECTION_DTYPE, highest confidence first
+    """
+    mask = candidates.confidences > conf_threshold
+    boxes = candidates.boxes[mask]
+    confidences = candidates.confidences[mask]
+    class_ids = candidates.class_ids[mask]
+
+    keep = batched_nms(boxes, confidences, class_ids, iou_threshold, agnostic=agnostic)
+    boxes = boxes[keep].copy()
+    if candidates.input_size is not None:
+        boxes = to_original(boxes, candidates.original_size, candidates.input_size, candidates.letterbox)
+    boxes = clip_boxes(boxes, *candidates.original_size)
+    return to_detections(boxes, confidences[keep], class_ids[keep])
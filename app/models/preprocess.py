@@ -0,0 +1,129 @@
+"""
+Model input preparation.
+
+Letterboxes frames into a preallocated, per-worker float32 CHW tensor:
+the resize writes straight into a reusable padded canvas, and BGR -> RGB,
+uint8 -> float32, /255 and HWC -> CHW are fused into a single NumPy pass
+that writes into the reusable tensor. Nothing full-size is allocated per
+call once a worker thread has its buffers.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+@dataclass(frozen=True)
+class LetterboxInfo:
+    """
+    Mapping between frame pixels and model input pixels.
+
+    model = frame * scale + pad, per axis. A plain stretch resize is the
+    special case with no padding and different x/y scales.
+    """
+    scale_x: float
+    scale_y: float
+    pad_x: float
+    pad_y: float
+    frame_size: Tuple[int, int]  # (width, height) of the frame fed to the model
+
+    @classmethod
+    def stretch(cls, frame_size: Tuple[int, int], input_size: int) -> "LetterboxInfo":
+        """Mapping of the legacy aspect-distorting resize."""
+        width, height = frame_size
+        return cls(input_size / width, input_size / height, 0.0, 0.0, frame_size)
+
+    def to_original(self, boxes: np.ndarray, original_size: Tuple[int, int]) -> np.ndarray:
+        """
+        Map xyxy boxes from model input space back to original image pixels (in place).
+
+        ``original_size`` may differ from ``frame_size`` when the frame is a
+        reduced-resolution decode of the original image.
+        """
+        orig_w, orig_h = original_size
+        frame_w, frame_h = self.frame_size
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - self.pad_x) * (orig_w / (frame_w * self.scale_x))
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - self.pad_y) * (orig_h / (frame_h * self.scale_y))
+        return boxes
+
+
+class LetterboxPreprocessor:
+    """
+    Letterbox preprocessing into reusable input tensors.
+
+    Buffers are per thread, so concurrent inference workers never share them.
+    The tensor returned without ``out`` is overwritten by the next call on the
+    same thread; callers that need to keep it must copy (ONNX Runtime and
+    the batch scheduler already do).
+    """
+
+    def __init__(self, input_size: int = 640, pad_value: int = 114):
+        """
+        Args:
+            input_size: Square model input side
+            pad_value: Gray level of the padding (YOLOv8 training default)
+        """
+        self.input_size = input_size
+        self.pad_value = pad_value
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.allocations = 0  # buffer sets allocated (one per worker thread)
+
+    def _buffers(self) -> Tuple[np.ndarray, np.ndarray]:
+        canvas = getattr(self._local, "canvas", None)
+        if canvas is None:
+            size = self.input_size
+            canvas = np.empty((size, size, 3), dtype=np.uint8)
+            self._local.canvas = canvas
+            self._local.tensor = np.empty((1, 3, size, size), dtype=np.float32)
+            with self._lock:
+                self.allocations += 1
+        return canvas, self._local.tensor
+
+    def __call__(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, LetterboxInfo]:
+        """
+        Letterbox ``frame`` (BGR uint8) into the model input tensor.
+
+        Args:
+            frame: BGR image of any size
+            out: Optional destination of shape (3, S, S) float32, e.g. a slice of a
+                batch tensor; defaults to this thread's (1, 3, S, S) buffer
+
+        Returns:
+            tuple: (tensor, LetterboxInfo)
+        """
+        size = self.input_size
+        height, width = frame.shape[:2]
+        ratio = min(size / width, size / height)
+        new_w = max(1, int(round(width * ratio)))
+        new_h = max(1, int(round(height * ratio)))
+        pad_x = (size - new_w) // 2
+        pad_y = (size - new_h) // 2
+
+        canvas, tensor = self._buffers()
+        canvas.fill(self.pad_value)
+
+        region = canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+        resized = cv2.resize(frame, (new_w, new_h), dst=region, interpolation=cv2.INTER_LINEAR)
+        if resized is not region:  # bindings could not write into the view
+            region[...] = resized
+
+        target = out if out is not None else tensor[0]
+        # Fused BGR -> RGB, HWC -> CHW, uint8 -> float32 and /255 in one pass
+        np.multiply(
+            canvas[:, :, ::-1].transpose(2, 0, 1),
+            np.float32(1.0 / 255.0),
+            out=target,
+            dtype=np.float32,
+        )
+
+        info = LetterboxInfo(
+            scale_x=new_w / width,
+            scale_y=new_h / height,
+            pad_x=float(pad_x),
+            pad_y=float(pad_y),
+            frame_size=(width, height),
+        )
+        return (out if out is not None else tensor), info
@@ -0,0 +1,332 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from app.core.config import settings
+from app.core.logging import logger_ml
+from app.models.inference import AppleInference
+from app.models.metadata import (
+    DEFAULT_FRUIT,
+    get_fruit_variant,
+    list_fruits,
+    resolve_model_path,
+    resolve_model_version,
+    resolve_weights_path,
+)
+
+# Resident memory of a CPU session relative to its .onnx file size
+# (weights + arena + optimized graph), used when metadata has no "memory_mb"
+SESSION_MEMORY_FACTOR = 2.0
+
+
+class ModelUnavailable(Exception):
+    """Raised when the inference model cannot be loaded (missing file, bad export...)."""
+
+
+class UnknownFruit(ValueError):
+    """Raised when no registered model detects the requested crop."""
+
+
+class ModelRegistry:
+    """
+    Lazy holder of the inference engine.
+
+    Nothing is loaded at import time: importing the API (auth, farming,
+    tests...) never pays the ONNX session creation, and a missing model file
+    only affects inference endpoints. The engine is created on first use, or
+    ahead of time by ``start_background_load`` during app startup.
+
+    States: ``not_loaded`` -> ``loading`` -> ``ready`` | ``failed``.
+    A failed load is retried on the next request. Warm-up is tracked
+    separately (``pending`` -> ``running`` -> ``done`` | ``failed``).
+    """
+
+    def __init__(self, loader: Callable[[], AppleInference]):
+        """
+        Args:
+            loader: Callable building a ready-to-use engine
+        """
+        self._loader = loader
+        self._engine: Optional[AppleInference] = None
+        self._lock = threading.Lock()
+        self.state = "not_loaded"
+        self.error: Optional[str] = None
+        self.load_time_ms: Optional[float] = None
+        self.warmup_state = "pending"
+        self.warmup_timings: dict = {}
+
+    @property
+    def is_ready(self) -> bool:
+        return self._engine is not None
+
+    @property
+    def is_warm(self) -> bool:
+        """Loaded and warmed up: safe to receive production traffic."""
+        return self.is_ready and self.warmup_state == "done"
+
+    @property
+    def model_version(self) -> str:
+        """Version of the loaded engine (configured version until loaded)."""
+        return self._engine.model_version if self._engine is not None else settings.MODEL_VERSION
+
+    def peek(self) -> Optional[AppleInference]:
+        """The engine if already loaded, without triggering a load."""
+        return self._engine
+
+    def get(self) -> AppleInference:
+        """
+        Return the engine, loading it (blocking) if needed.
+
+        Raises:
+            ModelUnavailable: If the model cannot be loaded
+        """
+        if self._engine is not None:
+            return self._engine
+
+        with self._lock:
+            if self._engine is None:
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    self._engine = self._loader()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    logger_ml.error("Model load failed", error=str(e))
+                    raise ModelUnavailable(str(e)) from e
+                self.load_time_ms = round((time.perf_counter() - started) * 1000, 2)
+                self.state = "ready"
+                self.error = None
+                logger_ml.info(
+                    "Model loaded",
+                    model_version=self._engine.model_version,
+                    load_time_ms=self.load_time_ms,
+                )
+
+        return self._engine
+
+    async def aget(self) -> AppleInference:
+        """Async variant of ``get``: a pending load runs off the event loop."""
+        if self._engine is not None:
+            return self._engine
+        return await asyncio.to_thread(self.get)
+
+    def warm_up(self, batch_sizes: Sequence[int] = (1,), iterations: int = 3) -> dict:
+        """
+        Load the engine if needed and run its synthetic warm-up.
+
+        Returns:
+            dict: batch size -> average warm-up latency (ms)
+
+        Raises:
+            ModelUnavailable: If the model cannot be loaded
+        """
+        engine = self.get()
+        self.warmup_state = "running"
+        try:
+            timings = engine.warmup(batch_sizes, iterations)
+        except Exception as e:
+            self.warmup_state = "failed"
+            logger_ml.error("Model warm-up failed", error=str(e))
+            raise
+
+        self.warmup_timings = timings
+        self.warmup_state = "done"
+        logger_ml.info("Model warm-up complete", iterations=iterations, latency_ms=timings)
+        return timings
+
+    def start_background_load(
+        self,
+        warmup: bool = False,
+        batch_sizes: Sequence[int] = (1,),
+        iterations: int = 3,
+    ) -> threading.Thread:
+        """
+        Load (and optionally warm up) the engine in a daemon thread.
+
+        Without warm-up the engine counts as warm as soon as it is loaded.
+        """
+        def target():
+            try:
+                if warmup:
+                    self.warm_up(batch_sizes, iterations)
+                else:
+                    self.get()
+                    self.warmup_state = "done"
+            except Exception:
+                pass  # state/error already recorded, surfaced on /health and /ready
+
+        thread = threading.Thread(target=target, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> dict:
+        """Readiness information for health checks."""
+        return {
+            "state": self.state,
+            "ready": self.is_ready,
+            "model_version": self.model_version,
+            "load_time_ms": self.load_time_ms,
+            "warmup": self.warmup_state,
+            "warmup_latency_ms": self.warmup_timings,
+            "error": self.error,
+        }
+
+    def unload(self) -> None:
+        """Drop the engine (its batch scheduler stops once in-flight runs finish)."""
+        with self._lock:
+            if self._engine is not None:
+                self._engine.close()
+            self._engine = None
+            self.state = "not_loaded"
+            self.warmup_state = "pending"
+
+
+def _with_batching(engine: AppleInference) -> AppleInference:
+    if settings.INFERENCE_BATCHING_ENABLED:
+        engine.enable_batching(
+            max_batch_size=settings.INFERENCE_BATCH_MAX_SIZE,
+            max_wait_ms=settings.INFERENCE_BATCH_MAX_WAIT_MS,
+        )
+    return engine
+
+
+def load_default_engine() -> AppleInference:
+    """Build the engine for MODEL_PATH / MODEL_VERSION with the configured batching."""
+    model_path = resolve_model_path()
+    engine = AppleInference(model_path)
+    engine.model_version = resolve_model_version(model_path)
+    return _with_batching(engine)
+
+
+def load_variant_engine(entry: dict) -> AppleInference:
+    """Build the engine of a metadata variant (path, classes, input size, fruit)."""
+    engine = AppleInference(
+        str(resolve_weights_path(entry["path"])),
+        classes=entry.get("classes"),
+        input_size=entry.get("input_size"),
+        fruit=entry.get("fruit", DEFAULT_FRUIT),
+    )
+    engine.model_version = entry["version"]
+    return _with_batching(engine)
+
+
+def estimate_session_mb(entry: dict) -> float:
+    """Expected resident memory (MB) of a variant's session."""
+    if entry.get("memory_mb"):
+        return float(entry["memory_mb"])
+    model_file = Path(resolve_weights_path(entry["path"]))
+    size_mb = model_file.stat().st_size / (1024 * 1024) if model_file.exists() else 0.0
+    return round(size_mb * SESSION_MEMORY_FACTOR, 2)
+
+
+class FruitModelPool:
+    """
+    Per-crop engines loaded on demand, kept in an LRU bounded by memory.
+
+    The default crop is served by the shared ``model_registry`` (preloaded,
+    warmed up, never evicted). Other crops get their own ModelRegistry on
+    first request; when the estimated memory of loaded sessions would exceed
+    the budget, least recently used crops are evicted.
+    """
+
+    def __init__(self, default_registry: ModelRegistry, budget_mb: float):
+        """
+        Args:
+            default_registry: Registry serving DEFAULT_FRUIT (pinned)
+            budget_mb: Memory budget (MB) for the non-default sessions
+        """
+        self.default_registry = default_registry
+        self.budget_mb = budget_mb
+        self._slots: "OrderedDict[str, ModelRegistry]" = OrderedDict()
+        self._sizes: dict = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def fruits(self) -> list:
+        """Crops that can be requested."""
+        return list_fruits()
+
+    def registry_for(self, fruit: str) -> ModelRegistry:
+        """
+        Registry of ``fruit`` (marked most recently used).
+
+        Raises:
+            UnknownFruit: If no model is registered for the crop
+        """
+        fruit = (fruit or DEFAULT_FRUIT).lower()
+        if fruit == DEFAULT_FRUIT:
+            return self.default_registry
+
+        with self._lock:
+            slot = self._slots.get(fruit)
+            if slot is not None:
+                self._slots.move_to_end(fruit)
+                return slot
+
+            entry = get_fruit_variant(fruit)
+            if entry is None:
+                raise UnknownFruit(fruit)
+
+            size_mb = estimate_session_mb(entry)
+            self._evict_for(size_mb)
+
+            slot = ModelRegistry(lambda: load_variant_engine(entry))
+            self._slots[fruit] = slot
+            self._sizes[fruit] = size_mb
+            return slot
+
+    def get(self, fruit: str) -> AppleInference:
+        """Engine of ``fruit``, loading it (blocking) if needed."""
+        return self.registry_for(fruit).get()
+
+    async def aget(self, fruit: str) -> AppleInference:
+        """Engine of ``fruit``; a pending load runs off the event loop."""
+        return await self.registry_for(fruit).aget()
+
+    def _evict_for(self, size_mb: float) -> None:
+        """Unload LRU crops until ``size_mb`` fits in the budget (lock held)."""
+        while self._slots and sum(self._sizes.values()) + size_mb > self.budget_mb:
+            fruit, slot = self._slots.popitem(last=False)
+            self._sizes.pop(fruit, None)
+            slot.unload()
+            self.evictions += 1
+            logger_ml.info("Model session evicted", fruit=fruit, budget_mb=self.budget_mb)
+
+    def stats(self) -> dict:
+        """Loaded crops and memory accounting."""
+        with self._lock:
+            return {
+                "budget_mb": self.budget_mb,
+                "used_mb": round(sum(self._sizes.values()), 2),
+                "evictions": self.evictions,
+                "default": {DEFAULT_FRUIT: self.default_registry.status()},
+                "loaded": {fruit: slot.status() for fruit, slot in self._slots.items()},
+            }
+
+    def unload_all(self) -> None:
+        """Drop every non-default session."""
+        with self._lock:
+            for slot in self._slots.values():
+                slot.unload()
+            self._slots.clear()
+            self._sizes.clear()
+
+
+def warmup_batch_sizes() -> list:
+    """Batch sizes to warm: MODEL_WARMUP_BATCH_SIZES, or 1 and the micro-batch limit."""
+    if settings.MODEL_WARMUP_BATCH_SIZES:
+        return list(settings.MODEL_WARMUP_BATCH_SIZES)
+    if settings.INFERENCE_BATCHING_ENABLED:
+        return [1, settings.INFERENCE_BATCH_MAX_SIZE]
+    return [1]
+
+
+# Shared registry (loaded lazily or by the startup background task)
+model_registry = ModelRegistry(load_default_engine)
+
+# Other crops, loaded on demand within MODEL_MEMORY_BUDGET_MB
+fruit_models = FruitModelPool(model_registry, settings.MODEL_MEMORY_BUDGET_MB)
@@ -0,0 +1,149 @@
+"""
+Tiled (sliced) inference helpers for high-resolution images.
+
+A 4000x3000 photo squeezed into 640x640 leaves distant apples a few pixels
+wide. Tiling cuts the frame into overlapping tiles that are each fed to the
+model near native resolution; detections from every tile are mapped back to
+frame coordinates and merged with a cross-tile NMS, so fruits cut by a tile
+border (seen twice thanks to the overlap) are counted once.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.postprocess import (
+    CandidateSet,
+    filter_by_confidence,
+    filter_candidates,
+    split_predictions,
+    xywh_to_xyxy,
+)
+from app.models.preprocess import LetterboxInfo
+
+
+def tile_starts(length: int, tile: int, stride: int) -> List[int]:
+    """
+    Start offsets covering ``length`` with tiles of ``tile`` pixels.
+
+    The last tile is aligned to the end of the axis instead of running past it.
+    """
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def make_tiles(width: int, height: int, tile_size: int, overlap: float = 0.2) -> np.ndarray:
+    """
+    Overlapping tile grid of a frame.
+
+    Args:
+        width, height: Frame size
+        tile_size: Tile side in frame pixels
+        overlap: Fraction of the tile shared with its neighbour, in [0, 1)
+
+    Returns:
+        np.ndarray: (N, 4) int array of tiles as x0, y0, x1, y1
+    """
+    if tile_size <= 0:
+        raise ValueError("tile_size must be positive")
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in [0, 1)")
+
+    stride = max(1, int(round(tile_size * (1 - overlap))))
+    xs = tile_starts(width, tile_size, stride)
+    ys = tile_starts(height, tile_size, stride)
+
+    tiles = np.array(
+        [(x, y, min(x + tile_size, width), min(y + tile_size, height)) for y in ys for x in xs],
+        dtype=np.int64,
+    )
+    return tiles
+
+
+def tile_candidates(
+    output: np.ndarray,
+    info: LetterboxInfo,
+    origin: Tuple[int, int],
+    scale: float,
+    conf_threshold: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Thresholded candidates of one tile, as xyxy boxes in original image pixels.
+
+    Args:
+        output: Raw model output of the tile
+        info: Letterbox mapping of the tile
+        origin: (x0, y0) of the tile in the inference frame
+        scale: Original image pixels per inference frame pixel
+
+    Returns:
+        tuple: (boxes (N, 4), confidences (N,), class_ids (N,))
+    """
+    boxes, scores = split_predictions(output)
+    boxes, confidences, class_ids = filter_by_confidence(boxes, scores, conf_threshold)
+
+    boxes = xywh_to_xyxy(boxes)
+    boxes = info.to_original(boxes, info.frame_size)  # tile pixels
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] + origin[0]) * scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] + origin[1]) * scale
+    return boxes, confidences, class_ids
+
+
+def tiled_candidates(
+    outputs: Sequence[np.ndarray],
+    infos: Sequence[LetterboxInfo],
+    origins: Sequence[Tuple[int, int]],
+    original_size: Tuple[int, int],
+    scale: float = 1.0,
+    conf_threshold: float = 0.45,
+) -> CandidateSet:
+    """Pre-NMS candidates of all tiles, in original image pixels."""
+    parts = [
+        tile_candidates(output, info, origin, scale, conf_threshold)
+        for output, info, origin in zip(outputs, infos, origins)
+    ]
+
+    boxes = np.concatenate([p[0] for p in parts]) if parts else np.empty((0, 4), np.float32)
+    confidences = np.concatenate([p[1] for p in parts]) if parts else np.empty(0, np.float32)
+    class_ids = np.concatenate([p[2] for p in parts]) if parts else np.empty(0, np.int64)
+
+    return CandidateSet(boxes, confidences.astype(np.float32), class_ids, original_size, conf_threshold)
+
+
+def merge_tiles(
+    outputs: Sequence[np.ndarray],
+    infos: Sequence[LetterboxInfo],
+    origins: Sequence[Tuple[int, int]],
+    original_size: Tuple[int, int],
+    scale: float = 1.0,
+    conf_threshold: float = 0.45,
+    iou_threshold: float = 0.45,
+    agnostic: bool = True,
+) -> np.ndarray:
+    """
+    Merge per-tile outputs into one detection array.
+
+    Candidates of all tiles go through a single NMS in original image space,
+    which both removes the usual overlapping predictions and de-duplicates
+    fruits seen by two neighbouring tiles.
+
+    Returns:
+        np.ndarray: Structured array with DETECTION_DTYPE, highest confidence first
+    """
+    candidates = tiled_candidates(outputs, infos, origins, original_size, scale, conf_threshold)
+    return filter_candidates(candidates, conf_threshold, iou_threshold, agnostic)
+
+
+def validate_tile_params(tile_size: Optional[int], overlap: float, input_size: int) -> None:
+    """
+    Check request tile parameters.
+
+    Raises:
+        ValueError: If the tile size or overlap is out of range
+    """
+    if tile_size is not None and not input_size // 4 <= tile_size <= input_size * 4:
+        raise ValueError(f"tile_size must be between {input_size // 4} and {input_size * 4}")
+    if not 0 <= overlap <= 0.5:
+        raise ValueError("tile_overlap must be between 0 and 0.5")
@@ -22,6 +22,8 @@ class YieldResponse(YieldBase):
     
     id: int
     created_at: datetime
+    # "pending" while the rendered image is still being stored
+    image_status: str = "stored"
 
     class Config:
         # It allows Pydantic to read the models 
@@ -87,4 +89,20 @@ class SaveDetectionRequest(BaseModel):
                 "orchard_id": 1,
                 "tree_id": 5
             }
-        }
\ No newline at end of file
+        }
+
+class SavePreviewRequest(BaseModel):
+    """Schema for saving a stored preview (counts and detections come from the server)"""
+
+    user_notes: Optional[str] = None
+    orchard_id: Optional[int] = Field(default=None, description="Overrides the orchard given at preview time")
+    tree_id: Optional[int] = Field(default=None, description="Overrides the tree given at preview time")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "user_notes": "Tree looks healthy, minor pest damage on 2 apples",
+                "orchard_id": 1,
+                "tree_id": 5
+            }
+        }
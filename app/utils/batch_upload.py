@@ -0,0 +1,183 @@
+"""
+Multi-image uploads for ``/estimate/batch``.
+
+Field crews send a whole row of trees at once: either many image files or
+a single zip. Each image can be assigned to a tree, by position or by
+filename.
+"""
+import io
+import json
+import os
+import zipfile
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from fastapi import UploadFile
+
+from app.utils.upload_stream import UploadError, UploadTooLarge, read_image_upload, read_upload
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+
+class BatchUploadError(ValueError):
+    """Invalid batch upload (bad zip, unsupported file, bad tree IDs...)."""
+
+
+class BatchTooLarge(BatchUploadError):
+    """Too many images, or an image above the size limit."""
+
+
+@dataclass
+class BatchImage:
+    """One image of a batch upload."""
+    filename: str
+    data: bytes
+    content_hash: Optional[str] = None  # SHA-256, when computed while reading
+
+
+def _is_zip(upload: UploadFile) -> bool:
+    return upload.content_type in ZIP_CONTENT_TYPES or (upload.filename or "").lower().endswith(".zip")
+
+
+def _zip_images(data: bytes, max_file_bytes: int, max_images: int, max_total_bytes: int) -> List[BatchImage]:
+    """
+    Image members of a zip, in archive order (folders and OS metadata skipped).
+
+    The image count and the total decompressed size are checked before each
+    member is read, so a zip bomb fails fast instead of filling memory.
+
+    Args:
+        data: Zip archive bytes
+        max_file_bytes: Maximum decompressed size of one image
+        max_images: Images still allowed in the batch
+        max_total_bytes: Decompressed bytes still allowed in the batch
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise BatchUploadError("Invalid zip archive")
+
+    images = []
+    total_bytes = 0
+    with archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith(".") or "__MACOSX" in info.filename:
+                continue
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if len(images) >= max_images:
+                raise BatchTooLarge("Too many images in the batch")
+            # Declared size first, then a bounded read (the header can lie)
+            if info.file_size > max_file_bytes:
+                raise BatchTooLarge(f"{name} exceeds the maximum image size")
+            limit = min(max_file_bytes, max_total_bytes - total_bytes)
+            if info.file_size > limit:
+                raise BatchTooLarge("The batch exceeds the maximum total size")
+            with archive.open(info) as member:
+                content = member.read(limit + 1)
+            if len(content) > max_file_bytes:
+                raise BatchTooLarge(f"{name} exceeds the maximum image size")
+            if len(content) > limit:
+                raise BatchTooLarge("The batch exceeds the maximum total size")
+            total_bytes += len(content)
+            images.append(BatchImage(name, content))
+    return images
+
+
+async def collect_batch_images(
+    files: Sequence[UploadFile],
+    allowed_types: Sequence[str],
+    max_images: int,
+    max_file_bytes: int,
+) -> List[BatchImage]:
+    """
+    Flatten the uploaded files (images and/or zips) into a list of images.
+
+    Files are read in bounded chunks; plain images are checked by magic bytes.
+
+    Args:
+        files: Uploaded files
+        allowed_types: Accepted image content types
+        max_images: Maximum number of images in the batch
+        max_file_bytes: Maximum size of one image
+
+    Returns:
+        list: BatchImage per image, in upload (then archive) order
+
+    Raises:
+        BatchUploadError: Unsupported file, invalid zip or empty batch
+        BatchTooLarge: Too many images or an image above max_file_bytes
+    """
+    images: List[BatchImage] = []
+    max_total_bytes = max_file_bytes * max_images
+    for upload in files:
+        try:
+            if _is_zip(upload):
+                data = await read_upload(upload, max_total_bytes)
+                total_bytes = sum(len(image.data) for image in images)
+                images.extend(_zip_images(
+                    data,
+                    max_file_bytes,
+                    max_images - len(images),
+                    max_total_bytes - total_bytes
+                ))
+            else:
+                image = await read_image_upload(upload, allowed_types, max_file_bytes)
+                images.append(BatchImage(
+                    os.path.basename(upload.filename or f"image.{image.extension}"),
+                    image.data,
+                    image.content_hash
+                ))
+        except UploadTooLarge:
+            raise BatchTooLarge(f"{upload.filename} exceeds the maximum size")
+        except UploadError as e:
+            raise BatchUploadError(f"{upload.filename}: {e}. Zip archives of images are also accepted")
+
+        if len(images) > max_images:
+            raise BatchTooLarge(f"A batch can contain at most {max_images} images")
+
+    if not images:
+        raise BatchUploadError("No images found in the upload")
+    return images
+
+
+def parse_tree_ids(raw: Optional[str], filenames: Sequence[str]) -> List[Optional[int]]:
+    """
+    Tree ID of every image of a batch.
+
+    Args:
+        raw: JSON list aligned with the images (null for no tree), or JSON
+            object mapping filename -> tree ID; None assigns no tree
+        filenames: Image filenames, in batch order
+
+    Returns:
+        list: Tree ID (or None) per image
+
+    Raises:
+        BatchUploadError: If ``raw`` is malformed or does not match the images
+    """
+    if raw is None or not raw.strip():
+        return [None] * len(filenames)
+
+    try:
+        parsed = json.loads(raw)
+    except ValueError:
+        raise BatchUploadError("tree_ids must be a JSON list or object")
+
+    if isinstance(parsed, dict):
+        unknown = set(parsed) - set(filenames)
+        if unknown:
+            raise BatchUploadError(f"tree_ids references unknown files: {', '.join(sorted(unknown))}")
+        tree_ids = [parsed.get(name) for name in filenames]
+    elif isinstance(parsed, list):
+        if len(parsed) != len(filenames):
+            raise BatchUploadError(f"tree_ids has {len(parsed)} entries for {len(filenames)} images")
+        tree_ids = parsed
+    else:
+        raise BatchUploadError("tree_ids must be a JSON list or object")
+
+    if any(tree_id is not None and (not isinstance(tree_id, int) or isinstance(tree_id, bool)) for tree_id in tree_ids):
+        raise BatchUploadError("tree_ids entries must be integers or null")
+    return tree_ids
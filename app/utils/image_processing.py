@@ -1,9 +1,288 @@
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple, Union
+
 import cv2
 import numpy as np
 
+
+# libjpeg scaled decoding flags (DCT-domain downscale, much cheaper than full decode)
+REDUCED_DECODE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# JPEG Start-Of-Frame markers carrying the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def probe_image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from a JPEG or PNG header without decoding pixels.
+
+    Args:
+        data: Encoded image bytes
+
+    Returns:
+        tuple | None: (width, height), or None if the format is not recognized
+    """
+    # PNG: fixed IHDR position
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    # JPEG: walk the marker segments until a SOF marker
+    i, n = 2, len(data)
+    while i + 3 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # standalone markers
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+
+    return None
+
+
+def reduced_decode_factor(width: int, height: int, target_size: int) -> int:
+    """
+    Largest libjpeg reduction (8, 4, 2) that keeps both sides >= target_size.
+
+    Returns:
+        int: Reduction factor, 1 when the image is too small to reduce
+    """
+    for factor in (8, 4, 2):
+        if -(-width // factor) >= target_size and -(-height // factor) >= target_size:
+            return factor
+    return 1
+
+
+class DecodedImage:
+    """
+    Uploaded image shared across the whole estimation pipeline.
+
+    Wraps the raw upload bytes and decodes them lazily, at most once, so
+    inference, ROI color analysis and overlay rendering all reuse the same
+    BGR buffer instead of each calling ``cv2.imdecode`` on 12MP photos.
+
+    The decoded frame must be treated as read-only; consumers that draw on
+    it (e.g. ``draw_cyberpunk_detections``) work on a copy.
+    """
+
+    def __init__(
+        self,
+        data: Optional[bytes] = None,
+        frame: Optional[np.ndarray] = None,
+        filename: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ):
+        """
+        Args:
+            data: Raw encoded image bytes (JPEG/PNG...)
+            frame: Already decoded BGR frame
+            filename: Original upload filename (metadata only)
+            content_hash: SHA-256 hex digest of ``data`` if already known
+
+        Raises:
+            ValueError: If neither data nor frame is provided
+        """
+        if data is None and frame is None:
+            raise ValueError("DecodedImage needs either encoded bytes or a decoded frame")
+
+        self.data = data
+        self.filename = filename
+        self._frame = frame
+        self._content_hash = content_hash
+        self._reduced: Dict[int, np.ndarray] = {}
+        self._original_size: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: bytes,
+        filename: Optional[str] = None,
+        content_hash: Optional[str] = None,
+    ) -> "DecodedImage":
+        """Wrap encoded bytes without decoding them yet."""
+        return cls(data=data, filename=filename, content_hash=content_hash)
+
+    def encoded_copy(self) -> "DecodedImage":
+        """
+        Undecoded twin sharing the encoded bytes, for holding an image longer
+        than a request without its frame (frame-only images are returned as is).
+        """
+        if self.data is None:
+            return self
+        return DecodedImage(data=self.data, filename=self.filename, content_hash=self._content_hash)
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 hex digest of the encoded bytes (of the pixels for frame-only images)."""
+        if self._content_hash is None:
+            payload = self.data if self.data is not None else np.ascontiguousarray(self._frame).data
+            self._content_hash = hashlib.sha256(payload).hexdigest()
+        return self._content_hash
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._frame is not None
+
+    @property
+    def frame(self) -> np.ndarray:
+        """Full resolution BGR frame, decoded on first access."""
+        if self._frame is None:
+            with self._lock:
+                if self._frame is None:
+                    nparr = np.frombuffer(self.data, np.uint8)
+                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                    if frame is None:
+                        raise ValueError("Failed to decode input image")
+                    self._frame = frame
+        return self._frame
+
+    @property
+    def height(self) -> int:
+        return self.frame.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.frame.shape[1]
+
+    @property
+    def max_side(self) -> int:
+        """
+        Longest side in pixels, read from the JPEG/PNG header while the frame
+        is not decoded yet (the EXIF orientation does not change it).
+        """
+        if self._frame is None and self.data is not None:
+            size = probe_image_size(self.data)
+            if size:
+                return max(size)
+        return max(self.frame.shape[:2])
+
+    def inference_frame(self, target_size: int) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Frame for the model tensor, decoded at reduced resolution when possible.
+
+        The model only sees a ``target_size`` input, so when the full frame has
+        not been decoded yet and the upload is a JPEG much larger than the
+        model input, libjpeg scaled decoding (``IMREAD_REDUCED_COLOR_2/4/8``)
+        is used instead of a full decode. Box coordinates must be mapped back
+        with the returned original size, not with the reduced frame shape.
+
+        Args:
+            target_size: Model input side (settings.MODEL_INPUT_SIZE)
+
+        Returns:
+            tuple: (frame, (original_width, original_height))
+        """
+        if self._frame is not None or self.data is None:
+            frame = self.frame
+            return frame, (frame.shape[1], frame.shape[0])
+
+        size = probe_image_size(self.data) if self.data[:2] == b"\xff\xd8" else None
+        factor = reduced_decode_factor(size[0], size[1], target_size) if size else 1
+        if factor == 1:
+            frame = self.frame
+            return frame, (frame.shape[1], frame.shape[0])
+
+        with self._lock:
+            reduced = self._reduced.get(factor)
+            if reduced is None:
+                nparr = np.frombuffer(self.data, np.uint8)
+                reduced = cv2.imdecode(nparr, REDUCED_DECODE_FLAGS[factor])
+                if reduced is None:
+                    raise ValueError("Failed to decode input image")
+
+                orig_w, orig_h = size
+                # EXIF orientation is applied by imdecode but not reflected in the header
+                if (reduced.shape[1] > reduced.shape[0]) != (orig_w > orig_h):
+                    orig_w, orig_h = orig_h, orig_w
+                self._original_size = (orig_w, orig_h)
+                self._reduced[factor] = reduced
+
+        return reduced, self._original_size
+
+    def working_frame(self, target_size: Optional[int] = None) -> Tuple[np.ndarray, float]:
+        """
+        Frame for the stages after the model (color analysis, rendering).
+
+        The full frame if it is already decoded; otherwise the reduced decode
+        made by ``inference_frame`` (made here first when ``target_size`` is
+        given), so the full-size decode is not paid on top of it. Boxes in
+        original image pixels must be multiplied by the returned scale.
+
+        Args:
+            target_size: Model input side; None decodes at full size
+
+        Returns:
+            tuple: (frame, frame width / original width)
+        """
+        if self._frame is None and self.data is not None:
+            if not self._reduced and target_size:
+                self.inference_frame(target_size)
+            if self._reduced:
+                reduced = self._reduced[min(self._reduced)]
+                return reduced, reduced.shape[1] / self._original_size[0]
+        return self.frame, 1.0
+
+    @property
+    def size_bytes(self) -> int:
+        """Size of the encoded upload (0 when built from a frame)."""
+        return len(self.data) if self.data is not None else 0
+
+    def metadata(self) -> dict:
+        """Lightweight description of the image for logs/responses."""
+        return {
+            "filename": self.filename,
+            "size_bytes": self.size_bytes,
+            "width": self.width,
+            "height": self.height,
+        }
+
+
+ImageInput = Union[bytes, np.ndarray, DecodedImage]
+
+
+def as_decoded_image(image: ImageInput) -> DecodedImage:
+    """
+    Normalize the accepted image inputs to a ``DecodedImage``.
+
+    Args:
+        image: Encoded bytes, a BGR ndarray or an existing DecodedImage
+
+    Returns:
+        DecodedImage: The same object when already wrapped
+    """
+    if isinstance(image, DecodedImage):
+        return image
+    if isinstance(image, np.ndarray):
+        return DecodedImage(frame=image)
+    return DecodedImage.from_bytes(bytes(image))
+
+
 # Futurer Actions : drawing class name instead of "SYS: HEALTHY" — or keep the sci-fi flavor, for better UX. 
 
-def draw_cyberpunk_detections(image_bytes: bytes, detections: dict, threshold: float = 0.5):
+def draw_cyberpunk_detections(
+    image: ImageInput,
+    detections: dict,
+    threshold: float = 0.5,
+    reduced_size: Optional[int] = None,
+):
     """
     Draw cyberpunk/HUD-style bounding boxes and labels on the input image.
 
@@ -11,11 +290,16 @@ def draw_cyberpunk_detections(image_bytes: bytes, detections: dict, threshold: f
     on the original image using neon colors based on apple class.
 
     Args:
-        image_bytes (bytes): Raw image data (e.g. from FastAPI UploadFile)
+        image (bytes | np.ndarray | DecodedImage): Raw image data (e.g. from FastAPI UploadFile),
+            or the frame already decoded for inference (reused, not decoded again)
         detections (dict): Dictionary containing model predictions with keys:
             - "boxes": list of [x, y, w, h]
             - "class_ids": list of int (0=healthy/red, 1=damaged, 2=green)
             - "confidences": list of float
+        threshold (float): Confidence threshold of the request
+        reduced_size (int | None): Model input side when INFERENCE_REDUCED_DECODE
+            is on: an undecoded JPEG is rendered on its reduced decode (the one
+            inference used) with the boxes scaled to it, not decoded again
 
     Returns:
         bytes: JPEG-encoded processed image bytes
@@ -23,14 +307,17 @@ def draw_cyberpunk_detections(image_bytes: bytes, detections: dict, threshold: f
     Raises:
         ValueError: If image cannot be decoded or re-encoded
     """
-    # Decode input bytes into OpenCV image (BGR format)
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    if img is None:
+    # Reuse the shared decoded frame (BGR format); draw on a copy so the
+    # original pixels stay intact for other consumers
+    try:
+        frame, scale = as_decoded_image(image).working_frame(reduced_size)
+        img = frame.copy()
+    except ValueError:
         raise ValueError("Unable to Decode imanges")
     
     boxes = detections.get("boxes", [])
+    if scale != 1.0:
+        boxes = [[int(round(v * scale)) for v in box] for box in boxes]
     class_ids = detections.get("class_ids", [])
     confidences =  detections.get("confidences", [])
     
@@ -0,0 +1,117 @@
+"""
+Server-side preview sessions.
+
+A preview run (``/estimate?preview=true``) already ran inference and stored
+the rendered image. Its result (counts, detections, stored image key...) is
+kept here under a preview ID for PREVIEW_TTL_SECONDS, so saving only sends
+that ID: the server commits what it computed itself instead of trusting
+counts and paths shipped back by the client.
+
+Backends: in-process memory (default) or Redis (PREVIEW_STORE_BACKEND=redis),
+which lets the save call land on any worker or pod.
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.utils.redis_client import get_redis_client
+
+_KEY_PREFIX = "preview:"
+
+
+class MemoryPreviewBackend:
+    """Dict of preview ID -> (expires_at, JSON payload)."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # Opportunistic cleanup keeps abandoned previews from piling up
+            for expired in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+                del self._entries[expired]
+            self._entries[key] = (now + ttl_seconds, value)
+
+    async def pop(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+
+class RedisPreviewBackend:
+    """Preview sessions as Redis strings with native expiry."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        await self.client.set(key, value, ex=ttl_seconds)
+
+    async def pop(self, key: str) -> Optional[str]:
+        # GET + DEL in one round trip; MULTI makes it atomic (one save per preview)
+        async with self.client.pipeline(transaction=True) as pipe:
+            value, _ = await pipe.get(key).delete(key).execute()
+        return value
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(key)
+
+
+class PreviewStore:
+    """TTL-bounded preview sessions (JSON-serializable dicts)."""
+
+    def __init__(self, backend, ttl_seconds: int = 1800):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    async def save(self, session: dict, preview_id: Optional[str] = None) -> str:
+        """
+        Store a preview session.
+
+        Args:
+            session: Preview result (counts, detections, stored image key, owner...)
+            preview_id: Existing ID to write back (e.g. restore after a failed save)
+
+        Returns:
+            str: Preview ID
+        """
+        preview_id = preview_id or uuid.uuid4().hex
+        await self.backend.set(_KEY_PREFIX + preview_id, json.dumps(session), self.ttl_seconds)
+        return preview_id
+
+    async def get(self, preview_id: str) -> Optional[dict]:
+        raw = await self.backend.get(_KEY_PREFIX + preview_id)
+        return json.loads(raw) if raw is not None else None
+
+    async def pop(self, preview_id: str) -> Optional[dict]:
+        """Take a session out of the store (it can be saved only once)."""
+        raw = await self.backend.pop(_KEY_PREFIX + preview_id)
+        return json.loads(raw) if raw is not None else None
+
+
+def _build_backend():
+    if settings.PREVIEW_STORE_BACKEND == "redis":
+        client = get_redis_client()
+        if client is not None:
+            return RedisPreviewBackend(client)
+        logger.warning("PREVIEW_STORE_BACKEND=redis unavailable, keeping previews in memory")
+    return MemoryPreviewBackend()
+
+
+# Shared store
+preview_store = PreviewStore(_build_backend(), settings.PREVIEW_TTL_SECONDS)
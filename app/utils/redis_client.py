@@ -0,0 +1,41 @@
+"""
+Shared async Redis client (optional dependency).
+
+Used by the inference result cache and the preview session store. The
+``redis`` package is only needed when one of them is configured to use
+Redis; otherwise callers fall back to their in-memory backends.
+"""
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # optional dependency
+    redis_asyncio = None
+
+_client: Optional[Any] = None
+
+
+def get_redis_client() -> Optional[Any]:
+    """
+    Process-wide ``redis.asyncio.Redis`` built from the REDIS_* settings.
+
+    Returns:
+        Redis client, or None if the redis package is not installed
+    """
+    global _client
+    if _client is None:
+        if redis_asyncio is None:
+            logger.warning("Redis requested but the redis package is not installed, using memory backends")
+            return None
+        _client = redis_asyncio.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5,
+        )
+    return _client
@@ -0,0 +1,126 @@
+"""
+Smaller renditions of the rendered result images.
+
+List views (history, dashboard) only need a thumbnail, and detail views
+rarely need the full-size 95%-quality JPEG. When an image is stored, a
+"thumb" and a "medium" rendition (long side RENDITION_THUMB_SIZE /
+RENDITION_MEDIUM_SIZE, RENDITION_FORMAT at RENDITION_QUALITY) are stored
+next to it: "uploads/<name>.jpg" -> "uploads/<name>_thumb.webp".
+
+Records keep the keys of their renditions (``YieldRecord.renditions``), so
+older records without renditions, or a later format change, fall back to
+the full image.
+"""
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.utils.image_processing import reduced_decode_factor, probe_image_size, REDUCED_DECODE_FLAGS
+
+FULL = "full"
+IMAGE_SIZES = ("thumb", "medium", FULL)
+
+_FORMATS = {
+    # format -> (extension, content type, quality flag)
+    "webp": ("webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+    "jpeg": ("jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+}
+
+
+def rendition_sizes() -> Dict[str, int]:
+    """Configured renditions: name -> long side in pixels (empty when disabled)."""
+    if not settings.RENDITIONS_ENABLED:
+        return {}
+    return {"thumb": settings.RENDITION_THUMB_SIZE, "medium": settings.RENDITION_MEDIUM_SIZE}
+
+
+def rendition_key(key: str, name: str) -> str:
+    """Storage key of a rendition, next to the original."""
+    extension = _FORMATS[settings.RENDITION_FORMAT][0]
+    stem, _ = os.path.splitext(key)
+    return f"{stem}_{name}.{extension}"
+
+
+def rendition_keys(key: str) -> Dict[str, str]:
+    """Keys of the configured renditions of ``key`` (what a record stores)."""
+    return {name: rendition_key(key, name) for name in rendition_sizes()}
+
+
+def make_renditions(data: bytes) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Encode the configured renditions of an image (CPU bound, run off the event loop).
+
+    The image is decoded once, DCT-downscaled when it is much larger than
+    the biggest rendition, then resized per rendition (never upscaled).
+
+    Returns:
+        dict: name -> (bytes, content type)
+
+    Raises:
+        ValueError: If the image cannot be decoded or encoded
+    """
+    sizes = rendition_sizes()
+    if not sizes:
+        return {}
+
+    extension, content_type, quality_flag = _FORMATS[settings.RENDITION_FORMAT]
+
+    flags = cv2.IMREAD_COLOR
+    dimensions = probe_image_size(data)
+    if dimensions is not None:
+        factor = reduced_decode_factor(*dimensions, max(sizes.values()))
+        flags = REDUCED_DECODE_FLAGS.get(factor, cv2.IMREAD_COLOR)
+
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if frame is None:
+        raise ValueError("Unable to decode the image for renditions")
+
+    height, width = frame.shape[:2]
+    renditions = {}
+    for name, long_side in sizes.items():
+        scale = min(1.0, long_side / max(height, width))
+        resized = frame if scale == 1.0 else cv2.resize(
+            frame,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+        success, encoded = cv2.imencode(
+            f".{extension}",
+            resized,
+            [int(quality_flag), settings.RENDITION_QUALITY]
+        )
+        if not success:
+            raise ValueError(f"Unable to encode the {name} rendition")
+        renditions[name] = (encoded.tobytes(), content_type)
+    return renditions
+
+
+async def amake_renditions(data: bytes) -> Dict[str, Tuple[bytes, str]]:
+    """``make_renditions`` on a worker thread."""
+    return await asyncio.to_thread(make_renditions, data)
+
+
+def image_key(filename: str) -> str:
+    """Storage key of a record's full-size image."""
+    return f"uploads/{os.path.basename(filename)}"
+
+
+def image_url(storage, filename: str, renditions: Optional[dict], size: str = FULL) -> str:
+    """
+    URL of a record's image at the size the view needs.
+
+    Args:
+        storage: Storage backend
+        filename: Record (or image) filename
+        renditions: Rendition keys of the record; None/missing size -> full image
+        size: "thumb", "medium" or "full"
+
+    Returns:
+        str: Pre-signed (S3) or /outputs URL
+    """
+    key = (renditions or {}).get(size) or image_key(filename)
+    return storage.url(key, expires_in=settings.PRESIGNED_URL_EXPIRY_SECONDS)
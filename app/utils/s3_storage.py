@@ -1,17 +1,22 @@
-import boto3
 import os
-from botocore.exceptions import ClientError
-from app.core.logging import logger
+from typing import Optional
+
+from app.utils.storage import S3Storage, s3_from_settings
+
+# Helpers kept for existing callers; new code uses app.utils.storage.get_storage().
+_s3: Optional[S3Storage] = None
+
+
+def _get_s3() -> S3Storage:
+    global _s3
+    if _s3 is None:
+        _s3 = s3_from_settings()
+    return _s3
 
 
 def get_s3_client():
-    """ return s3 client set with env credentials"""
-    return boto3.client(
-        "s3",
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    )
+    """ return the shared s3 client (pooled, created once per process)"""
+    return _get_s3().client
 
 
 def upload_image_to_s3(image_bytes: bytes, filename: str) -> str:
@@ -31,28 +36,12 @@ def upload_image_to_s3(image_bytes: bytes, filename: str) -> str:
 
         Raises:
 
-        Exception: If the upload to S3 fails
+        StorageError: If the upload to S3 fails (after retries)
     """
-    bucket = os.getenv("S3_BUCKET_NAME")
-    if not bucket:
+    if not os.getenv("S3_BUCKET_NAME"):
         raise ValueError("S3_BUCKET_NAME not defined in the environment variables")
 
-    s3_key = f"uploads/{filename}"
-
-    try:
-        client = get_s3_client()
-        client.put_object(
-            Bucket=bucket,
-            Key=s3_key,
-            Body=image_bytes,
-            ContentType="image/jpeg",
-        )
-        logger.info(f"Imagen subida a S3: s3://{bucket}/{s3_key}")
-        return s3_key
-
-    except ClientError as e:
-        logger.error(f"Error subiendo imagen a S3: {e}")
-        raise Exception(f"Error subiendo imagen a S3: {e}")
+    return _get_s3().put(f"uploads/{filename}", image_bytes, "image/jpeg")
 
 
 def get_presigned_url(s3_key: str, expiration_seconds: int = 3600) -> str:
@@ -69,18 +58,7 @@ def get_presigned_url(s3_key: str, expiration_seconds: int = 3600) -> str:
 
         str: Temporary pre-signed URL
     """
-    bucket = os.getenv("S3_BUCKET_NAME")
-    try:
-        client = get_s3_client()
-        url = client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": bucket, "Key": s3_key},
-            ExpiresIn=expiration_seconds,
-        )
-        return url
-    except ClientError as e:
-        logger.error(f" Error generating pre-signed URL: {e}")
-        raise Exception(f"Error generating pre-signed URL: {e}")
+    return _get_s3().url(s3_key, expires_in=expiration_seconds)
 
 
 def delete_image_from_s3(s3_key: str) -> bool:
@@ -88,15 +66,7 @@ def delete_image_from_s3(s3_key: str) -> bool:
         Delete an image from S3. Args: s3 key: Path of the object in S3 
         Returns: bool: True if it was deleted successfully
     """
-    bucket = os.getenv("S3_BUCKET_NAME")
-    try:
-        client = get_s3_client()
-        client.delete_object(Bucket=bucket, Key=s3_key)
-        logger.info(f"Imagen eliminada de S3: {s3_key}")
-        return True
-    except ClientError as e:
-        logger.error(f"Error eliminando imagen de S3: {e}")
-        return False
+    return _get_s3().delete(s3_key)
 
 
 def s3_is_configured() -> bool:
@@ -0,0 +1,321 @@
+"""
+Image storage backends.
+
+Images are addressed by key ("uploads/<filename>", "avatars/<filename>").
+``S3Storage`` keeps one boto3 client per process (thread-safe, with a
+connection pool sized by S3_MAX_POOL_CONNECTIONS) and lets botocore retry
+throttling and transient errors with exponential backoff. Setting
+S3_ENDPOINT_URL points it at any S3-compatible server (MinIO, LocalStack).
+``LocalStorage`` writes under UPLOAD_DIR, served on /outputs: it is used
+when S3 is not configured and in tests.
+
+boto3 is blocking, so async code calls the ``a*`` variants, which run the
+request on a dedicated thread pool (STORAGE_IO_WORKERS) instead of the
+event loop.
+
+Pre-signed URLs are signed locally but still cost a client call and a
+signature per image; history pages ask for one per row. ``S3Storage``
+keeps them in an LRU (PRESIGNED_URL_CACHE_SIZE) and hands out a cached URL
+only while it stays valid for at least PRESIGNED_URL_CACHE_MARGIN_SECONDS.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.utils.lru import MemoryLRU
+
+UPLOADS_PREFIX = "uploads/"
+
+
+class StorageError(Exception):
+    """A storage operation failed (after retries)."""
+
+
+_io_pool: Optional[ThreadPoolExecutor] = None
+_io_pool_lock = threading.Lock()
+
+
+def _get_io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    with _io_pool_lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(
+                max_workers=settings.STORAGE_IO_WORKERS,
+                thread_name_prefix="storage-io"
+            )
+        return _io_pool
+
+
+class StorageBackend:
+    """Key/value image storage. Subclasses implement the blocking methods."""
+
+    name = "base"
+
+    def put(self, key: str, data: bytes, content_type: str = "image/jpeg") -> str:
+        """
+        Store an object.
+
+        Returns:
+            str: Location to save in the database (key, or file path locally)
+
+        Raises:
+            StorageError: If the object could not be stored
+        """
+        raise NotImplementedError
+
+    def location(self, key: str) -> str:
+        """What ``put`` returns for ``key``, known before the object is stored."""
+        return key
+
+    def delete(self, key: str) -> bool:
+        """Delete an object. Returns False if it could not be deleted."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def url(self, key: str, expires_in: int = 3600) -> str:
+        """URL the client can fetch the object from (pre-signed for S3)."""
+        raise NotImplementedError
+
+    async def _off_loop(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_io_pool(), partial(func, *args, **kwargs))
+
+    async def aput(self, key: str, data: bytes, content_type: str = "image/jpeg") -> str:
+        return await self._off_loop(self.put, key, data, content_type)
+
+    async def adelete(self, key: str) -> bool:
+        return await self._off_loop(self.delete, key)
+
+    async def aexists(self, key: str) -> bool:
+        return await self._off_loop(self.exists, key)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Filesystem storage under ``base_dir``, served by the /outputs static mount.
+
+    "uploads/<name>" maps to ``base_dir/<name>`` (where the estimator has
+    always written), any other key to ``base_dir/<key>``.
+    """
+
+    name = "local"
+
+    def __init__(self, base_dir: str, base_url: str = "/outputs"):
+        self.base_dir = base_dir
+        self.base_url = base_url.rstrip("/")
+
+    def _relative(self, key: str) -> str:
+        relative = key[len(UPLOADS_PREFIX):] if key.startswith(UPLOADS_PREFIX) else key
+        relative = os.path.normpath(relative)
+        if relative.startswith("..") or os.path.isabs(relative):
+            raise StorageError(f"Invalid storage key: {key}")
+        return relative
+
+    def path(self, key: str) -> str:
+        """Filesystem path of a key."""
+        return os.path.join(self.base_dir, self._relative(key))
+
+    def location(self, key: str) -> str:
+        return self.path(key)
+
+    def put(self, key: str, data: bytes, content_type: str = "image/jpeg") -> str:
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename: readers never see a half-written image
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            raise StorageError(f"Error writing {path}: {e}")
+        return path
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self.path(key))
+            return True
+        except (OSError, StorageError):
+            return False
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def url(self, key: str, expires_in: int = 3600) -> str:
+        return f"{self.base_url}/{self._relative(key).replace(os.sep, '/')}"
+
+
+class S3Storage(StorageBackend):
+    """S3 (or S3-compatible) storage sharing one pooled client."""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        region: str = "us-east-1",
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        max_pool_connections: int = 32,
+        max_attempts: int = 4,
+        url_cache_size: int = 10000,
+        url_cache_margin_seconds: int = 300,
+    ):
+        """
+        Args:
+            bucket: Bucket name
+            region: AWS region
+            access_key_id: Credentials (None: boto3's default chain)
+            secret_access_key: Credentials (None: boto3's default chain)
+            endpoint_url: S3-compatible endpoint (MinIO...); None for AWS
+            max_pool_connections: HTTP connections kept open by the client
+            max_attempts: Attempts per request, including the first
+                (exponential backoff with jitter between them)
+            url_cache_size: Pre-signed URLs kept (0 disables the cache)
+            url_cache_margin_seconds: Minimum validity left on a cached URL
+        """
+        self.bucket = bucket
+        self.region = region
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.endpoint_url = endpoint_url
+        self.max_pool_connections = max_pool_connections
+        self.max_attempts = max_attempts
+        self.url_cache_margin_seconds = url_cache_margin_seconds
+        # "key:expires_in" -> (signed_at, url)
+        self._url_cache = MemoryLRU(url_cache_size, settings.PRESIGNED_URL_EXPIRY_SECONDS) if url_cache_size > 0 else None
+        self._client: Optional[Any] = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """boto3 S3 client, created on first use and reused afterwards."""
+        with self._client_lock:
+            if self._client is None:
+                import boto3
+                from botocore.config import Config
+
+                config = Config(
+                    max_pool_connections=self.max_pool_connections,
+                    retries={"mode": "standard", "max_attempts": self.max_attempts},
+                    # MinIO and most S3-compatible servers need path-style URLs
+                    s3={"addressing_style": "path"} if self.endpoint_url else None,
+                )
+                self._client = boto3.client(
+                    "s3",
+                    region_name=self.region,
+                    aws_access_key_id=self.access_key_id,
+                    aws_secret_access_key=self.secret_access_key,
+                    endpoint_url=self.endpoint_url,
+                    config=config,
+                )
+            return self._client
+
+    def put(self, key: str, data: bytes, content_type: str = "image/jpeg") -> str:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"Error uploading s3://{self.bucket}/{key}: {e}")
+            raise StorageError(f"Error uploading image to S3: {e}")
+        logger.info(f"Image uploaded to S3: s3://{self.bucket}/{key}")
+        return key
+
+    def delete(self, key: str) -> bool:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"Error deleting s3://{self.bucket}/{key}: {e}")
+            return False
+        logger.info(f"Image deleted from S3: {key}")
+        return True
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def url(self, key: str, expires_in: int = 3600) -> str:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        cache_key = f"{key}:{expires_in}"
+        if self._url_cache is not None:
+            cached = self._url_cache.get(cache_key)
+            # Reused only while it stays valid long enough for the client to fetch it
+            if cached is not None and time.monotonic() < cached[0] + expires_in - self.url_cache_margin_seconds:
+                return cached[1]
+
+        # Signed locally, no request to S3
+        signed_at = time.monotonic()
+        try:
+            url = self.client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=expires_in,
+            )
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"Error generating pre-signed URL for {key}: {e}")
+            raise StorageError(f"Error generating pre-signed URL: {e}")
+
+        if self._url_cache is not None:
+            self._url_cache.set(cache_key, (signed_at, url))
+        return url
+
+
+def s3_from_settings() -> S3Storage:
+    """S3 backend configured from the AWS_* / S3_* settings."""
+    return S3Storage(
+        bucket=settings.S3_BUCKET_NAME,
+        region=settings.AWS_REGION,
+        access_key_id=settings.AWS_ACCESS_KEY_ID,
+        secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        endpoint_url=settings.S3_ENDPOINT_URL,
+        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+        max_attempts=settings.STORAGE_MAX_ATTEMPTS,
+        url_cache_size=settings.PRESIGNED_URL_CACHE_SIZE,
+        url_cache_margin_seconds=settings.PRESIGNED_URL_CACHE_MARGIN_SECONDS,
+    )
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """
+    Process-wide storage backend: S3 when configured, else local files.
+
+    Returns:
+        StorageBackend: Shared instance
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            from app.utils.s3_storage import s3_is_configured
+
+            _storage = s3_from_settings() if s3_is_configured() else LocalStorage(settings.UPLOAD_DIR)
+            logger.info(f"Image storage backend: {_storage.name}")
+        return _storage
+
+
+def set_storage(backend: Optional[StorageBackend]) -> None:
+    """Replace the shared backend (None: pick again from the settings)."""
+    global _storage
+    with _storage_lock:
+        _storage = backend
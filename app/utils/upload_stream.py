@@ -0,0 +1,238 @@
+"""
+Bounded, streaming reads of uploaded images.
+
+``UploadFile.read()`` buffers the whole upload before any check runs. Here
+uploads are read UPLOAD_CHUNK_SIZE bytes at a time: the size limit is
+enforced as the bytes arrive, the SHA-256 (inference cache key) is computed
+on the fly, and the real format is sniffed from the magic bytes of the
+first chunk, whatever ``content_type`` the client declared.
+
+``UploadSizeLimitMiddleware`` rejects oversized requests with 413 before
+the multipart body is parsed: from the Content-Length header when present,
+otherwise by counting the streamed body.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+
+# Enough bytes to recognise every supported format
+SNIFF_BYTES = 12
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+
+class UploadError(ValueError):
+    """Unusable upload."""
+
+
+class EmptyUpload(UploadError):
+    """Upload without content."""
+
+
+class UploadTooLarge(UploadError):
+    """Upload above the size limit."""
+
+
+class UnsupportedImageType(UploadError):
+    """Content is not one of the allowed image formats."""
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """
+    Image MIME type from the first bytes of a file.
+
+    Returns:
+        str: "image/jpeg", "image/png" or "image/webp"; None if unrecognised
+    """
+    if head.startswith(JPEG_MAGIC):
+        return "image/jpeg"
+    if head.startswith(PNG_MAGIC):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _normalize_types(allowed_types: Sequence[str]) -> set:
+    # "image/jpg" is a common (non-standard) alias
+    return {"image/jpeg" if t == "image/jpg" else t for t in allowed_types}
+
+
+@dataclass
+class UploadedImage:
+    """Image upload read into memory."""
+    data: bytes
+    content_hash: str  # SHA-256 hex digest
+    content_type: str  # sniffed, not declared
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @property
+    def extension(self) -> str:
+        return {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}[self.content_type]
+
+
+async def read_upload(
+    file: UploadFile,
+    max_bytes: int,
+    chunk_size: Optional[int] = None,
+) -> bytes:
+    """
+    Read an upload in chunks, failing as soon as it exceeds ``max_bytes``.
+
+    Raises:
+        UploadTooLarge: If the upload is larger than max_bytes
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    buffer = bytearray()
+    while chunk := await file.read(chunk_size):
+        if len(buffer) + len(chunk) > max_bytes:
+            raise UploadTooLarge(f"File size exceeds maximum allowed ({max_bytes // (1024 * 1024)} MB)")
+        buffer += chunk
+    return bytes(buffer)
+
+
+async def read_image_upload(
+    file: UploadFile,
+    allowed_types: Sequence[str],
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> UploadedImage:
+    """
+    Read an image upload in chunks with size, format and hash handled on the way.
+
+    Args:
+        file: Uploaded file
+        allowed_types: Accepted image MIME types (checked against the content)
+        max_bytes: Size limit (default: MAX_FILE_SIZE_MB)
+        chunk_size: Bytes per read (default: UPLOAD_CHUNK_SIZE)
+
+    Returns:
+        UploadedImage: Bytes, SHA-256 and sniffed content type
+
+    Raises:
+        EmptyUpload: If the file is empty
+        UploadTooLarge: As soon as more than max_bytes have been received
+        UnsupportedImageType: If the first bytes are not an allowed image format
+    """
+    max_bytes = max_bytes or settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    allowed = _normalize_types(allowed_types)
+
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    content_type = None
+
+    while chunk := await file.read(chunk_size):
+        if len(buffer) + len(chunk) > max_bytes:
+            raise UploadTooLarge(f"File size exceeds maximum allowed ({max_bytes // (1024 * 1024)} MB)")
+        digest.update(chunk)
+        buffer += chunk
+
+        # Reject non-images after the first chunk instead of after the whole file
+        if content_type is None and len(buffer) >= SNIFF_BYTES:
+            content_type = sniff_image_type(bytes(buffer[:SNIFF_BYTES]))
+            if content_type not in allowed:
+                raise UnsupportedImageType(
+                    f"File content is not a supported image. Allowed: {', '.join(sorted(allowed))}"
+                )
+
+    if not buffer:
+        raise EmptyUpload("Empty image file")
+    if content_type is None:  # shorter than SNIFF_BYTES
+        raise UnsupportedImageType(
+            f"File content is not a supported image. Allowed: {', '.join(sorted(allowed))}"
+        )
+
+    return UploadedImage(bytes(buffer), digest.hexdigest(), content_type)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Pure ASGI middleware rejecting request bodies above a per-path limit with 413.
+
+    Requests announcing a larger Content-Length are refused before any body
+    byte is read. Bodies without Content-Length (chunked) are counted as
+    they stream in, and the response is replaced with 413 once over the limit.
+    """
+
+    def __init__(self, app, limit_for: Callable[[str], Optional[int]]):
+        """
+        Args:
+            app: ASGI application
+            limit_for: Request path -> maximum body size in bytes (None: unlimited)
+        """
+        self.app = app
+        self.limit_for = limit_for
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            return await self.app(scope, receive, send)
+
+        limit = self.limit_for(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            return await self._reject(send, limit)
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLarge("Request body too large")
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded:
+                # Whatever the app made of the aborted body, the answer is 413
+                if not response_started and message["type"] == "http.response.start":
+                    response_started = True
+                    await self._reject(send, limit)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            if not response_started:
+                await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send, limit: int) -> None:
+        body = json.dumps({"detail": f"Request body exceeds maximum allowed ({limit // (1024 * 1024)} MB)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def request_size_limit(path: str) -> Optional[int]:
+    """Body limit of a path: batch uploads get room for a full batch, others one image."""
+    overhead = 1024 * 1024  # multipart boundaries and form fields
+    per_file = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    if path.endswith("/estimate/batch") or path.endswith("/estimator/jobs"):
+        return per_file * settings.ESTIMATE_BATCH_MAX_IMAGES + overhead
+    return per_file + overhead
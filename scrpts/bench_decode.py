@@ -0,0 +1,116 @@
+"""
+Benchmark: full JPEG decode vs reduced-resolution decode, end to end.
+
+For several camera-like image sizes it measures, per image, everything an
+/estimate request does with the pixels outside the session run (which is
+the same in every case): decode, letterbox, color classification of the
+boxes and rendering of the result image.
+
+  - full:          full cv2.imdecode, everything on the full frame (default)
+  - reduced+full:  IMREAD_REDUCED_COLOR_2/4/8 for the model tensor, then a
+                   full decode again for colors and rendering (double decode)
+  - reduced:       reduced decode only; colors and rendering run on it with
+                   the boxes scaled (INFERENCE_REDUCED_DECODE)
+
+Usage:
+    python scrpts/bench_decode.py [--runs 20] [--input-size 640] [--boxes 40]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.color import classify_box_colors  # noqa: E402
+from app.models.preprocess import LetterboxPreprocessor  # noqa: E402
+from app.utils.image_processing import DecodedImage, draw_cyberpunk_detections, reduced_decode_factor  # noqa: E402
+
+SIZES = [(1280, 960), (1920, 1080), (3024, 4032), (4000, 3000), (6000, 4000)]
+
+
+def synthetic_jpeg(width: int, height: int) -> bytes:
+    """Noisy gradient photo-like JPEG (pure noise would not compress realistically)."""
+    rng = np.random.default_rng(0)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.stack([np.broadcast_to(xs, (height, width)), np.broadcast_to(ys, (height, width)),
+                    np.full((height, width), 128, np.float32)], axis=-1)
+    img += rng.normal(0, 12, img.shape).astype(np.float32)
+    ok, buffer = cv2.imencode(".jpg", np.clip(img, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 92])
+    assert ok
+    return buffer.tobytes()
+
+
+def synthetic_detections(width: int, height: int, n: int) -> dict:
+    """``n`` healthy apple boxes of 4-8% of the shorter side."""
+    rng = np.random.default_rng(1)
+    short = min(width, height)
+    sides = rng.integers(short // 25, short // 12, n)
+    xs = rng.integers(0, width - sides.max(), n)
+    ys = rng.integers(0, height - sides.max(), n)
+    return {
+        "boxes": [[int(x), int(y), int(s), int(s)] for x, y, s in zip(xs, ys, sides)],
+        "class_ids": [0] * n,
+        "confidences": [0.8] * n,
+    }
+
+
+def bench(fn, runs: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--input-size", type=int, default=640)
+    parser.add_argument("--boxes", type=int, default=40)
+    args = parser.parse_args()
+    size = args.input_size
+    preprocess = LetterboxPreprocessor(size)
+
+    print(f"{'image':>11} | {'factor':>6} | {'full ms':>8} | {'reduced+full ms':>15} | {'reduced ms':>10} | {'gain':>6}")
+    print("-" * 75)
+
+    for width, height in SIZES:
+        data = synthetic_jpeg(width, height)
+        detections = synthetic_detections(width, height, args.boxes)
+        boxes = np.asarray(detections["boxes"], dtype=np.float64)
+
+        def full():
+            image = DecodedImage.from_bytes(data)
+            preprocess(image.frame)
+            classify_box_colors(image.frame, boxes)
+            draw_cyberpunk_detections(image, detections)
+
+        def reduced_then_full():
+            image = DecodedImage.from_bytes(data)
+            preprocess(image.inference_frame(size)[0])
+            classify_box_colors(image.frame, boxes)
+            draw_cyberpunk_detections(image, detections)
+
+        def reduced():
+            image = DecodedImage.from_bytes(data)
+            preprocess(image.inference_frame(size)[0])
+            frame, scale = image.working_frame()
+            classify_box_colors(frame, boxes * scale)
+            draw_cyberpunk_detections(image, detections, reduced_size=size)
+
+        full_ms = bench(full, args.runs)
+        double_ms = bench(reduced_then_full, args.runs)
+        reduced_ms = bench(reduced, args.runs)
+        factor = reduced_decode_factor(width, height, size)
+
+        print(f"{width:>5}x{height:<5} | {factor:>6} | {full_ms:>8.1f} | {double_ms:>15.1f} | "
+              f"{reduced_ms:>10.1f} | {full_ms / reduced_ms:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Micro-benchmark: vectorized post-processing vs the previous loop + cv2.dnn.NMSBoxes code.
+
+Builds synthetic YOLOv8 outputs (1, 6, 8400) with a growing number of
+candidates above the confidence threshold and times both implementations.
+
+Usage:
+    python scrpts/bench_postprocess.py [--runs 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.postprocess import postprocess  # noqa: E402
+from tests.test_postprocess import legacy_postprocess, synthetic_output  # noqa: E402
+
+ORIGINAL_SIZE = (4000, 3000)
+
+
+def bench(fn, runs: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'objects':>7} | {'candidates':>10} | {'legacy ms':>9} | {'vectorized ms':>13} | {'speedup':>7}")
+    print("-" * 60)
+
+    for n_objects in (10, 50, 150, 400, 800):
+        output = synthetic_output(n_objects=n_objects)
+        candidates = int((output[0, 4:].max(axis=0) > 0.45).sum())
+
+        legacy_ms = bench(lambda: legacy_postprocess(output, ORIGINAL_SIZE, 0.45), args.runs)
+        vector_ms = bench(lambda: postprocess(output, ORIGINAL_SIZE, conf_threshold=0.45), args.runs)
+
+        print(f"{n_objects:>7} | {candidates:>10} | {legacy_ms:>9.2f} | {vector_ms:>13.2f} | {legacy_ms / vector_ms:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
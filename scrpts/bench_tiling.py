@@ -0,0 +1,65 @@
+"""
+Benchmark: tiled inference throughput vs. tile count.
+
+Runs the real ONNX model on a synthetic high-resolution frame with several
+tile sizes (0 = whole image only) and reports tiles per image, latency per
+image, per tile and images per second.
+
+Usage:
+    python scrpts/bench_tiling.py [--runs 5] [--width 4000 --height 3000] [--tiles 0 1280 960 640]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.models.metadata import resolve_model_path  # noqa: E402
+from app.models.inference import AppleInference  # noqa: E402
+from app.models.tiling import make_tiles  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--overlap", type=float, default=settings.INFERENCE_TILE_OVERLAP)
+    parser.add_argument("--tiles", type=int, nargs="+", default=[0, 1280, 960, 640])
+    parser.add_argument("--model", default=None, help="ONNX model (default: configured model)")
+    args = parser.parse_args()
+
+    engine = AppleInference(args.model or resolve_model_path())
+    frame = np.random.default_rng(0).integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+
+    print(f"Model: {engine.model_path} (dynamic batch: {engine.supports_batching})")
+    print(f"Image: {args.width}x{args.height}, overlap {args.overlap}, "
+          f"full-image pass {settings.INFERENCE_TILE_INCLUDE_FULL}\n")
+    print(f"{'tile':>6} | {'tiles':>5} | {'ms/image':>9} | {'ms/tile':>8} | {'images/s':>8} | {'detections':>10}")
+    print("-" * 62)
+
+    for tile_size in args.tiles:
+        if tile_size:
+            n_tiles = len(make_tiles(args.width, args.height, tile_size, args.overlap))
+            n_tiles += int(settings.INFERENCE_TILE_INCLUDE_FULL)
+        else:
+            n_tiles = 1
+
+        run = lambda: engine.run_inference(frame, 0.25, tile_size=tile_size, tile_overlap=args.overlap)  # noqa: E731
+        result = run()  # warm-up (arena growth for this batch size)
+
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            run()
+        per_image = (time.perf_counter() - start) / args.runs * 1000
+
+        print(f"{tile_size or 'off':>6} | {n_tiles:>5} | {per_image:>9.1f} | {per_image / n_tiles:>8.1f} | "
+              f"{1000 / per_image:>8.2f} | {result['counts']['total']:>10}")
+
+
+if __name__ == "__main__":
+    main()
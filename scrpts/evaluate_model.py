@@ -0,0 +1,133 @@
+"""
+Compare two model variants (e.g. FP32 vs INT8) on a local image set.
+
+Reports per-image latency (mean / p50 / p95), single-stream and concurrent
+throughput, and how well the apple counts agree with the baseline.
+
+Usage:
+    python scrpts/evaluate_model.py --images data/validation \\
+        --baseline YOLOv8s-Cyberpunk-v1 --candidate YOLOv8s-Cyberpunk-v1-int8-static
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.models.inference import AppleInference  # noqa: E402
+from app.models.metadata import get_variant, resolve_weights_path  # noqa: E402
+from app.utils.image_processing import DecodedImage  # noqa: E402
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+def load_engine(version: str) -> AppleInference:
+    entry = get_variant(version)
+    if entry is None:
+        raise SystemExit(f"[X] Unknown model version: {version}")
+    engine = AppleInference(str(resolve_weights_path(entry["path"])))
+    engine.model_version = entry["version"]
+    return engine
+
+
+def load_images(folder: Path, limit: int) -> list:
+    paths = sorted(p for p in folder.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    paths = paths[:limit] if limit else paths
+    images = []
+    for path in paths:
+        frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if frame is not None:
+            images.append((path.name, DecodedImage(frame=frame, filename=path.name)))
+    return images
+
+
+def evaluate(engine: AppleInference, images: list, threshold: float, concurrency: int) -> dict:
+    # Warm-up: first runs allocate arenas and pick kernels
+    for _, image in images[:2]:
+        engine.run_inference(image, threshold)
+
+    latencies, counts = [], {}
+    start = time.perf_counter()
+    for name, image in images:
+        t0 = time.perf_counter()
+        result = engine.run_inference(image, threshold)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        counts[name] = result["counts"]
+    sequential_s = time.perf_counter() - start
+
+    # Concurrent throughput, going through the micro-batching scheduler
+    engine.enable_batching(settings.INFERENCE_BATCH_MAX_SIZE, settings.INFERENCE_BATCH_MAX_WAIT_MS)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda item: engine.run_inference(item[1], threshold), images))
+    concurrent_s = time.perf_counter() - start
+    if engine.batch_scheduler is not None:
+        engine.batch_scheduler.shutdown()
+        engine.batch_scheduler = None
+
+    lat = np.array(latencies)
+    return {
+        "latency_mean_ms": lat.mean(),
+        "latency_p50_ms": np.percentile(lat, 50),
+        "latency_p95_ms": np.percentile(lat, 95),
+        "throughput_seq": len(images) / sequential_s,
+        "throughput_concurrent": len(images) / concurrent_s,
+        "counts": counts,
+    }
+
+
+def agreement(baseline: dict, candidate: dict) -> dict:
+    names = sorted(baseline)
+    report = {}
+    for key in ("total", "healthy", "damaged_apple"):
+        base = np.array([baseline[n][key] for n in names], dtype=np.float64)
+        cand = np.array([candidate[n][key] for n in names], dtype=np.float64)
+        report[key] = {
+            "exact_match": float(np.mean(base == cand)) * 100,
+            "mean_abs_diff": float(np.mean(np.abs(base - cand))),
+            "mean_rel_diff": float(np.mean(np.abs(base - cand) / np.maximum(base, 1))) * 100,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder of evaluation images")
+    parser.add_argument("--baseline", default=settings.MODEL_VERSION, help="Reference variant (FP32)")
+    parser.add_argument("--candidate", required=True, help="Variant to compare (e.g. INT8)")
+    parser.add_argument("--threshold", type=float, default=settings.CONFIDENCE_THRESHOLD)
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads for the throughput test")
+    parser.add_argument("--limit", type=int, default=0, help="Max images (0 = all)")
+    args = parser.parse_args()
+
+    images = load_images(Path(args.images), args.limit)
+    if not images:
+        raise SystemExit(f"[X] No images found in {args.images}")
+    print(f"📷 {len(images)} images, threshold {args.threshold}\n")
+
+    results = {}
+    for version in (args.baseline, args.candidate):
+        print(f"⏱️  Evaluating {version}...")
+        results[version] = evaluate(load_engine(version), images, args.threshold, args.concurrency)
+
+    print(f"\n{'metric':<26} | {args.baseline:>28} | {args.candidate:>28}")
+    print("-" * 90)
+    for metric in ("latency_mean_ms", "latency_p50_ms", "latency_p95_ms", "throughput_seq", "throughput_concurrent"):
+        base, cand = results[args.baseline][metric], results[args.candidate][metric]
+        print(f"{metric:<26} | {base:>28.2f} | {cand:>28.2f}")
+
+    print("\nCount agreement vs baseline:")
+    for key, stats in agreement(results[args.baseline]["counts"], results[args.candidate]["counts"]).items():
+        print(f"  {key:<14} exact {stats['exact_match']:6.1f}% | "
+              f"mean |Δ| {stats['mean_abs_diff']:.2f} | mean rel Δ {stats['mean_rel_diff']:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Produce quantized variants of the detection model and register them.
+
+Dynamic quantization only needs the FP32 model. Static quantization
+(recommended for conv nets on CPU) calibrates activations on a folder of
+representative orchard images, preprocessed exactly as the server does.
+
+Every produced variant is written next to the FP32 weights and registered
+in app/models/weights/model_metadata.json, so the server can load it with
+MODEL_VERSION=<version> (or MODEL_PATH=<file>).
+
+Usage:
+    python scrpts/export_model.py dynamic
+    python scrpts/export_model.py static --calibration-dir data/calibration --max-images 200
+    python scrpts/export_model.py static --calibration-dir data/calibration --make-default
+"""
+import argparse
+import hashlib
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.models.metadata import (  # noqa: E402
+    WEIGHTS_DIR,
+    get_variant,
+    register_variant,
+    resolve_weights_path,
+)
+from app.models.preprocess import LetterboxPreprocessor  # noqa: E402
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+def sha256_of(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_images(folder: Path, limit: int) -> list:
+    images = sorted(p for p in folder.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    return images[:limit] if limit else images
+
+
+class ImageCalibrationReader:
+    """CalibrationDataReader feeding letterboxed orchard images to the quantizer."""
+
+    def __init__(self, input_name: str, images: list, input_size: int):
+        self.input_name = input_name
+        self.paths = list(images)
+        self.images = iter(self.paths)
+        self.preprocessor = LetterboxPreprocessor(input_size)
+
+    def get_next(self):
+        for path in self.images:
+            frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+            if frame is None:
+                print(f"[!] Skipping unreadable image: {path}")
+                continue
+            tensor, _ = self.preprocessor(frame)
+            return {self.input_name: tensor.copy()}
+        return None
+
+    def rewind(self):
+        # Calibration methods that take several passes start again from the first image
+        self.images = iter(self.paths)
+
+
+def quantize(args) -> Path:
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    import onnxruntime as ort
+
+    source_entry = get_variant(args.source_version)
+    if source_entry is None:
+        raise SystemExit(f"[X] Unknown source model version: {args.source_version}")
+
+    source_path = resolve_weights_path(source_entry["path"])
+    if not source_path.exists():
+        raise SystemExit(f"[X] Source model not found: {source_path}")
+
+    version = args.version or f"{source_entry['version']}-int8-{args.mode}"
+    output_path = Path(args.output) if args.output else WEIGHTS_DIR / f"{source_path.stem}_int8_{args.mode}.onnx"
+
+    # Shape inference + graph cleanup makes quantization more reliable on YOLO exports
+    prepared_path = output_path.with_name(output_path.stem + "_prep.onnx")
+    print(f"🔧 Pre-processing {source_path.name} for quantization...")
+    quant_pre_process(str(source_path), str(prepared_path), skip_symbolic_shape=True)
+
+    try:
+        if args.mode == "dynamic":
+            print("⚙️  Dynamic quantization (weights int8, activations quantized at runtime)...")
+            quantize_dynamic(
+                str(prepared_path),
+                str(output_path),
+                weight_type=QuantType.QUInt8,
+                per_channel=args.per_channel,
+            )
+        else:
+            images = list_images(Path(args.calibration_dir), args.max_images)
+            if not images:
+                raise SystemExit(f"[X] No calibration images found in {args.calibration_dir}")
+
+            input_name = ort.InferenceSession(
+                str(source_path), providers=["CPUExecutionProvider"]
+            ).get_inputs()[0].name
+
+            print(f"⚙️  Static quantization (QDQ) calibrated on {len(images)} images...")
+            quantize_static(
+                str(prepared_path),
+                str(output_path),
+                ImageCalibrationReader(input_name, images, source_entry.get("input_size", settings.MODEL_INPUT_SIZE)),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=args.per_channel,
+                nodes_to_exclude=args.exclude_nodes or [],
+            )
+    finally:
+        prepared_path.unlink(missing_ok=True)
+
+    entry = {
+        "path": os.path.relpath(output_path, WEIGHTS_DIR) if output_path.is_relative_to(WEIGHTS_DIR) else str(output_path),
+        "precision": "int8",
+        "quantization": args.mode,
+        "per_channel": args.per_channel,
+        "source": source_entry["version"],
+        "input_size": source_entry.get("input_size", settings.MODEL_INPUT_SIZE),
+        "classes": source_entry.get("classes", settings.MODEL_CLASSES),
+        "sha256": sha256_of(output_path),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if source_entry.get("fruit"):
+        entry["fruit"] = source_entry["fruit"]
+    register_variant(version, entry, make_default=args.make_default)
+
+    size_fp32 = source_path.stat().st_size / 1e6
+    size_int8 = output_path.stat().st_size / 1e6
+    print(f"✅ {output_path.name}: {size_int8:.1f} MB (FP32 {size_fp32:.1f} MB)")
+    print(f"✅ Registered as '{version}'. Serve it with MODEL_VERSION={version}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["dynamic", "static"], help="Quantization mode")
+    parser.add_argument("--source-version", default=settings.MODEL_VERSION, help="FP32 variant to quantize")
+    parser.add_argument("--version", help="Name of the new variant (default: <source>-int8-<mode>)")
+    parser.add_argument("--output", help="Output .onnx path (default: next to the source weights)")
+    parser.add_argument("--calibration-dir", help="Folder of representative images (static mode)")
+    parser.add_argument("--max-images", type=int, default=200, help="Calibration images to use (0 = all)")
+    parser.add_argument("--per-channel", action="store_true", help="Per-channel weight quantization")
+    parser.add_argument("--exclude-nodes", nargs="*", help="Node names kept in FP32 (e.g. the detect head)")
+    parser.add_argument("--make-default", action="store_true", help="Make the new variant the default")
+    args = parser.parse_args()
+
+    if args.mode == "static" and not args.calibration_dir:
+        parser.error("static quantization needs --calibration-dir")
+
+    quantize(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ from sqlalchemy.pool import StaticPool
 os.environ["TESTING"] = "true"
 os.environ["DATABASE_URL"] = "sqlite:///:memory:"
 os.environ["SECRET_KEY"] = "test-secret-key-for-testing-only-32chars-long"
+os.environ["MODEL_PRELOAD"] = "false"  # Model loads lazily, on the first inference call
+os.environ["JOBS_WORKERS"] = "0"  # Tests run queued jobs explicitly
+os.environ["IMAGE_PERSIST_WORKERS"] = "0"  # Result images stored before the response
 
 # Now import app modules
 from app.main import app
@@ -18,6 +21,7 @@ from app.db.base import Base
 from app.core.security import get_password_hash
 from app.db.models.users import User, UserRole
 from app.db.models.farming import Orchard, Tree, YieldRecord, Image, Prediction, Detection
+from app.utils.storage import LocalStorage, set_storage
 
 # ── Test DB (SQLite en memoria) ──────────────────────────────────────────────
 TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -30,6 +34,15 @@ engine = create_engine(
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@pytest.fixture(scope="function", autouse=True)
+def local_storage(tmp_path):
+    """Store result images under tmp_path instead of the real uploads/ directory."""
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database session for each test."""
@@ -20,9 +20,9 @@ class MockONNXInference:
         self.input_shape = [1, 3, 640, 640]
         self.classes = ["apple", "damaged_apple"]
         
-    def _preprocess(self, img_bgr):
+    def _preprocess(self, img_bgr, out=None):
         """Mock preprocessing."""
-        return MagicMock()
+        return MagicMock(), MagicMock()
     
     def _classify_apple_color(self, roi):
         """Mock color classification."""
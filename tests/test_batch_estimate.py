@@ -0,0 +1,108 @@
+import io
+import os
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+from app.db.models.farming import YieldRecord, Image, Detection
+from app.models.inference import AppleInference
+from app.utils.batch_upload import BatchTooLarge, BatchUploadError, _zip_images, parse_tree_ids
+
+JPEG_BYTES = b"\xff\xd8\xff\xe0fake_image_bytes"
+
+MOCK_RESULT = {
+    "counts": {"red_apple": 3, "green_apple": 0, "damaged_apple": 1, "total": 4},
+    "detections": {
+        "boxes": [[10, 10, 50, 50], [60, 60, 100, 100]],
+        "class_ids": [0, 1],
+        "confidences": [0.9, 0.8]
+    }
+}
+
+
+def make_zip(names):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name in names:
+            archive.writestr(name, b"fake_image_bytes")
+        archive.writestr("__MACOSX/._a.jpg", b"metadata")
+        archive.writestr("notes.txt", b"not an image")
+    return buffer.getvalue()
+
+
+def fake_batch(self, images, confidence_threshold):
+    return [MOCK_RESULT if image.filename != "broken.jpg" else {"error": "Failed to decode input image"}
+            for image in images]
+
+
+def test_parse_tree_ids():
+    assert parse_tree_ids(None, ["a.jpg", "b.jpg"]) == [None, None]
+    assert parse_tree_ids("[1, null]", ["a.jpg", "b.jpg"]) == [1, None]
+    assert parse_tree_ids('{"b.jpg": 7}', ["a.jpg", "b.jpg"]) == [None, 7]
+
+    with pytest.raises(BatchUploadError):
+        parse_tree_ids("[1]", ["a.jpg", "b.jpg"])
+    with pytest.raises(BatchUploadError):
+        parse_tree_ids('{"c.jpg": 1}', ["a.jpg", "b.jpg"])
+
+
+def test_zip_budget_is_checked_before_reading_members():
+    archive = make_zip(["a.jpg", "b.jpg", "c.jpg"])
+    member = len(b"fake_image_bytes")
+
+    assert len(_zip_images(archive, max_file_bytes=100, max_images=3, max_total_bytes=300)) == 3
+    with pytest.raises(BatchTooLarge):
+        _zip_images(archive, max_file_bytes=100, max_images=2, max_total_bytes=300)
+    with pytest.raises(BatchTooLarge):
+        _zip_images(archive, max_file_bytes=100, max_images=3, max_total_bytes=2 * member + 1)
+
+
+def test_batch_estimate_zip(client, db_session, auth_headers, test_orchard, test_tree, local_storage):
+    archive = make_zip(["a.jpg", "rows/b.jpg", "broken.jpg"])
+
+    with patch.object(AppleInference, "run_batch_inference", fake_batch), \
+            patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections", return_value=b"img"):
+        response = client.post(
+            "/api/v1/estimator/estimate/batch",
+            headers=auth_headers,
+            params={"orchard_id": test_orchard.id},
+            data={"tree_ids": f'{{"a.jpg": {test_tree.id}}}'},
+            files=[("files", ("row.zip", archive, "application/zip"))]
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["images"] == 3
+    assert body["saved"] == 2
+    assert body["failed"] == 1
+    assert body["summary"]["total_count"] == 8
+
+    # One Image/Prediction for the image with a tree, YieldRecords for both
+    assert db_session.query(YieldRecord).count() == 2
+    assert db_session.query(Image).count() == 1
+    assert db_session.query(Detection).count() == 2
+
+    for result in body["results"]:
+        if result["status"] == "saved":
+            assert result["image_path"].startswith(local_storage.base_dir)
+            assert os.path.exists(result["image_path"])
+
+
+def test_batch_estimate_unknown_tree(client, auth_headers, test_orchard):
+    response = client.post(
+        "/api/v1/estimator/estimate/batch",
+        headers=auth_headers,
+        params={"orchard_id": test_orchard.id},
+        data={"tree_ids": "[999999]"},
+        files=[("files", ("a.jpg", JPEG_BYTES, "image/jpeg"))]
+    )
+    assert response.status_code == 404
+
+
+def test_batch_estimate_requires_auth(client):
+    response = client.post(
+        "/api/v1/estimator/estimate/batch",
+        files=[("files", ("a.jpg", JPEG_BYTES, "image/jpeg"))]
+    )
+    assert response.status_code == 401
@@ -0,0 +1,107 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.models.inference import BatchScheduler
+
+
+def fake_model(calls):
+    """Model stand-in that records batch sizes and echoes a per-row marker."""
+    def run_batch(tensor):
+        calls.append(tensor.shape[0])
+        return [tensor[:, :1, :1, :1] * 2]
+    return run_batch
+
+
+def test_single_request_returns_own_output():
+    calls = []
+    scheduler = BatchScheduler(fake_model(calls), max_batch_size=4, max_wait_ms=1)
+
+    tensor = np.full((1, 3, 4, 4), 3.0, dtype=np.float32)
+    outputs = scheduler.run(tensor)
+
+    assert len(outputs) == 1
+    assert outputs[0].shape[0] == 1
+    assert outputs[0][0, 0, 0, 0] == 6.0
+    assert calls == [1]
+    scheduler.shutdown()
+
+
+def test_concurrent_requests_are_fused_and_split_back():
+    calls = []
+    scheduler = BatchScheduler(fake_model(calls), max_batch_size=8, max_wait_ms=200)
+    results = {}
+
+    def worker(i):
+        tensor = np.full((1, 3, 4, 4), float(i), dtype=np.float32)
+        results[i] = scheduler.run(tensor)[0][0, 0, 0, 0]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    # Every caller gets the slice computed from its own input
+    assert results == {i: 2.0 * i for i in range(8)}
+    assert sum(calls) == 8
+    assert len(calls) < 8
+
+    stats = scheduler.stats()
+    assert stats["requests"] == 8
+    assert stats["batches"] == len(calls)
+    assert stats["avg_batch_fill"] > 0
+    scheduler.shutdown()
+
+
+def test_model_errors_propagate_to_every_caller():
+    def failing(tensor):
+        raise RuntimeError("session exploded")
+
+    scheduler = BatchScheduler(failing, max_batch_size=2, max_wait_ms=1)
+
+    with pytest.raises(RuntimeError, match="session exploded"):
+        scheduler.run(np.zeros((1, 3, 4, 4), dtype=np.float32))
+    scheduler.shutdown()
+
+
+def test_submit_after_shutdown_fails():
+    scheduler = BatchScheduler(fake_model([]), max_batch_size=2, max_wait_ms=1)
+    scheduler.shutdown()
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit(np.zeros((1, 3, 4, 4), dtype=np.float32))
+
+
+def test_requests_queued_at_shutdown_are_resolved():
+    release = threading.Event()
+
+    def slow(tensor):
+        release.wait(timeout=5)
+        return [tensor]
+
+    scheduler = BatchScheduler(slow, max_batch_size=1, max_wait_ms=0)
+    first = scheduler.submit(np.zeros((1, 3, 4, 4), dtype=np.float32))
+    second = scheduler.submit(np.ones((1, 3, 4, 4), dtype=np.float32))
+
+    stopper = threading.Thread(target=scheduler.shutdown)
+    stopper.start()
+    release.set()
+    stopper.join(timeout=5)
+
+    # Drained or failed, but never left pending
+    assert first.result(timeout=1)[0].shape[0] == 1
+    assert second.done()
+
+
+def test_run_gives_up_after_timeout():
+    import concurrent.futures
+
+    release = threading.Event()
+    scheduler = BatchScheduler(lambda tensor: release.wait(timeout=5) and [tensor], max_batch_size=1, max_wait_ms=0)
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        scheduler.run(np.zeros((1, 3, 4, 4), dtype=np.float32), timeout=0.05)
+    release.set()
+    scheduler.shutdown()
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+from app.models.cache import InferenceResultCache, result_cache_key
+from app.models.inference import AppleInference
+from app.utils.lru import MemoryLRU
+
+RESULT = {
+    "counts": {"healthy": 2, "damaged_apple": 1, "total": 3, "red_apple": 2, "green_apple": 0},
+    "detections": {"boxes": [], "class_ids": [], "confidences": []}
+}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+
+def test_memory_lru_evicts_and_expires():
+    lru = MemoryLRU(max_entries=2, ttl_seconds=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)  # evicts b
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+
+    expiring = MemoryLRU(max_entries=2, ttl_seconds=0.01)
+    expiring.set("a", 1)
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+
+def test_key_depends_on_model_and_parameters(monkeypatch):
+    base = result_cache_key("abc", "v1", 0.32)
+    assert base == result_cache_key("abc", "v1", 0.32)
+    assert base != result_cache_key("abc", "v2", 0.32)
+    assert base != result_cache_key("abc", "v1", 0.40)
+    assert base != result_cache_key("abc", "v1", 0.32, tile_size=640)
+    assert base != result_cache_key("abd", "v1", 0.32)
+
+    # Default tile size (None) is resolved: tiled and untiled results never share a key
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "INFERENCE_TILE_SIZE", 1280)
+    default = result_cache_key("abc", "v1", 0.32)
+    assert default == result_cache_key("abc", "v1", 0.32, tile_size=1280)
+    assert default != result_cache_key("abc", "v1", 0.32, tile_size=0)  # tiling explicitly off
+
+
+def test_key_depends_on_output_changing_settings(monkeypatch):
+    from app.core.config import settings
+
+    base = result_cache_key("abc", "v1", 0.32, tile_size=1280)
+    assert base != result_cache_key("abc", "v1", 0.32, tile_size=1280, fruit="pear")
+
+    for name, value in (
+        ("PREPROCESS_MODE", "stretch" if settings.PREPROCESS_MODE == "letterbox" else "letterbox"),
+        ("INFERENCE_REDUCED_DECODE", not settings.INFERENCE_REDUCED_DECODE),
+        ("INFERENCE_TILE_INCLUDE_FULL", not settings.INFERENCE_TILE_INCLUDE_FULL),
+        ("REFILTER_MIN_CONFIDENCE", settings.REFILTER_MIN_CONFIDENCE + 0.1),
+    ):
+        with monkeypatch.context() as patched:
+            patched.setattr(settings, name, value)
+            assert result_cache_key("abc", "v1", 0.32, tile_size=1280) != base, name
+
+
+def test_redis_tier_refills_memory():
+    redis = FakeRedis()
+    writer = InferenceResultCache(enabled=True, redis_client=redis)
+    reader = InferenceResultCache(enabled=True, redis_client=redis)  # another worker
+
+    async def scenario():
+        await writer.set("k", RESULT)
+        first = await reader.get("k")
+        second = await reader.get("k")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == RESULT and second == RESULT
+    stats = reader.stats()
+    assert stats["redis_hits"] == 1 and stats["memory_hits"] == 1
+
+
+def test_disabled_cache_never_hits():
+    cache = InferenceResultCache(enabled=False)
+    asyncio.run(cache.set("k", RESULT))
+    assert asyncio.run(cache.get("k")) is None
+
+
+def test_estimator_serves_repeated_upload_from_cache(client):
+    cache = InferenceResultCache(enabled=True)
+    image = ("tree.jpg", b"\xff\xd8\xff\xe0same-photo-bytes", "image/jpeg")
+
+    with patch("app.api.v1.endpoints.estimator.inference_cache", cache), \
+            patch.object(AppleInference, "run_inference", return_value=RESULT) as mock_inference, \
+            patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections", return_value=b"img"):
+        first = client.post("/api/v1/estimator/estimate", files={"file": image})
+        second = client.post("/api/v1/estimator/estimate", files={"file": image})
+        bypass = client.post("/api/v1/estimator/estimate?use_cache=false", files={"file": image})
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["X-Total-Count"] == "3"
+    assert bypass.headers["X-Cache"] == "BYPASS"
+    assert mock_inference.call_count == 2
+
+
+def test_cache_hit_keeps_refilter_candidates(client):
+    import numpy as np
+    from app.models.postprocess import CandidateSet
+
+    cache = InferenceResultCache(enabled=True)
+    image = ("tree.jpg", b"\xff\xd8\xff\xe0refilter-photo-bytes", "image/jpeg")
+    candidates = CandidateSet(
+        boxes=np.array([[0, 0, 10, 10]], dtype=np.float32),
+        confidences=np.array([0.8], dtype=np.float32),
+        class_ids=np.array([0]),
+        original_size=(100, 100),
+        conf_floor=0.05,
+    )
+
+    with patch("app.api.v1.endpoints.estimator.inference_cache", cache), \
+            patch.object(AppleInference, "run_inference", side_effect=lambda *a, **k: {**RESULT, "candidates": candidates}), \
+            patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections", return_value=b"img"):
+        first = client.post("/api/v1/estimator/estimate", files={"file": image})
+        second = client.post("/api/v1/estimator/estimate", files={"file": image})
+
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["X-Inference-ID"] not in ("None", first.headers["X-Inference-ID"])
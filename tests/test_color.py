@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+
+from app.models.color import GREEN_CLASS_ID, RED_CLASS_ID, classify_box_colors, color_ratios
+
+
+def hsv_patch_frame():
+    """400x300 gray frame with a red square, a green square and a half-green one."""
+    frame = np.full((300, 400, 3), 128, dtype=np.uint8)
+    frame[20:80, 20:80] = (0, 0, 220)        # BGR red
+    frame[20:80, 120:180] = (0, 200, 0)      # BGR green
+    frame[150:250, 200:250] = (0, 200, 0)    # left half of the 100x100 box below is green
+    return frame
+
+
+def reference_ratios(frame, box):
+    """Per-ROI computation of the previous implementation."""
+    x, y, w, h = box
+    hsv = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2HSV)
+    red = cv2.inRange(hsv, np.array([0, 100, 100]), np.array([10, 255, 255])) + \
+        cv2.inRange(hsv, np.array([170, 100, 100]), np.array([180, 255, 255]))
+    green = cv2.inRange(hsv, np.array([40, 100, 100]), np.array([80, 255, 255]))
+    total = w * h
+    return cv2.countNonZero(red) / total, cv2.countNonZero(green) / total
+
+
+def test_classifies_all_boxes_in_one_call():
+    frame = hsv_patch_frame()
+    boxes = np.array([[20, 20, 60, 60], [120, 20, 60, 60], [300, 200, 50, 50]])
+
+    class_ids = classify_box_colors(frame, boxes)
+
+    assert class_ids.tolist() == [RED_CLASS_ID, GREEN_CLASS_ID, RED_CLASS_ID]
+
+
+def test_ratios_match_per_roi_reference():
+    frame = hsv_patch_frame()
+    boxes = [[20, 20, 60, 60], [120, 20, 60, 60], [200, 150, 100, 100], [10, 10, 30, 90]]
+
+    ratios = color_ratios(frame, np.array(boxes), max_side=None)
+
+    for box, (red, green) in zip(boxes, ratios):
+        ref_red, ref_green = reference_ratios(frame, box)
+        assert abs(red - ref_red) < 1e-9
+        assert abs(green - ref_green) < 1e-9
+
+
+def test_downsampled_ratios_stay_close():
+    frame = cv2.resize(hsv_patch_frame(), (4000, 3000), interpolation=cv2.INTER_NEAREST)
+    boxes = np.array([[2000, 1500, 1000, 1000]])
+
+    full = color_ratios(frame, boxes, max_side=None)
+    reduced = color_ratios(frame, boxes, max_side=1024)
+
+    assert np.allclose(full, reduced, atol=0.02)
+
+
+def test_no_boxes():
+    assert classify_box_colors(hsv_patch_frame(), np.empty((0, 4))).shape == (0,)
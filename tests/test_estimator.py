@@ -27,7 +27,7 @@ def create_jwt_token(user_id: int, role: UserRole, expires_delta: timedelta = No
 
 
 # Dummy image for testing
-DUMMY_IMAGE = ("test_image.jpg", b"fake_image_bytes", "image/jpeg")
+DUMMY_IMAGE = ("test_image.jpg", b"\xff\xd8\xff\xe0fake_image_bytes", "image/jpeg")  # JPEG magic bytes
 
 # Mock inference results
 MOCK_INFERENCE_RESULTS = {
@@ -42,7 +42,7 @@ MOCK_INFERENCE_RESULTS = {
 
 def test_estimator_upload_no_auth(client):
     """Guest mode: no auth required"""
-    dummy_image = ("test.jpg", b"fake image bytes", "image/jpeg")
+    dummy_image = ("test.jpg", b"\xff\xd8\xff\xe0fake image bytes", "image/jpeg")
 
     with patch.object(AppleInference, "run_inference") as mock_inference:
         mock_inference.return_value = {
@@ -125,11 +125,12 @@ def test_estimator_authenticated_preview_mode(
 
     # Verify inference and drawing were called
     mock_run_inference.assert_called_once()
-    assert mock_run_inference.call_args[0][0] == DUMMY_IMAGE[1]  # raw image bytes
+    assert mock_run_inference.call_args[0][0].data == DUMMY_IMAGE[1]  # shared image wraps the raw bytes
     assert mock_run_inference.call_args[0][1] == 0.64 * 0.6  # deep_confidence_threshold
 
     mock_draw_detections.assert_called_once()
-    assert mock_draw_detections.call_args[0][0] == DUMMY_IMAGE[1]  # original image bytes
+    # Rendering reuses the very same decoded image object as inference
+    assert mock_draw_detections.call_args[0][0] is mock_run_inference.call_args[0][0]
     assert mock_draw_detections.call_args[0][1] == MOCK_INFERENCE_RESULTS["detections"]
     assert mock_draw_detections.call_args[0][2] == 0.85 * 0.6  # drawing threshold
 
@@ -150,7 +151,8 @@ def test_estimator_authenticated_save_mode(
     auth_headers: dict,
     test_user,
     test_orchard,
-    test_tree
+    test_tree,
+    local_storage
 ):
     """
     Tests /api/v1/estimator/estimate for an authenticated user in save mode (preview=False).
@@ -165,10 +167,6 @@ def test_estimator_authenticated_save_mode(
     assert db_session.query(Prediction).count() == 0
     assert db_session.query(Detection).count() == 0
 
-    # Ensure 'uploads' directory exists for image saving
-    if not os.path.exists("uploads"):
-        os.makedirs("uploads")
-
     response = client.post(
         "/api/v1/estimator/estimate",
         headers=auth_headers,
@@ -211,13 +209,13 @@ def test_estimator_authenticated_save_mode(
     assert record.damaged_count == 1
     assert record.total_count == 6
     assert record.health_index == health_idx
-    assert os.path.exists("uploads/" + record.filename)  # Image should be saved to disk
+    assert local_storage.exists("uploads/" + record.filename)  # Image should be saved to disk
 
     image = db_session.query(Image).first()
     assert image.user_id == test_user.id
     assert image.orchard_id == test_orchard.id
     assert image.tree_id == test_tree.id
-    assert image.image_path == "uploads/" + record.filename  # Should be the same filename
+    assert image.image_path == local_storage.path("uploads/" + record.filename)  # Should be the same filename
 
     prediction = db_session.query(Prediction).first()
     assert prediction.image_id == image.id
@@ -231,18 +229,13 @@ def test_estimator_authenticated_save_mode(
     assert detections[0].prediction_id == prediction.id
     assert detections[0].class_label == "apple"  # class_id 0
     assert detections[1].class_label == "damaged_apple"  # class_id 1
-    
-    # Clean up the created image file
-    os.remove("uploads/" + record.filename)
 
 
-@patch("app.api.v1.endpoints.estimator.validate_image_file")
 @patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections")
 @patch.object(AppleInference, "run_inference")
 def test_estimator_auth_missing_orchard_id_param(
     mock_run_inference: MagicMock,
     mock_draw_detections: MagicMock,
-    mock_validate_image_file: MagicMock,
     client: TestClient,
     auth_headers: dict,
     test_tree  # tree needs an orchard, but we're testing missing orchard_id param
@@ -253,7 +246,6 @@ def test_estimator_auth_missing_orchard_id_param(
     """
     mock_run_inference.return_value = MOCK_INFERENCE_RESULTS
     mock_draw_detections.return_value = b"processed_image_bytes"
-    mock_validate_image_file.return_value = None  # Mock this to avoid file validation details
 
     response = client.post(
         "/api/v1/estimator/estimate",
@@ -441,7 +433,7 @@ def test_estimator_invalid_image_format(
     )
     assert response.status_code == 400
     assert "detail" in response.json()
-    assert "Invalid file format. Allowed: image/jpeg, image/png, image/jpg" in response.json()["detail"]
+    assert "File content is not a supported image" in response.json()["detail"]
 
 
 @patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections")
@@ -566,4 +558,41 @@ def test_get_estimation_history_unauthenticated(client: TestClient):
     response = client.get("/api/v1/estimator/history")
     assert response.status_code == 401
     assert "detail" in response.json()
-    assert response.json()["detail"] == "Not authenticated"
\ No newline at end of file
+    assert response.json()["detail"] == "Not authenticated"
+
+def test_estimator_returns_503_when_inference_queue_is_full(client: TestClient):
+    """
+    Tests /api/v1/estimator/estimate when the inference worker pool is saturated.
+    Should return 503 with a Retry-After header instead of queueing forever.
+    """
+    from app.models.executor import InferenceQueueFull
+
+    with patch(
+        "app.api.v1.endpoints.estimator.inference_executor.run",
+        side_effect=InferenceQueueFull(retry_after=3)
+    ):
+        response = client.post(
+            "/api/v1/estimator/estimate",
+            files={"file": DUMMY_IMAGE}
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+
+
+def test_inference_stats_endpoint(client: TestClient):
+    response = client.get("/api/v1/estimator/inference-stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert "queue_depth" in data["executor"]
+    assert "batching" in data
+
+
+def test_estimator_unknown_fruit_returns_400(client: TestClient):
+    response = client.post(
+        "/api/v1/estimator/estimate?fruit=durian",
+        files={"file": DUMMY_IMAGE}
+    )
+
+    assert response.status_code == 400
+    assert "durian" in response.json()["detail"]
@@ -13,4 +13,19 @@ def test_health_check(client):
     data = response.json()
     assert data["status"] == "healthy"
     assert "service" in data
-    assert data["service"] == "yield-estimator-api"
\ No newline at end of file
+    assert data["service"] == "yield-estimator-api"
+
+def test_health_reports_model_readiness_separately(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    data = response.json()
+    assert "model" in data
+    assert data["model"]["state"] in ("not_loaded", "loading", "ready", "failed")
+    assert isinstance(data["model"]["ready"], bool)
+
+
+def test_ready_endpoint_in_lazy_mode(client):
+    # Tests run with MODEL_PRELOAD=false: the model loads on first use
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
@@ -0,0 +1,40 @@
+from app.db.models.farming import YieldRecord
+
+
+def make_record(db_session, user, filename, image_status="stored"):
+    record = YieldRecord(user_id=user.id, filename=filename, healthy_count=1, damaged_count=0,
+                         total_count=1, health_index=100.0, image_status=image_status)
+    db_session.add(record)
+    db_session.commit()
+    return record
+
+
+def test_image_urls_for_a_page_of_records(client, db_session, auth_headers, test_user, other_user):
+    own = [make_record(db_session, test_user, f"{i}.jpg") for i in range(3)]
+    pending = make_record(db_session, test_user, "new.jpg", image_status="pending")
+    foreign = make_record(db_session, other_user, "x.jpg")
+
+    response = client.get("/api/v1/history/image-urls", headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["source"] == "local"
+    urls = {image["record_id"]: image for image in body["images"]}
+    assert set(urls) == {record.id for record in own + [pending]}
+    assert urls[own[0].id]["url"] == "/outputs/0.jpg"
+    assert urls[pending.id]["image_status"] == "pending"
+    assert foreign.id not in urls
+
+
+def test_image_urls_for_selected_records(client, db_session, auth_headers, test_user, other_user):
+    first = make_record(db_session, test_user, "a.jpg")
+    second = make_record(db_session, test_user, "b.jpg")
+    foreign = make_record(db_session, other_user, "x.jpg")
+
+    response = client.get(
+        "/api/v1/history/image-urls",
+        headers=auth_headers,
+        params={"record_ids": [second.id, foreign.id, first.id]}
+    )
+
+    assert [image["record_id"] for image in response.json()["images"]] == [second.id, first.id]
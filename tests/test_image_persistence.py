@@ -0,0 +1,115 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from app.core.image_persistence import IMAGE_FAILED, IMAGE_PENDING, IMAGE_STORED, ImagePersister, mark_image_status
+from app.core.metrics import INFERENCE_STAGE_SECONDS
+from app.db.models.farming import YieldRecord
+from app.utils.storage import LocalStorage, StorageError, set_storage
+from tests.conftest import TestingSessionLocal
+
+
+class FailingStorage(LocalStorage):
+    def put(self, key, data, content_type="image/jpeg"):
+        raise StorageError("bucket unreachable")
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+
+
+def make_persister(tmp_path, **kwargs):
+    return ImagePersister(
+        TestingSessionLocal,
+        workers=1,
+        queue_size=4,
+        max_attempts=2,
+        retry_backoff_seconds=0,
+        dead_letter_dir=str(tmp_path / "dead_letter"),
+        **kwargs
+    )
+
+
+def pending_record(db_session, filename):
+    record = YieldRecord(filename=filename, healthy_count=1, damaged_count=0, total_count=1,
+                         health_index=100.0, image_status=IMAGE_PENDING)
+    db_session.add(record)
+    db_session.commit()
+    return record
+
+
+def test_queued_image_is_stored_after_submit(tmp_path, db_session, uploads):
+    record = pending_record(db_session, "a.jpg")
+    persister = make_persister(tmp_path)
+
+    async def scenario():
+        persister.start()
+        assert persister.submit("uploads/a.jpg", b"jpeg")
+        await persister.stop()  # drains the queue first
+
+    asyncio.run(scenario())
+
+    assert uploads.exists("uploads/a.jpg")
+    db_session.expire_all()
+    assert record.image_status == IMAGE_STORED
+
+
+def test_not_queued_when_workers_are_not_running(tmp_path, uploads):
+    assert make_persister(tmp_path).submit("uploads/a.jpg", b"jpeg") is False
+
+
+def test_failed_image_is_dead_lettered_then_retried(tmp_path, db_session, uploads):
+    record = pending_record(db_session, "b.jpg")
+    persister = make_persister(tmp_path)
+
+    set_storage(FailingStorage(uploads.base_dir))
+
+    async def scenario():
+        persister.start()
+        persister.submit("uploads/b.jpg", b"jpeg")
+        await persister.stop()
+
+    asyncio.run(scenario())
+
+    assert persister.dead_letters() == ["uploads/b.jpg"]
+    db_session.expire_all()
+    assert record.image_status == IMAGE_FAILED
+
+    # Storage is back: the next startup stores it
+    set_storage(uploads)
+    assert asyncio.run(persister.retry_dead_letters()) == 1
+    assert persister.dead_letters() == []
+    assert uploads.exists("uploads/b.jpg")
+    db_session.expire_all()
+    assert record.image_status == IMAGE_STORED
+    assert not os.listdir(persister.dead_letter_dir)
+
+
+def test_status_change_keeps_created_at(db_session):
+    record = pending_record(db_session, "c.jpg")
+    record.created_at = datetime(2024, 3, 1, 8, 30)
+    db_session.commit()
+
+    assert mark_image_status(db_session, "uploads/c.jpg", IMAGE_STORED) == 1
+    db_session.commit()
+
+    db_session.expire_all()
+    assert record.image_status == IMAGE_STORED
+    assert record.created_at == datetime(2024, 3, 1, 8, 30)
+
+
+def test_store_records_upload_latency(tmp_path, uploads):
+    def upload_count():
+        return sum(row[3] for row in INFERENCE_STAGE_SECONDS.snapshot() if row[0] == ["upload"])
+
+    before = upload_count()
+    stored, _ = asyncio.run(make_persister(tmp_path).store("uploads/d.jpg", b"jpeg"))
+
+    assert stored
+    assert upload_count() == before + 1
@@ -0,0 +1,119 @@
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+
+from app.utils.image_processing import (
+    DecodedImage,
+    as_decoded_image,
+    draw_cyberpunk_detections,
+    probe_image_size,
+    reduced_decode_factor,
+)
+
+
+def make_jpeg(width: int = 320, height: int = 240) -> bytes:
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    img[:, :, 2] = 200  # reddish
+    ok, buffer = cv2.imencode(".jpg", img)
+    assert ok
+    return buffer.tobytes()
+
+
+def test_decoded_image_decodes_once():
+    image = DecodedImage.from_bytes(make_jpeg(), filename="tree.jpg")
+    assert not image.is_decoded
+
+    with patch("app.utils.image_processing.cv2.imdecode", wraps=cv2.imdecode) as mock_decode:
+        first = image.frame
+        second = image.frame
+
+    assert mock_decode.call_count == 1
+    assert first is second
+    assert (image.width, image.height) == (320, 240)
+    assert image.metadata()["filename"] == "tree.jpg"
+
+
+def test_max_side_reads_header_without_decoding():
+    image = DecodedImage.from_bytes(make_jpeg(320, 480))
+
+    assert image.max_side == 480
+    assert not image.is_decoded
+
+
+def test_decoded_image_invalid_bytes():
+    image = DecodedImage.from_bytes(b"not an image")
+    with pytest.raises(ValueError):
+        _ = image.frame
+
+
+def test_as_decoded_image_accepts_all_inputs():
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    wrapped = DecodedImage(frame=frame)
+
+    assert as_decoded_image(wrapped) is wrapped
+    assert as_decoded_image(frame).frame is frame
+    assert as_decoded_image(make_jpeg()).width == 320
+
+
+def test_draw_reuses_frame_without_mutating_it():
+    image = DecodedImage.from_bytes(make_jpeg())
+    original = image.frame.copy()
+    detections = {"boxes": [[10, 10, 50, 50]], "class_ids": [0], "confidences": [0.9]}
+
+    with patch("app.utils.image_processing.cv2.imdecode") as mock_decode:
+        rendered = draw_cyberpunk_detections(image, detections)
+
+    mock_decode.assert_not_called()
+    assert rendered[:2] == b"\xff\xd8"  # JPEG magic
+    assert np.array_equal(image.frame, original)
+
+
+def test_probe_image_size_reads_headers():
+    assert probe_image_size(make_jpeg(320, 240)) == (320, 240)
+
+    ok, png = cv2.imencode(".png", np.zeros((30, 40, 3), dtype=np.uint8))
+    assert probe_image_size(png.tobytes()) == (40, 30)
+    assert probe_image_size(b"garbage") is None
+
+
+def test_reduced_decode_factor():
+    assert reduced_decode_factor(4000, 3000, 640) == 4
+    assert reduced_decode_factor(6000, 5200, 640) == 8
+    assert reduced_decode_factor(1280, 1280, 640) == 2
+    assert reduced_decode_factor(800, 600, 640) == 1
+
+
+def test_inference_frame_uses_reduced_decode_and_keeps_original_size():
+    image = DecodedImage.from_bytes(make_jpeg(2600, 1400))
+
+    frame, original_size = image.inference_frame(640)
+
+    assert original_size == (2600, 1400)
+    assert frame.shape[:2] == (700, 1300)  # factor 2
+    assert not image.is_decoded  # full decode skipped
+
+
+def test_render_on_reduced_decode_skips_full_decode():
+    image = DecodedImage.from_bytes(make_jpeg(2600, 1400))
+    image.inference_frame(640)
+    detections = {"boxes": [[200, 200, 400, 400]], "class_ids": [0], "confidences": [0.9]}
+
+    frame, scale = image.working_frame()
+    rendered = draw_cyberpunk_detections(image, detections, reduced_size=640)
+
+    assert frame.shape[:2] == (700, 1300) and scale == 0.5
+    assert not image.is_decoded
+    output = cv2.imdecode(np.frombuffer(rendered, np.uint8), cv2.IMREAD_COLOR)
+    assert output.shape[:2] == (700, 1300)  # rendered at the reduced resolution
+
+
+def test_working_frame_is_full_frame_once_decoded():
+    image = DecodedImage.from_bytes(make_jpeg(2600, 1400))
+    image.inference_frame(640)
+    full = image.frame
+
+    frame, scale = image.working_frame(640)
+
+    assert frame is full and scale == 1.0
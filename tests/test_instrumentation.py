@@ -0,0 +1,51 @@
+import asyncio
+
+from app.core.logging import (
+    InferenceTrace,
+    inference_stage,
+    inference_trace_var,
+    start_inference_trace,
+)
+from app.models.executor import InferenceExecutor
+
+
+def test_stages_accumulate():
+    trace = InferenceTrace(sampled=False)
+    with trace.stage("store"):
+        pass
+    trace.add("store", 5.0)
+    trace.add("render", 2.0)
+
+    assert trace.stages_ms["store"] >= 5.0
+    assert trace.stages_ms["render"] == 2.0
+
+
+def test_inference_stage_is_noop_without_trace():
+    inference_trace_var.set(None)
+    with inference_stage("decode"):
+        value = 1
+    assert value == 1
+
+
+def test_trace_reaches_executor_workers():
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+
+    def work():
+        with inference_stage("session_run"):
+            return sum(range(100))
+
+    async def request():
+        trace = start_inference_trace(fruit="apple")
+        await executor.run(work)
+        return trace
+
+    trace = asyncio.run(request())
+    executor.shutdown()
+
+    assert "session_run" in trace.stages_ms
+
+
+def test_finish_returns_total_time():
+    trace = InferenceTrace(sampled=True, fruit="apple")
+    trace.add("decode", 1.0)
+    assert trace.finish(detections=3) >= 0
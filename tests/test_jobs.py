@@ -0,0 +1,106 @@
+import asyncio
+import os
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.core.jobs import JobQueue, job_queue, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+from app.db.models.farming import EstimateJob, YieldRecord, get_bogota_time
+from app.models.inference import AppleInference
+from tests.conftest import TestingSessionLocal
+
+MOCK_RESULT = {
+    "counts": {"red_apple": 2, "green_apple": 0, "damaged_apple": 1, "total": 3},
+    "detections": {"boxes": [[10, 10, 50, 50]], "class_ids": [0], "confidences": [0.9]}
+}
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_DIR", str(tmp_path))
+
+
+def submit(client, headers, count=2):
+    return client.post(
+        "/api/v1/estimator/jobs",
+        headers=headers,
+        files=[("files", (f"img{i}.jpg", b"\xff\xd8\xff\xe0fake_image_bytes", "image/jpeg")) for i in range(count)]
+    )
+
+
+def test_submit_returns_immediately_and_job_is_persisted(client, db_session, auth_headers):
+    response = submit(client, auth_headers)
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    job = db_session.get(EstimateJob, job_id)
+    assert job.status == JOB_QUEUED
+    assert job.total_items == 2
+    assert len(os.listdir(job.input_dir)) == 2  # uploads spooled, survive a restart
+
+    status = client.get(f"/api/v1/estimator/jobs/{job_id}", headers=auth_headers).json()
+    assert status["status"] == JOB_QUEUED
+    assert status["processed_items"] == 0
+
+
+def test_worker_runs_queued_job(client, db_session, auth_headers, monkeypatch, local_storage):
+    job_id = submit(client, auth_headers).json()["job_id"]
+    monkeypatch.setattr(job_queue, "session_factory", TestingSessionLocal)
+
+    with patch.object(AppleInference, "run_batch_inference", side_effect=lambda images, thr: [MOCK_RESULT] * len(images)), \
+            patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections", return_value=b"img"):
+        assert asyncio.run(job_queue.process_next()) is True
+    assert asyncio.run(job_queue.process_next()) is False  # queue drained
+
+    db_session.expire_all()  # the worker committed through its own session
+    status = client.get(f"/api/v1/estimator/jobs/{job_id}", headers=auth_headers).json()
+    assert status["status"] == JOB_SUCCEEDED
+    assert status["processed_items"] == 2
+    assert status["result"]["summary"]["total_count"] == 6
+    assert db_session.query(YieldRecord).count() == 2
+
+    for result in status["result"]["results"]:
+        assert result["image_path"].startswith(local_storage.base_dir)
+
+
+def test_job_of_another_user_is_hidden(client, auth_headers, other_user):
+    from tests.conftest import create_jwt_token
+
+    job_id = submit(client, auth_headers, count=1).json()["job_id"]
+    other_headers = {"Authorization": f"Bearer {create_jwt_token(other_user.id, other_user.role)}"}
+
+    assert client.get(f"/api/v1/estimator/jobs/{job_id}", headers=other_headers).status_code == 404
+
+
+def test_stale_jobs_are_requeued_until_out_of_attempts(db_session, test_user):
+    queue = JobQueue(TestingSessionLocal, workers=0, max_attempts=2, lease_seconds=60)
+    expired = get_bogota_time() - timedelta(seconds=120)
+    for job_id, attempts in (("retry", 1), ("exhausted", 2)):
+        db_session.add(EstimateJob(
+            id=job_id, user_id=test_user.id, status=JOB_RUNNING, input_dir="spool",
+            attempts=attempts, heartbeat_at=expired
+        ))
+    db_session.commit()
+
+    assert queue.requeue_stale(db_session) == 1
+    db_session.expire_all()
+    assert db_session.get(EstimateJob, "retry").status == JOB_QUEUED
+    assert db_session.get(EstimateJob, "exhausted").status == JOB_FAILED
+
+
+def test_heartbeat_keeps_running_job_leased(db_session, test_user):
+    queue = JobQueue(TestingSessionLocal, workers=0, lease_seconds=60)
+    db_session.add(EstimateJob(
+        id="long", user_id=test_user.id, status=JOB_RUNNING, input_dir="spool",
+        attempts=1, heartbeat_at=get_bogota_time() - timedelta(seconds=120)
+    ))
+    db_session.commit()
+
+    assert queue.heartbeat("long", attempt=1) is True
+    assert queue.heartbeat("long", attempt=2) is False  # claimed again by another run
+    db_session.expire_all()
+    assert queue.requeue_stale(db_session) == 0
+    assert db_session.get(EstimateJob, "long").status == JOB_RUNNING
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.core.metrics import MetricsRegistry
+
+
+def test_counter_and_histogram_exposition():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ["status"])
+    latency = registry.histogram("latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+
+    requests.inc(status="200")
+    requests.inc(2, status="200")
+    latency.observe(0.05, stage="decode")
+    latency.observe(0.5, stage="decode")
+    latency.observe(5.0, stage="decode")
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{status="200"} 3' in text
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{stage="decode",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="decode",le="1"} 2' in text
+    assert 'latency_seconds_bucket{stage="decode",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="decode"} 3' in text
+    assert 'latency_seconds_sum{stage="decode"} 5.55' in text
+
+
+def test_snapshots_of_other_workers_are_merged(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    requests = registry.counter("requests_total", "Requests", ["status"])
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(1.0,))
+    requests.inc(status="200")
+    latency.observe(0.5)
+
+    # Snapshot written by another (live) worker process
+    other = {
+        "requests_total": [[["200"], 4.0], [["500"], 1.0]],
+        "latency_seconds": [[[], [0, 2], 6.0, 2]],
+    }
+    (tmp_path / f"metrics_{os.getppid()}.json").write_text(json.dumps(other))
+
+    text = registry.render()
+
+    assert 'requests_total{status="200"} 5' in text
+    assert 'requests_total{status="500"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+
+
+def test_flush_writes_own_snapshot(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    registry.counter("requests_total", "Requests").inc()
+    registry.flush()
+
+    files = list(tmp_path.glob("metrics_*.json"))
+    assert len(files) == 1
+    assert json.loads(files[0].read_text())["requests_total"] == [[[], 1.0]]
+    # Own file is not counted twice
+    assert "requests_total 1" in registry.render()
+
+
+def test_snapshots_of_exited_workers_are_removed(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    registry.counter("requests_total", "Requests").inc()
+
+    worker = subprocess.Popen([sys.executable, "-c", "pass"])
+    worker.wait()
+    dead = tmp_path / f"metrics_{worker.pid}.json"
+    dead.write_text(json.dumps({"requests_total": [[[], 7.0]]}))
+
+    assert "requests_total 1" in registry.render()
+    assert not dead.exists()
+
+
+def test_stopping_removes_own_snapshot(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    registry.counter("requests_total", "Requests").inc()
+    registry.flush()
+
+    registry.stop_flusher()
+
+    assert list(tmp_path.glob("metrics_*.json")) == []
+
+
+def test_metrics_endpoint(client):
+    client.get("/health")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",endpoint="/health",status="200"}' in response.text
+    assert "inference_stage_duration_seconds" in response.text
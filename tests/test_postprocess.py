@@ -0,0 +1,145 @@
+import cv2
+import numpy as np
+
+from app.models.postprocess import (
+    DETECTION_DTYPE,
+    batched_nms,
+    clip_boxes,
+    nms,
+    postprocess,
+    xywh_to_xyxy,
+)
+
+
+def synthetic_output(n_objects: int = 30, anchors: int = 8400, seed: int = 0) -> np.ndarray:
+    """YOLOv8-like raw output (1, 4 + 2, anchors) with clusters of overlapping candidates."""
+    rng = np.random.default_rng(seed)
+    boxes = np.zeros((anchors, 4), dtype=np.float32)
+    scores = rng.uniform(0, 0.2, (anchors, 2)).astype(np.float32)
+
+    centers = rng.uniform(60, 580, (n_objects, 2))
+    sizes = rng.uniform(20, 60, (n_objects, 2))
+    for k in range(anchors):
+        obj = k % n_objects
+        jitter = rng.normal(0, 2, 4)
+        boxes[k] = [*(centers[obj] + jitter[:2]), *(sizes[obj] + jitter[2:])]
+        if k < n_objects * 10:
+            scores[k, obj % 2] = rng.uniform(0.5, 0.95)
+
+    return np.concatenate([boxes, scores], axis=1).T[None, ...]
+
+
+def legacy_postprocess(output, original_size, conf_threshold, iou_threshold=0.45):
+    """Reference: the loop + cv2.dnn.NMSBoxes implementation previously in AppleInference."""
+    predictions = np.squeeze(output).T
+    boxes, scores = predictions[:, :4], predictions[:, 4:]
+    confidences = np.max(scores, axis=1)
+    class_ids = np.argmax(scores, axis=1)
+    mask = confidences > conf_threshold
+    confidences, class_ids, boxes = confidences[mask], class_ids[mask], boxes[mask]
+
+    nms_boxes = [[int(cx - w / 2), int(cy - h / 2), int(w), int(h)] for cx, cy, w, h in boxes]
+    indexes = cv2.dnn.NMSBoxes(nms_boxes, confidences.tolist(), conf_threshold, iou_threshold)
+
+    orig_w, orig_h = original_size
+    x_scale, y_scale = orig_w / 640, orig_h / 640
+    results = []
+    for i in np.array(indexes).flatten():
+        x, y, w, h = nms_boxes[i]
+        x, y = max(0, int(x * x_scale)), max(0, int(y * y_scale))
+        w, h = min(int(w * x_scale), orig_w - x), min(int(h * y_scale), orig_h - y)
+        if w > 0 and h > 0:
+            results.append((x, y, w, h, int(class_ids[i]), float(confidences[i])))
+    return results
+
+
+def test_postprocess_matches_legacy_implementation():
+    output = synthetic_output()
+    original_size = (4000, 3000)
+
+    legacy = legacy_postprocess(output, original_size, 0.45)
+    detections = postprocess(output, original_size, conf_threshold=0.45, iou_threshold=0.45)
+
+    assert detections.dtype == DETECTION_DTYPE
+    assert len(detections) == len(legacy)
+
+    legacy_sorted = sorted(legacy, key=lambda d: -d[5])
+    for det, ref in zip(detections, legacy_sorted):
+        # int() truncation in the legacy path shifts boxes by a few scaled pixels
+        assert np.allclose([det["x"], det["y"], det["w"], det["h"]], ref[:4], atol=15)
+        assert det["class_id"] == ref[4]
+        assert np.isclose(det["confidence"], ref[5])
+
+
+def test_postprocess_no_candidates():
+    output = synthetic_output()
+    detections = postprocess(output, (640, 640), conf_threshold=0.99)
+    assert len(detections) == 0
+    assert detections.dtype == DETECTION_DTYPE
+
+
+def test_nms_suppresses_overlaps_and_keeps_order():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [20, 20, 30, 30]], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.7], dtype=np.float32)
+
+    keep = nms(boxes, scores, 0.5)
+
+    assert keep.tolist() == [1, 2]
+
+
+def test_batched_nms_is_class_aware():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10]], dtype=np.float32)
+    scores = np.array([0.8, 0.9], dtype=np.float32)
+    class_ids = np.array([0, 1])
+
+    assert len(batched_nms(boxes, scores, class_ids, 0.5, agnostic=False)) == 2
+    assert len(batched_nms(boxes, scores, class_ids, 0.5, agnostic=True)) == 1
+
+
+def test_batched_nms_is_class_aware_with_negative_coordinates():
+    # Unclipped boxes: max() + 1 == 0 used to put both classes in the same region
+    boxes = np.array([[-20, -20, -1, -1], [-19, -19, -1, -1]], dtype=np.float32)
+    scores = np.array([0.8, 0.9], dtype=np.float32)
+    class_ids = np.array([0, 1])
+
+    assert sorted(batched_nms(boxes, scores, class_ids, 0.5, agnostic=False).tolist()) == [0, 1]
+
+
+def test_xywh_to_xyxy_and_clip():
+    boxes = xywh_to_xyxy(np.array([[5, 5, 20, 10]], dtype=np.float32))
+    assert boxes.tolist() == [[-5, 0, 15, 10]]
+
+    clipped = clip_boxes(boxes, width=12, height=8)
+    assert clipped.tolist() == [[0, 0, 12, 8]]
+
+
+def test_refiltering_candidates_matches_direct_postprocess_in_count():
+    from app.models.postprocess import extract_candidates, filter_candidates
+
+    output = synthetic_output(n_objects=20)
+    # Uniform scale: IoU (hence NMS) is the same in model and original space
+    candidates = extract_candidates(output, (1280, 1280), input_size=640, conf_floor=0.05)
+
+    for threshold in (0.3, 0.6, 0.9):
+        direct = postprocess(output, (1280, 1280), input_size=640, conf_threshold=threshold, iou_threshold=0.45)
+        refiltered = filter_candidates(candidates, threshold, iou_threshold=0.45)
+        assert len(refiltered) == len(direct)
+        assert np.all(refiltered["confidence"] > threshold)
+
+
+def test_refilter_at_original_threshold_reproduces_postprocess_exactly():
+    from app.models.postprocess import CandidateSet, extract_candidates, filter_candidates
+    from app.models.preprocess import LetterboxInfo
+
+    output = synthetic_output(n_objects=25, seed=3)
+    letterbox = LetterboxInfo(640 / 1920, 640 / 1920, 0.0, 160.0, (1920, 960))
+    # Stretched (non-uniform scale) and letterboxed inputs
+    for original_size, info in (((1920, 640), None), ((1920, 960), letterbox)):
+        candidates = extract_candidates(output, original_size, input_size=640, conf_floor=0.05, letterbox=info)
+        restored = CandidateSet.from_dict(candidates.to_dict())
+
+        for threshold in (0.3, 0.6):
+            direct = postprocess(output, original_size, input_size=640, conf_threshold=threshold,
+                                 iou_threshold=0.45, letterbox=info)
+            assert np.array_equal(filter_candidates(candidates, threshold, iou_threshold=0.45), direct)
+            assert np.array_equal(filter_candidates(restored, threshold, iou_threshold=0.45), direct)
@@ -0,0 +1,75 @@
+import numpy as np
+
+from app.models.postprocess import postprocess
+from app.models.preprocess import LetterboxInfo, LetterboxPreprocessor
+
+
+def test_letterbox_keeps_aspect_ratio_and_pads():
+    preprocessor = LetterboxPreprocessor(input_size=64)
+    frame = np.full((50, 100, 3), 255, dtype=np.uint8)  # 2:1 landscape
+
+    tensor, info = preprocessor(frame)
+
+    assert tensor.shape == (1, 3, 64, 64)
+    assert tensor.dtype == np.float32
+    assert (info.pad_x, info.pad_y) == (0.0, 16.0)
+    # Image area is white, padding bands are gray (114 / 255)
+    assert np.allclose(tensor[0, :, 32, 32], 1.0)
+    assert np.allclose(tensor[0, :, 0, 32], 114 / 255)
+
+
+def test_letterbox_swaps_bgr_to_rgb():
+    preprocessor = LetterboxPreprocessor(input_size=32)
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    frame[:, :, 0] = 255  # pure blue in BGR
+
+    tensor, _ = preprocessor(frame)
+
+    assert np.allclose(tensor[0, 2], 1.0)  # blue ends up in the last RGB channel
+    assert np.allclose(tensor[0, 0], 0.0)
+
+
+def test_letterbox_reuses_per_thread_buffers():
+    preprocessor = LetterboxPreprocessor(input_size=32)
+    frame = np.zeros((20, 40, 3), dtype=np.uint8)
+
+    first, _ = preprocessor(frame)
+    second, _ = preprocessor(frame)
+
+    assert first is second
+    assert preprocessor.allocations == 1
+
+
+def test_letterbox_writes_into_batch_slice():
+    preprocessor = LetterboxPreprocessor(input_size=32)
+    batch = np.zeros((2, 3, 32, 32), dtype=np.float32)
+
+    tensor, _ = preprocessor(np.full((32, 32, 3), 255, dtype=np.uint8), out=batch[1])
+
+    assert tensor is batch[1] or np.shares_memory(tensor, batch)
+    assert np.allclose(batch[1], 1.0)
+    assert np.allclose(batch[0], 0.0)
+
+
+def test_letterbox_info_maps_boxes_back_to_original():
+    # 1280x640 frame letterboxed into 640: ratio 0.5, pad_y 160
+    info = LetterboxInfo(scale_x=0.5, scale_y=0.5, pad_x=0.0, pad_y=160.0, frame_size=(1280, 640))
+    boxes = np.array([[100, 260, 200, 360]], dtype=np.float32)
+
+    # Original image is twice the frame (reduced decode factor 2)
+    mapped = info.to_original(boxes, (2560, 1280))
+
+    assert mapped.tolist() == [[400, 400, 800, 800]]
+
+
+def test_postprocess_undoes_letterbox_padding():
+    # One confident box centered at (320, 320), 100x100 in model space
+    output = np.zeros((1, 6, 4), dtype=np.float32)
+    output[0, :, 0] = [320, 320, 100, 100, 0.9, 0.1]
+    info = LetterboxInfo(scale_x=0.5, scale_y=0.5, pad_x=0.0, pad_y=160.0, frame_size=(1280, 640))
+
+    detections = postprocess(output, (1280, 640), conf_threshold=0.5, letterbox=info)
+
+    assert len(detections) == 1
+    det = detections[0]
+    assert (det["x"], det["y"], det["w"], det["h"]) == (540, 220, 200, 200)
@@ -0,0 +1,129 @@
+import asyncio
+from unittest.mock import patch
+
+from app.db.models.farming import YieldRecord, Image, Prediction, Detection
+from app.models.inference import AppleInference
+from app.utils.preview_store import MemoryPreviewBackend, PreviewStore
+
+DUMMY_IMAGE = ("test_image.jpg", b"\xff\xd8\xff\xe0fake_image_bytes", "image/jpeg")  # JPEG magic bytes
+
+MOCK_INFERENCE_RESULTS = {
+    "counts": {"red_apple": 3, "green_apple": 2, "damaged_apple": 1, "total": 6},
+    "detections": {
+        "boxes": [[10, 10, 50, 50], [60, 60, 100, 100]],
+        "class_ids": [0, 1],
+        "confidences": [0.9, 0.8]
+    }
+}
+
+
+def run_preview(client, headers, **params):
+    with patch.object(AppleInference, "run_inference", return_value=MOCK_INFERENCE_RESULTS), \
+            patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections", return_value=b"img"):
+        return client.post(
+            "/api/v1/estimator/estimate",
+            headers=headers,
+            params={"preview": True, "use_cache": False, **params},
+            files={"file": DUMMY_IMAGE}
+        )
+
+
+def test_preview_store_pop_once_and_expiry():
+    store = PreviewStore(MemoryPreviewBackend(), ttl_seconds=60)
+    preview_id = asyncio.run(store.save({"total": 3}))
+
+    assert asyncio.run(store.get(preview_id)) == {"total": 3}
+    assert asyncio.run(store.pop(preview_id)) == {"total": 3}
+    assert asyncio.run(store.pop(preview_id)) is None
+
+    expired = PreviewStore(MemoryPreviewBackend(), ttl_seconds=-1)
+    assert asyncio.run(expired.get(asyncio.run(expired.save({})))) is None
+
+
+def test_save_preview_commits_server_side_result(client, db_session, auth_headers, test_orchard, test_tree):
+    response = run_preview(client, auth_headers, orchard_id=test_orchard.id, tree_id=test_tree.id)
+    preview_id = response.headers["X-Preview-ID"]
+    assert preview_id != "None"
+    assert db_session.query(YieldRecord).count() == 0
+
+    # Saving does not run the model again
+    with patch.object(AppleInference, "run_inference") as mock_inference:
+        saved = client.post(
+            f"/api/v1/estimator/preview/{preview_id}/save",
+            headers=auth_headers,
+            json={"user_notes": "looks good"}
+        )
+        mock_inference.assert_not_called()
+
+    assert saved.status_code == 200
+    assert saved.json()["prediction_id"] is not None
+    assert db_session.query(YieldRecord).count() == 1
+    assert db_session.query(Image).count() == 1
+    assert db_session.query(Detection).count() == 2
+
+    prediction = db_session.query(Prediction).first()
+    assert prediction.total_apples == 6
+    assert prediction.user_notes == "looks good"
+    assert db_session.query(Image).first().image_path == response.headers["X-Image-Path"]
+    # Stored inline in tests (no persistence workers), so the saved record says so
+    assert db_session.query(YieldRecord).first().image_status == "stored"
+
+    # A preview is saved once
+    again = client.post(f"/api/v1/estimator/preview/{preview_id}/save", headers=auth_headers)
+    assert again.status_code == 404
+
+
+def test_save_preview_of_another_user(client, auth_headers):
+    from app.utils.preview_store import preview_store
+
+    preview_id = asyncio.run(preview_store.save({"user_id": -1}))
+    response = client.post(f"/api/v1/estimator/preview/{preview_id}/save", headers=auth_headers)
+
+    assert response.status_code == 404
+    assert asyncio.run(preview_store.get(preview_id)) is not None  # still there for its owner
+
+
+def test_guest_preview_has_no_preview_id(client):
+    response = run_preview(client, {})
+    assert response.headers["X-Preview-ID"] == "None"
+
+
+def test_save_after_refilter_commits_refiltered_result(client, db_session, auth_headers, test_orchard, test_tree):
+    import numpy as np
+    from app.models.postprocess import CandidateSet
+
+    candidates = CandidateSet(
+        boxes=np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32),
+        confidences=np.array([0.3, 0.8], dtype=np.float32),
+        class_ids=np.array([0, 0]),
+        original_size=(100, 100),
+        conf_floor=0.05,
+    )
+    with patch.object(AppleInference, "run_inference",
+                      side_effect=lambda *a, **k: {**MOCK_INFERENCE_RESULTS, "candidates": candidates}), \
+            patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections", return_value=b"img"):
+        response = client.post(
+            "/api/v1/estimator/estimate",
+            headers=auth_headers,
+            params={"preview": True, "use_cache": False, "orchard_id": test_orchard.id, "tree_id": test_tree.id},
+            files={"file": DUMMY_IMAGE}
+        )
+        preview_id = response.headers["X-Preview-ID"]
+        inference_id = response.headers["X-Inference-ID"]
+
+        refiltered = client.post(
+            f"/api/v1/estimator/estimate/{inference_id}/refilter",
+            headers=auth_headers,
+            params={"confidence_threshold": 0.9, "preview_id": preview_id}
+        )
+    assert refiltered.status_code == 200
+    assert refiltered.headers["X-Total-Count"] == "1"  # 0.64 * 0.9 keeps the 0.8 box only
+
+    saved = client.post(f"/api/v1/estimator/preview/{preview_id}/save", headers=auth_headers)
+
+    assert saved.status_code == 200
+    record = db_session.query(YieldRecord).one()
+    assert record.total_count == int(refiltered.headers["X-Total-Count"])
+    assert record.healthy_count == int(refiltered.headers["X-Healthy-Count"])
+    assert db_session.query(Detection).count() == 1
+    assert db_session.query(Prediction).one().total_apples == 1
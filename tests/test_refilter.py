@@ -0,0 +1,85 @@
+import numpy as np
+
+from app.models.candidates import CandidateEntry, CandidateStore
+from app.models.postprocess import CandidateSet
+from app.utils.image_processing import DecodedImage
+
+
+class FakeEngine:
+    def refilter(self, candidates, threshold, image):
+        kept = int(np.count_nonzero(candidates.confidences > threshold))
+        return {
+            "counts": {"red_apple": kept, "green_apple": 0, "healthy": kept, "damaged_apple": 0, "total": kept},
+            "detections": {"boxes": [], "class_ids": [], "confidences": []}
+        }
+
+
+def make_entry(user_id=None, payload=b"x" * 1024):
+    candidates = CandidateSet(
+        boxes=np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32),
+        confidences=np.array([0.3, 0.8], dtype=np.float32),
+        class_ids=np.array([0, 0]),
+        original_size=(100, 100),
+        conf_floor=0.05,
+    )
+    return CandidateEntry(candidates, DecodedImage.from_bytes(payload), FakeEngine(), user_id=user_id)
+
+
+def test_store_expires_entries():
+    store = CandidateStore(max_mb=1, ttl_seconds=0)
+    inference_id = store.put(make_entry())
+    assert store.get(inference_id) is None
+
+
+def test_store_bounded_by_memory():
+    store = CandidateStore(max_mb=0.002, ttl_seconds=60)  # ~2 KB
+    first = store.put(make_entry())
+    second = store.put(make_entry())
+
+    assert store.get(first) is None
+    assert store.get(second) is not None
+
+
+def test_refilter_endpoint(client):
+    from app.models.candidates import candidate_store
+
+    inference_id = candidate_store.put(make_entry())
+
+    from unittest.mock import patch
+    with patch("app.api.v1.endpoints.estimator.draw_cyberpunk_detections", return_value=b"img"):
+        low = client.post(f"/api/v1/estimator/estimate/{inference_id}/refilter?confidence_threshold=0.4")
+        high = client.post(f"/api/v1/estimator/estimate/{inference_id}/refilter?confidence_threshold=0.9")
+
+    assert low.status_code == 200
+    assert low.headers["X-Total-Count"] == "2"  # 0.64 * 0.4 = 0.256
+    assert high.headers["X-Total-Count"] == "1"
+    assert high.headers["X-Inference-ID"] == inference_id
+
+
+def test_refilter_unknown_or_foreign_estimate(client, auth_headers):
+    from app.models.candidates import candidate_store
+
+    assert client.post("/api/v1/estimator/estimate/unknown/refilter").status_code == 404
+
+    # Estimate of another user is not visible
+    inference_id = candidate_store.put(make_entry(user_id=-1))
+    response = client.post(f"/api/v1/estimator/estimate/{inference_id}/refilter", headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_refilter_below_floor(client):
+    from app.models.candidates import candidate_store
+
+    inference_id = candidate_store.put(make_entry())
+    response = client.post(f"/api/v1/estimator/estimate/{inference_id}/refilter?confidence_threshold=0.01")
+    assert response.status_code == 400
+
+
+def test_entry_keeps_encoded_image_only():
+    entry = make_entry()
+    image = DecodedImage(data=entry.image.data, frame=np.zeros((4, 4, 3), dtype=np.uint8))
+    entry = CandidateEntry(entry.candidates, image, FakeEngine())
+
+    assert not entry.image.is_decoded
+    assert entry.nbytes == entry.candidates.nbytes + len(image.data)
+    assert entry.load_image() is not entry.image
@@ -0,0 +1,174 @@
+import threading
+
+import pytest
+
+from app.models.registry import ModelRegistry, ModelUnavailable
+
+
+class FakeEngine:
+    model_version = "fake-v1"
+    batch_scheduler = None
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_registry_does_not_load_until_requested():
+    calls = []
+    registry = ModelRegistry(lambda: calls.append(1) or FakeEngine())
+
+    assert registry.state == "not_loaded"
+    assert registry.peek() is None
+    assert calls == []
+
+    engine = registry.get()
+    assert isinstance(engine, FakeEngine)
+    assert registry.get() is engine
+    assert registry.state == "ready"
+    assert calls == [1]
+
+
+def test_concurrent_get_loads_once():
+    calls = []
+    registry = ModelRegistry(lambda: calls.append(1) or FakeEngine())
+
+    threads = [threading.Thread(target=registry.get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+
+
+def test_failed_load_is_reported_and_retried():
+    attempts = []
+
+    def loader():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise FileNotFoundError("best_model.onnx")
+        return FakeEngine()
+
+    registry = ModelRegistry(loader)
+
+    with pytest.raises(ModelUnavailable):
+        registry.get()
+    assert registry.status()["state"] == "failed"
+    assert "best_model.onnx" in registry.status()["error"]
+
+    assert isinstance(registry.get(), FakeEngine)
+    assert registry.status()["ready"] is True
+    assert registry.status()["error"] is None
+
+
+def test_background_load():
+    registry = ModelRegistry(FakeEngine)
+    registry.start_background_load().join(timeout=5)
+    assert registry.is_ready
+    assert registry.model_version == "fake-v1"
+
+
+class WarmableEngine(FakeEngine):
+    def __init__(self):
+        self.warmed = []
+
+    def warmup(self, batch_sizes, iterations):
+        self.warmed.append((tuple(batch_sizes), iterations))
+        return {size: 1.0 for size in batch_sizes}
+
+
+def test_warm_up_marks_registry_warm():
+    registry = ModelRegistry(WarmableEngine)
+    assert not registry.is_warm
+
+    registry.start_background_load(warmup=True, batch_sizes=[1, 8], iterations=2).join(timeout=5)
+
+    assert registry.is_warm
+    assert registry.peek().warmed == [((1, 8), 2)]
+    assert registry.status()["warmup"] == "done"
+    assert registry.status()["warmup_latency_ms"] == {1: 1.0, 8: 1.0}
+
+
+def test_failed_load_is_not_warm():
+    def loader():
+        raise FileNotFoundError("missing")
+
+    registry = ModelRegistry(loader)
+    registry.start_background_load(warmup=True).join(timeout=5)
+
+    assert not registry.is_warm
+    assert registry.status()["state"] == "failed"
+
+
+def make_pool(monkeypatch, sizes, budget_mb):
+    """Pool over fake crops whose sessions 'use' the given MB."""
+    from app.models import registry as registry_module
+
+    variants = {fruit: {"path": f"{fruit}.onnx", "fruit": fruit, "version": f"{fruit}-v1", "memory_mb": mb}
+                for fruit, mb in sizes.items()}
+    monkeypatch.setattr(registry_module, "get_fruit_variant", variants.get)
+    monkeypatch.setattr(registry_module, "load_variant_engine", lambda entry: FakeEngine())
+
+    default = ModelRegistry(FakeEngine)
+    return registry_module.FruitModelPool(default, budget_mb), default
+
+
+def test_pool_routes_default_fruit_to_default_registry(monkeypatch):
+    pool, default = make_pool(monkeypatch, {"mango": 100}, budget_mb=500)
+    assert pool.registry_for("apple") is default
+    assert pool.registry_for("mango") is not default
+
+
+def test_pool_unknown_fruit(monkeypatch):
+    from app.models.registry import UnknownFruit
+
+    pool, _ = make_pool(monkeypatch, {"mango": 100}, budget_mb=500)
+    with pytest.raises(UnknownFruit):
+        pool.registry_for("durian")
+
+
+def test_pool_evicts_least_recently_used(monkeypatch):
+    pool, _ = make_pool(monkeypatch, {"mango": 200, "orange": 200, "peach": 200}, budget_mb=450)
+
+    pool.get("mango")
+    orange = pool.get("orange")
+    pool.get("mango")  # orange is now least recently used
+    pool.get("peach")
+
+    loaded = pool.stats()["loaded"]
+    assert set(loaded) == {"mango", "peach"}
+    assert pool.evictions == 1
+    assert pool.stats()["used_mb"] == 400
+    assert orange.closed
+
+
+def test_explicit_model_path_is_not_tagged_with_configured_version(monkeypatch, tmp_path):
+    from types import SimpleNamespace
+
+    from app.models import metadata
+    from app.models.metadata import register_variant, resolve_model_version
+
+    weights = tmp_path / "custom.onnx"
+    weights.write_bytes(b"weights-a")
+    metadata_path = tmp_path / "model_metadata.json"
+
+    def configure(fields_set):
+        monkeypatch.setattr(metadata, "settings", SimpleNamespace(
+            MODEL_VERSION="configured-v1", model_fields_set=set(fields_set)))
+
+    configure({"MODEL_PATH"})
+    derived = resolve_model_version(str(weights), path=metadata_path)
+    assert derived.startswith("custom-") and derived != "configured-v1"
+    weights.write_bytes(b"weights-b")
+    assert resolve_model_version(str(weights), path=metadata_path) != derived
+
+    register_variant("custom-v2", {"path": str(weights)}, path=metadata_path)
+    assert resolve_model_version(str(weights), path=metadata_path) == "custom-v2"
+
+    configure({"MODEL_PATH", "MODEL_VERSION"})
+    assert resolve_model_version(str(tmp_path / "other.onnx"), path=metadata_path) == "configured-v1"
+
+    configure(set())
+    assert resolve_model_version(str(weights), path=metadata_path) == "configured-v1"
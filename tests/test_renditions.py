@@ -0,0 +1,81 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from app.core.image_persistence import ImagePersister
+from app.db.models.farming import YieldRecord
+from app.utils.renditions import make_renditions, rendition_key, rendition_keys
+from app.utils.storage import LocalStorage, set_storage
+from tests.conftest import TestingSessionLocal
+
+
+def make_jpeg(width: int = 2000, height: int = 1500) -> bytes:
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    img[:, :, 1] = 180
+    ok, buffer = cv2.imencode(".jpg", img)
+    assert ok
+    return buffer.tobytes()
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+
+
+def test_rendition_keys_sit_next_to_the_original():
+    assert rendition_key("uploads/abc_tree.jpg", "thumb") == "uploads/abc_tree_thumb.webp"
+    assert set(rendition_keys("uploads/abc_tree.jpg")) == {"thumb", "medium"}
+
+
+def test_make_renditions_resizes_long_side():
+    renditions = make_renditions(make_jpeg())
+
+    thumb, content_type = renditions["thumb"]
+    assert content_type == "image/webp"
+    decoded = cv2.imdecode(np.frombuffer(thumb, dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape[:2] == (240, 320)
+
+    medium = cv2.imdecode(np.frombuffer(renditions["medium"][0], dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert max(medium.shape[:2]) == 1024
+
+
+def test_small_images_are_not_upscaled():
+    thumb = make_renditions(make_jpeg(200, 100))["thumb"][0]
+    decoded = cv2.imdecode(np.frombuffer(thumb, dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape[:2] == (100, 200)
+
+
+def test_persister_stores_renditions(tmp_path, uploads):
+    persister = ImagePersister(TestingSessionLocal, workers=0, dead_letter_dir=str(tmp_path / "dl"))
+
+    stored, rendered = asyncio.run(persister.store("uploads/a.jpg", make_jpeg(), renditions=True))
+
+    assert stored and rendered
+    assert uploads.exists("uploads/a.jpg")
+    assert uploads.exists("uploads/a_thumb.webp")
+    assert uploads.exists("uploads/a_medium.webp")
+
+
+def test_history_urls_pick_the_rendition(client, db_session, auth_headers, test_user):
+    with_renditions = YieldRecord(user_id=test_user.id, filename="a.jpg", healthy_count=1, damaged_count=0,
+                                  total_count=1, health_index=100.0, renditions=rendition_keys("uploads/a.jpg"))
+    legacy = YieldRecord(user_id=test_user.id, filename="old.jpg", healthy_count=1, damaged_count=0,
+                         total_count=1, health_index=100.0)
+    db_session.add_all([with_renditions, legacy])
+    db_session.commit()
+
+    images = client.get("/api/v1/history/image-urls", headers=auth_headers).json()["images"]
+    urls = {image["record_id"]: image["url"] for image in images}
+    assert urls[with_renditions.id] == "/outputs/a_thumb.webp"
+    assert urls[legacy.id] == "/outputs/old.jpg"  # no renditions: full image
+
+    full = client.get(f"/api/v1/history/{with_renditions.id}/image-url", headers=auth_headers).json()
+    assert full["url"] == "/outputs/a.jpg"
+
+    bad = client.get("/api/v1/history/image-urls", headers=auth_headers, params={"size": "huge"})
+    assert bad.status_code == 400
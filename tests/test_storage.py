@@ -0,0 +1,78 @@
+import asyncio
+import os
+
+import pytest
+
+from app.utils.storage import LocalStorage, S3Storage, StorageError, get_storage, set_storage
+
+
+def test_local_storage_roundtrip(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    path = asyncio.run(storage.aput("uploads/a.jpg", b"jpeg"))
+    assert path == os.path.join(str(tmp_path), "a.jpg")
+    assert open(path, "rb").read() == b"jpeg"
+    assert storage.url("uploads/a.jpg") == "/outputs/a.jpg"
+
+    storage.put("avatars/b.png", b"png", "image/png")
+    assert storage.exists("avatars/b.png")
+    assert storage.url("avatars/b.png") == "/outputs/avatars/b.png"
+
+    assert asyncio.run(storage.adelete("uploads/a.jpg")) is True
+    assert not storage.exists("uploads/a.jpg")
+    assert storage.delete("uploads/a.jpg") is False
+
+
+def test_local_storage_rejects_keys_outside_base_dir(tmp_path):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+
+    with pytest.raises(StorageError):
+        storage.put("uploads/../../escape.jpg", b"x")
+
+
+def test_s3_storage_reuses_one_client():
+    # Pointed at a MinIO-style endpoint: no request is made, URLs are signed locally
+    storage = S3Storage(
+        bucket="apples",
+        access_key_id="minio",
+        secret_access_key="minio123",
+        endpoint_url="http://localhost:9000",
+        max_pool_connections=4,
+    )
+
+    assert storage.client is storage.client
+    assert storage.client.meta.config.max_pool_connections == 4
+    url = storage.url("uploads/a.jpg", expires_in=60)
+    assert url.startswith("http://localhost:9000/apples/uploads/a.jpg?")
+
+
+def test_get_storage_defaults_to_local(monkeypatch):
+    monkeypatch.delenv("S3_BUCKET_NAME", raising=False)
+    set_storage(None)
+    try:
+        assert get_storage().name == "local"
+        assert get_storage() is get_storage()
+    finally:
+        set_storage(None)
+
+
+def test_presigned_urls_are_cached_until_close_to_expiry(monkeypatch):
+    storage = S3Storage(bucket="apples", access_key_id="minio", secret_access_key="minio123",
+                        endpoint_url="http://localhost:9000", url_cache_margin_seconds=300)
+    calls = []
+    sign = storage.client.generate_presigned_url
+
+    def counting_sign(*args, **kwargs):
+        calls.append(kwargs["Params"]["Key"])
+        return sign(*args, **kwargs)
+
+    monkeypatch.setattr(storage.client, "generate_presigned_url", counting_sign)
+
+    first = storage.url("uploads/a.jpg", expires_in=3600)
+    assert storage.url("uploads/a.jpg", expires_in=3600) == first
+    assert calls == ["uploads/a.jpg"]
+
+    # Expiry within the margin: a cached URL would be nearly dead, sign every time
+    storage.url("uploads/b.jpg", expires_in=200)
+    storage.url("uploads/b.jpg", expires_in=200)
+    assert calls.count("uploads/b.jpg") == 2
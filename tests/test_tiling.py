@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.models.preprocess import LetterboxInfo
+from app.models.tiling import make_tiles, merge_tiles, tile_starts, validate_tile_params
+
+
+def raw_output(boxes_cxcywh, class_scores):
+    """Raw YOLOv8 output (1, 4 + C, N) from explicit candidates."""
+    rows = np.concatenate([np.asarray(boxes_cxcywh, np.float32), np.asarray(class_scores, np.float32)], axis=1)
+    return rows.T[None, ...]
+
+
+def test_tile_starts_cover_axis_and_align_last_tile():
+    assert tile_starts(500, 640, 512) == [0]
+    assert tile_starts(1600, 640, 512) == [0, 512, 960]
+
+
+def test_make_tiles_cover_frame_with_overlap():
+    tiles = make_tiles(4000, 3000, 640, overlap=0.2)
+
+    assert tiles[:, 0].min() == 0 and tiles[:, 1].min() == 0
+    assert tiles[:, 2].max() == 4000 and tiles[:, 3].max() == 3000
+    assert np.all(tiles[:, 2] - tiles[:, 0] == 640)
+    assert np.all(tiles[:, 3] - tiles[:, 1] == 640)
+    # Neighbouring tiles overlap
+    xs = np.unique(tiles[:, 0])
+    assert np.all(np.diff(xs) < 640)
+
+
+def test_make_tiles_rejects_bad_params():
+    with pytest.raises(ValueError):
+        make_tiles(100, 100, 0)
+    with pytest.raises(ValueError):
+        make_tiles(100, 100, 64, overlap=1.0)
+
+
+def test_merge_tiles_deduplicates_object_on_tile_border():
+    # Two 640 tiles at x=0 and x=512, model input 640 (scale 1, no padding)
+    info = LetterboxInfo(1.0, 1.0, 0.0, 0.0, (640, 640))
+    # Same apple at frame x in [560, 600]: x=580 in tile 0, x=68 in tile 1
+    left = raw_output([[580, 100, 40, 40]], [[0.9, 0.1]])
+    right = raw_output([[68, 100, 40, 40]], [[0.8, 0.1]])
+
+    detections = merge_tiles(
+        [left[0], right[0]], [info, info], [(0, 0), (512, 0)], (1152, 640),
+        conf_threshold=0.5, iou_threshold=0.45
+    )
+
+    assert len(detections) == 1
+    assert detections["x"][0] == 560
+    assert detections["confidence"][0] == pytest.approx(0.9)
+
+
+def test_merge_tiles_keeps_distinct_objects_in_frame_coordinates():
+    info = LetterboxInfo(1.0, 1.0, 0.0, 0.0, (640, 640))
+    left = raw_output([[100, 100, 20, 20]], [[0.9, 0.1]])
+    right = raw_output([[300, 200, 20, 20]], [[0.1, 0.7]])
+
+    detections = merge_tiles(
+        [left[0], right[0]], [info, info], [(0, 0), (512, 0)], (1152, 640),
+        conf_threshold=0.5
+    )
+
+    assert sorted(detections["x"].tolist()) == [90, 802]
+    assert sorted(detections["class_id"].tolist()) == [0, 1]
+
+
+def test_validate_tile_params():
+    validate_tile_params(None, 0.2, 640)
+    validate_tile_params(640, 0.25, 640)
+    with pytest.raises(ValueError):
+        validate_tile_params(32, 0.2, 640)
+    with pytest.raises(ValueError):
+        validate_tile_params(640, 0.9, 640)
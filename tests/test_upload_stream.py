@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from app.utils.upload_stream import (
+    EmptyUpload,
+    UnsupportedImageType,
+    UploadTooLarge,
+    read_image_upload,
+    sniff_image_type,
+)
+
+JPEG = b"\xff\xd8\xff\xe0" + b"x" * 100
+PNG = b"\x89PNG\r\n\x1a\n" + b"x" * 100
+
+
+class CountingFile(io.BytesIO):
+    """Records how many bytes were pulled from the upload."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def read(data, allowed=("image/jpeg", "image/png"), max_bytes=1024, chunk_size=16):
+    upload = UploadFile(CountingFile(data), filename="photo.jpg")
+    return asyncio.run(read_image_upload(upload, allowed, max_bytes=max_bytes, chunk_size=chunk_size)), upload
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(JPEG[:12]) == "image/jpeg"
+    assert sniff_image_type(PNG[:12]) == "image/png"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBP") == "image/webp"
+    assert sniff_image_type(b"%PDF-1.7 ....") is None
+
+
+def test_reads_image_with_hash_and_sniffed_type():
+    image, _ = read(PNG)
+
+    assert image.data == PNG
+    assert image.content_type == "image/png"  # whatever the declared type
+    assert image.content_hash == hashlib.sha256(PNG).hexdigest()
+
+
+def test_oversized_upload_stops_early():
+    data = JPEG * 100  # ~10 KB
+    upload = UploadFile(CountingFile(data), filename="big.jpg")
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_image_upload(upload, ["image/jpeg"], max_bytes=1024, chunk_size=256))
+    assert upload.file.bytes_read <= 1024 + 256
+
+
+def test_non_image_rejected_after_first_chunk():
+    upload = UploadFile(CountingFile(b"GIF89a" + b"x" * 5000), filename="fake.jpg")
+
+    with pytest.raises(UnsupportedImageType):
+        asyncio.run(read_image_upload(upload, ["image/jpeg"], max_bytes=10000, chunk_size=64))
+    assert upload.file.bytes_read == 64
+
+
+def test_empty_upload():
+    with pytest.raises(EmptyUpload):
+        read(b"")
+
+
+def test_content_length_above_limit_rejected_before_parsing(client):
+    from app.core.config import settings
+
+    too_big = settings.MAX_FILE_SIZE_MB * 1024 * 1024 + 2 * 1024 * 1024
+    response = client.post(
+        "/api/v1/estimator/estimate",
+        content=b"x" * too_big,
+        headers={"Content-Type": "multipart/form-data; boundary=x"}
+    )
+    assert response.status_code == 413
+
+
+def test_estimate_rejects_spoofed_content_type(client):
+    response = client.post(
+        "/api/v1/estimator/estimate",
+        files={"file": ("tree.jpg", b"<html>not an image</html>", "image/jpeg")}
+    )
+    assert response.status_code == 400
+    assert "not a supported image" in response.json()["detail"]